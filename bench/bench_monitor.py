@@ -0,0 +1,240 @@
+"""Scale benchmark for monitor_local against the synthetic fleet.
+
+Starts bench/fleet_server.py, generates a matching targets.yaml for every
+size and runs each size in a fresh worker process (so RSS is per size):
+
+- cycle time and probes/sec of a full check of every target, cold (new
+  connections) and warm (keep-alive pool reused), plus CPU per cycle;
+- peak RSS of the worker;
+- detection delay: MonitorLoop runs against the fleet, a sample of targets
+  is switched to 503 and the time until the fleet's /notify sink receives
+  their "failure" notification is recorded.
+
+Results are JSON so runs can be compared between versions:
+
+    python bench/bench_monitor.py --sizes 100,1000,10000 --out bench-new.json
+    python bench/bench_monitor.py --compare bench-old.json bench-new.json
+"""
+import argparse, asyncio, json, os, platform, random, resource, statistics, subprocess, sys, tempfile, time
+from contextlib import redirect_stdout
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+MONITOR_DIR = os.path.join(os.path.dirname(BENCH_DIR), "monitor")
+
+# Métricas comparables: True = mayor es mejor
+COMPARED = {
+    "cycle_sec_cold": False,
+    "cycle_sec_warm": False,
+    "probes_per_sec": True,
+    "cpu_sec_per_cycle": False,
+    "rss_mb": False,
+    "detection_p50_sec": False,
+    "detection_p95_sec": False,
+}
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(round(p / 100 * len(values) + 0.5)) - 1))]
+
+def write_targets(path, n, base_port, ports, deep):
+    lines = ["targets:"]
+    for i in range(n):
+        base = f"http://127.0.0.1:{base_port + i % ports}/t/t{i}"
+        lines.append(f"  - name: t{i}")
+        lines.append(f"    url: {base}/health")
+        if deep:
+            lines.append(f"    deep_url: {base}/ready")
+        lines.append("    threshold_ms: 500")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+# ---------------------------------------------------------------- worker
+
+async def measure_cycles(ml, targets, cycles):
+    walls, cpus = [], []
+    async with ml.probe_session() as (pool, limiter):
+        for _ in range(cycles):
+            w0, c0 = time.perf_counter(), time.process_time()
+            await asyncio.gather(*(ml.check_target(pool, limiter, t) for t in targets))
+            walls.append(time.perf_counter() - w0)
+            cpus.append(time.process_time() - c0)
+    return walls, cpus
+
+async def measure_detection(ml, names, args):
+    import aiohttp
+    victims = random.sample(names, min(args.faults, len(names)))
+    monitor = ml.MonitorLoop(args.interval)
+    task = asyncio.create_task(monitor.run())
+    # Un intervalo completo para que todos los targets tengan estado inicial
+    await asyncio.sleep(args.interval * 1.5)
+    detected = {}
+    async with aiohttp.ClientSession() as s:
+        async with s.post(f"{args.fleet_url}/admin/fault", json={"targets": victims, "mode": "fail"}) as r:
+            fault_ts = (await r.json())["ts"]
+        deadline = time.time() + args.interval * 8
+        while time.time() < deadline and len(detected) < len(victims):
+            await asyncio.sleep(0.25)
+            async with s.get(f"{args.fleet_url}/admin/notifications", params={"since": str(fault_ts)}) as r:
+                for ts, service, status in await r.json():
+                    if status == "failure" and service in victims:
+                        detected.setdefault(service, ts)
+        async with s.post(f"{args.fleet_url}/admin/fault", json={"targets": victims, "mode": "ok"}):
+            pass
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    return [ts - fault_ts for ts in detected.values()], len(victims) - len(detected)
+
+def run_worker(args):
+    sys.path.insert(0, MONITOR_DIR)
+    import monitor_local as ml
+
+    out = sys.stdout
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        t0 = time.perf_counter()
+        targets = ml.load_targets()
+        load_sec = time.perf_counter() - t0
+        walls, cpus = asyncio.run(measure_cycles(ml, targets, args.cycles))
+        delays, missed = ([], 0)
+        if args.faults:
+            delays, missed = asyncio.run(measure_detection(ml, [t["name"] for t in targets], args))
+
+    probes = sum(2 if "deep_url" in t else 1 for t in targets)
+    warm = walls[1:] or walls
+    result = {
+        "targets": len(targets),
+        "probes_per_cycle": probes,
+        "targets_load_sec": round(load_sec, 4),
+        "cycle_sec_cold": round(walls[0], 4),
+        "cycle_sec_warm": round(statistics.median(warm), 4),
+        "probes_per_sec": round(probes / statistics.median(warm), 1),
+        "cpu_sec_per_cycle": round(statistics.median(cpus[1:] or cpus), 4),
+        "cpu_percent": round(100 * sum(cpus) / sum(walls), 1),
+        "rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "detection_p50_sec": round(percentile(delays, 50), 3) if delays else None,
+        "detection_p95_sec": round(percentile(delays, 95), 3) if delays else None,
+        "detection_max_sec": round(max(delays), 3) if delays else None,
+        "detection_missed": missed,
+    }
+    print(json.dumps(result), file=out, flush=True)
+
+# ---------------------------------------------------------------- driver
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, text=True).strip()
+    except Exception:
+        return None
+
+def start_fleet(args):
+    cmd = [sys.executable, os.path.join(BENCH_DIR, "fleet_server.py"),
+           "--base-port", str(args.base_port), "--ports", str(args.ports),
+           "--latency", args.latency, "--error-rate", str(args.error_rate)]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    line = proc.stdout.readline()
+    if "fleet listo" not in line:
+        proc.kill()
+        raise RuntimeError(f"fleet_server no arrancó: {line!r}")
+    return proc
+
+def run_size(args, n, workdir):
+    targets_file = os.path.join(workdir, f"targets-{n}.yaml")
+    write_targets(targets_file, n, args.base_port, args.ports, not args.no_deep)
+    env = dict(
+        os.environ,
+        TARGETS_FILE=targets_file,
+        STATE_FILE=os.path.join(workdir, f"state-{n}.json"),
+        OUTBOX_SPOOL_DIR=os.path.join(workdir, f"spool-{n}"),
+        NOTIFICATION_SERVICE_URL=args.fleet_url,
+        SLACK_WEBHOOK_URL="",
+        METRICS_PORT="0",
+        SHARD_MEMBERS_FILE="",
+        MAX_CONCURRENCY=str(args.max_concurrency),
+        MAX_PER_HOST=str(args.max_per_host),
+    )
+    cmd = [sys.executable, os.path.abspath(__file__), "--worker",
+           "--cycles", str(args.cycles), "--faults", str(args.faults),
+           "--interval", str(args.interval), "--fleet-url", args.fleet_url]
+    proc = subprocess.run(cmd, env=env, stdout=subprocess.PIPE, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def compare(old_path, new_path, max_regression):
+    with open(old_path) as f:
+        old = {r["targets"]: r for r in json.load(f)["results"]}
+    with open(new_path) as f:
+        new = {r["targets"]: r for r in json.load(f)["results"]}
+    worst = 0.0
+    print(f"{'targets':>8} {'metric':<20} {'old':>10} {'new':>10} {'change':>8}")
+    for n in sorted(set(old) & set(new)):
+        for metric, higher_is_better in COMPARED.items():
+            a, b = old[n].get(metric), new[n].get(metric)
+            if not a or b is None:
+                continue
+            change = (b - a) / a
+            regression = -change if higher_is_better else change
+            worst = max(worst, regression)
+            flag = "  <-" if regression > max_regression else ""
+            print(f"{n:>8} {metric:<20} {a:>10.3f} {b:>10.3f} {change:>+7.1%}{flag}")
+    return 1 if worst > max_regression else 0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="100,1000,10000")
+    parser.add_argument("--cycles", type=int, default=3, help="Ciclos medidos por tamaño (el primero es en frío)")
+    parser.add_argument("--faults", type=int, default=20, help="Targets con falla inyectada (0 = no medir detección)")
+    parser.add_argument("--interval", type=float, default=5, help="Intervalo del monitor al medir detección")
+    parser.add_argument("--latency", default="lognormal:20,0.5", help="Distribución de latencia del fleet")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--base-port", type=int, default=9500)
+    parser.add_argument("--ports", type=int, default=8, help="Hosts simulados")
+    parser.add_argument("--no-deep", action="store_true", help="Sin deep_url en los targets")
+    parser.add_argument("--max-concurrency", type=int, default=200)
+    parser.add_argument("--max-per-host", type=int, default=20)
+    parser.add_argument("--out", help="Archivo JSON de resultados (por defecto stdout)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="Con --compare, sale con 1 si alguna métrica empeora más que esto")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--fleet-url", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(compare(*args.compare, args.max_regression))
+    if args.worker:
+        run_worker(args)
+        return
+
+    args.fleet_url = f"http://127.0.0.1:{args.base_port}"
+    fleet = start_fleet(args)
+    results = []
+    try:
+        with tempfile.TemporaryDirectory(prefix="bench-monitor-") as workdir:
+            for n in (int(s) for s in args.sizes.split(",")):
+                print(f"▶ {n} targets...", file=sys.stderr, flush=True)
+                results.append(run_size(args, n, workdir))
+                print(f"  {json.dumps(results[-1])}", file=sys.stderr, flush=True)
+    finally:
+        fleet.terminate()
+        fleet.wait()
+
+    doc = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": int(time.time()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "params": {k: v for k, v in vars(args).items() if k not in ("worker", "compare", "out")},
+        },
+        "results": results,
+    }
+    text = json.dumps(doc, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
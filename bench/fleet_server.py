@@ -0,0 +1,100 @@
+"""Synthetic fleet for monitor benchmarks.
+
+One asyncio process serves /t/<i>/health and /t/<i>/ready for any number of
+targets on several ports (one "host" per port), with a configurable latency
+distribution and error rate. It also records faults and acts as the
+notification sink (/notify), so detection delay can be measured.
+
+    python bench/fleet_server.py --base-port 9500 --ports 8 --latency lognormal:20,0.5
+"""
+import argparse, asyncio, math, random, time
+from aiohttp import web
+
+def latency_sampler(spec):
+    """'fixed:MS' | 'lognormal:MEDIAN_MS,SIGMA' | 'bimodal:FAST_MS,SLOW_MS,P_SLOW' -> seconds."""
+    kind, _, args = spec.partition(":")
+    vals = [float(v) for v in args.split(",")] if args else []
+    if kind == "fixed":
+        return lambda: vals[0] / 1000
+    if kind == "lognormal":
+        mu, sigma = math.log(vals[0]), vals[1]
+        return lambda: random.lognormvariate(mu, sigma) / 1000
+    if kind == "bimodal":
+        fast, slow, p = vals
+        return lambda: (slow if random.random() < p else fast) / 1000
+    raise ValueError(f"distribución desconocida: {spec}")
+
+class Fleet:
+    def __init__(self, sample_latency, error_rate):
+        self.sample_latency = sample_latency
+        self.error_rate = error_rate
+        self.faults = {}          # target -> (mode, ts)
+        self.notifications = []   # (ts, service, status)
+
+    async def probe(self, request):
+        target = request.match_info["target"]
+        fault = self.faults.get(target)
+        mode = fault[0] if fault else "ok"
+        delay = self.sample_latency()
+        if mode == "slow":
+            delay += float(request.app["slow_ms"]) / 1000
+        await asyncio.sleep(delay)
+        if mode == "fail" or (self.error_rate and random.random() < self.error_rate):
+            return web.json_response({"status": "down"}, status=503)
+        return web.json_response({"status": "up"})
+
+    async def set_fault(self, request):
+        data = await request.json()
+        now = time.time()
+        for target in data["targets"]:
+            if data.get("mode", "fail") == "ok":
+                self.faults.pop(str(target), None)
+            else:
+                self.faults[str(target)] = (data.get("mode", "fail"), now)
+        return web.json_response({"ts": now, "count": len(data["targets"])})
+
+    async def notify(self, request):
+        payload = await request.json()
+        self.notifications.append((time.time(), payload.get("service"), payload.get("status")))
+        return web.json_response({"status": "sent"})
+
+    async def get_notifications(self, request):
+        since = float(request.query.get("since", "0"))
+        return web.json_response([n for n in self.notifications if n[0] >= since])
+
+def build_app(fleet, slow_ms):
+    app = web.Application()
+    app["slow_ms"] = slow_ms
+    app.router.add_get("/t/{target}/health", fleet.probe)
+    app.router.add_get("/t/{target}/ready", fleet.probe)
+    app.router.add_post("/admin/fault", fleet.set_fault)
+    app.router.add_post("/notify", fleet.notify)
+    app.router.add_get("/admin/notifications", fleet.get_notifications)
+    return app
+
+async def serve(args):
+    fleet = Fleet(latency_sampler(args.latency), args.error_rate)
+    app = build_app(fleet, args.slow_ms)
+    runner = web.AppRunner(app, access_log=None, backlog=4096)
+    await runner.setup()
+    for port in range(args.base_port, args.base_port + args.ports):
+        await web.TCPSite(runner, args.host, port, backlog=4096).start()
+    print(f"fleet listo en {args.host}:{args.base_port}-{args.base_port + args.ports - 1}", flush=True)
+    await asyncio.Event().wait()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--base-port", type=int, default=9500)
+    parser.add_argument("--ports", type=int, default=8, help="Puertos (hosts simulados)")
+    parser.add_argument("--latency", default="lognormal:20,0.5")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--slow-ms", type=float, default=1000, help="Latencia extra en modo slow")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
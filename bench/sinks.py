@@ -0,0 +1,150 @@
+"""Local stand-ins for the notification service's outbound channels.
+
+- webhook sink: POST /slack accepts Slack incoming-webhook payloads;
+- SMTP sink: a minimal SMTP server (EHLO, AUTH PLAIN/LOGIN, MAIL, RCPT,
+  DATA) that accepts every message without TLS;
+- /notify relay: POST /notify is forwarded unchanged to the notification
+  service, so the time each alert reached /notify is recorded here.
+
+Every arrival is kept as [ts, kind, service, status] (kind = notify, slack
+or email) and served by GET /admin/events?since=, all on the same clock.
+"""
+import argparse, asyncio, json, re, time
+from email import message_from_bytes
+import aiohttp
+from aiohttp import web
+
+# "[MediSupply Alert] <service> - <STATUS>"
+SUBJECT_RE = re.compile(r"\] (?P<service>.+) - (?P<status>\S+)$")
+# "*Service:* <service>" en los campos del bloque de Slack
+FIELD_RE = re.compile(r"^\*(?P<key>Service|Status):\* (?P<value>.*)$")
+
+class Events:
+    def __init__(self):
+        self.items = []
+
+    def add(self, kind, service, status, ts=None):
+        self.items.append([ts or time.time(), kind, service, status])
+
+    async def get(self, request):
+        since = float(request.query.get("since", "0"))
+        return web.json_response([e for e in self.items if e[0] >= since])
+
+class NotifyRelay:
+    def __init__(self, events, upstream):
+        self.events = events
+        self.upstream = upstream.rstrip("/")
+        self.session = None
+
+    async def notify(self, request):
+        ts = time.time()
+        body = await request.read()
+        try:
+            payload = json.loads(body)
+            self.events.add("notify", payload.get("service"), payload.get("status"), ts)
+        except ValueError:
+            pass
+        if self.session is None:
+            self.session = aiohttp.ClientSession()
+        async with self.session.post(f"{self.upstream}/notify", data=body, params=request.query,
+                                     headers={"Content-Type": "application/json"}) as resp:
+            return web.Response(status=resp.status, body=await resp.read(), content_type="application/json")
+
+async def slack(request, events):
+    ts = time.time()
+    payload = await request.json()
+    fields = {}
+    for block in payload.get("blocks", []):
+        for field in block.get("fields", []):
+            m = FIELD_RE.match(field.get("text", ""))
+            if m:
+                fields[m["key"].lower()] = m["value"]
+    events.add("slack", fields.get("service"), fields.get("status"), ts)
+    return web.Response(text="ok")
+
+class SMTPSink:
+    """Just enough SMTP for aiosmtplib: no TLS, any AUTH is accepted."""
+
+    def __init__(self, events):
+        self.events = events
+
+    async def handle(self, reader, writer):
+        def reply(line):
+            writer.write(line.encode() + b"\r\n")
+
+        reply("220 bench-smtp ESMTP")
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                cmd = line.decode(errors="replace").strip()
+                verb = cmd.split(" ", 1)[0].upper()
+                if verb == "EHLO":
+                    writer.write(b"250-bench-smtp\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME\r\n")
+                elif verb == "AUTH":
+                    parts = cmd.split()
+                    if parts[1].upper() == "LOGIN":
+                        for prompt in ("334 VXNlcm5hbWU6", "334 UGFzc3dvcmQ6"):
+                            reply(prompt)
+                            await writer.drain()
+                            await reader.readline()
+                    elif len(parts) == 2:
+                        reply("334 ")
+                        await writer.drain()
+                        await reader.readline()
+                    reply("235 2.7.0 Authentication successful")
+                elif verb == "DATA":
+                    reply("354 End data with <CR><LF>.<CR><LF>")
+                    await writer.drain()
+                    data = []
+                    while True:
+                        chunk = await reader.readline()
+                        if chunk in (b".\r\n", b".\n", b""):
+                            break
+                        data.append(chunk[1:] if chunk.startswith(b"..") else chunk)
+                    ts = time.time()
+                    m = SUBJECT_RE.search(message_from_bytes(b"".join(data)).get("Subject", ""))
+                    self.events.add("email", m["service"] if m else None, m["status"].lower() if m else None, ts)
+                    reply("250 2.0.0 OK")
+                elif verb == "QUIT":
+                    reply("221 Bye")
+                    break
+                elif verb in ("HELO", "MAIL", "RCPT", "RSET", "NOOP"):
+                    reply("250 OK")
+                else:
+                    reply("502 Command not implemented")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+async def serve(args):
+    events = Events()
+    relay = NotifyRelay(events, args.notify_upstream)
+    app = web.Application()
+    app.router.add_post("/slack", lambda request: slack(request, events))
+    app.router.add_post("/notify", relay.notify)
+    app.router.add_get("/admin/events", events.get)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, args.host, args.http_port).start()
+    await asyncio.start_server(SMTPSink(events).handle, args.host, args.smtp_port)
+    print(f"sinks listos en {args.host}: http {args.http_port}, smtp {args.smtp_port}", flush=True)
+    await asyncio.Event().wait()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--http-port", type=int, default=9601, help="Webhook de Slack, relay de /notify y eventos")
+    parser.add_argument("--smtp-port", type=int, default=9625)
+    parser.add_argument("--notify-upstream", default="http://127.0.0.1:8082", help="Servicio de notificaciones real")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+import asyncio, collections, heapq, json, time
+import aiohttp
+from aiohttp import web
+
+
+class HeartbeatIndex:
+    """Deadline index for push-mode targets, backed by a lazily re-armed min-heap.
+
+    A heartbeat only stores its arrival time, so it costs O(1) however
+    often it comes. The heap holds at most one deadline per target: when
+    it comes due and the target was heard from since, it is pushed again
+    at last heartbeat + deadline, otherwise the target is reported as
+    missed and disarmed until its next heartbeat. A steady stream costs
+    one heap operation per target per deadline, not per heartbeat.
+    Removed or re-registered targets leave stale items behind that are
+    skipped through a per-target generation counter.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._heap = []
+        self._deadline = {}  # name -> segundos
+        self._last = {}      # name -> último heartbeat
+        self._gen = {}
+        self._armed = set()
+        self._seq = 0
+
+    def __contains__(self, name):
+        return name in self._deadline
+
+    def __len__(self):
+        return len(self._deadline)
+
+    @property
+    def live(self):
+        return len(self._armed)
+
+    def is_live(self, name):
+        return name in self._armed
+
+    def _push(self, name, due):
+        self._seq += 1
+        heapq.heappush(self._heap, (due, self._seq, name, self._gen[name]))
+
+    def add(self, name, deadline):
+        deadline = float(deadline)
+        if deadline <= 0:
+            raise ValueError(f"heartbeat_deadline_sec debe ser > 0 para {name}")
+        self.remove(name)
+        self._deadline[name] = deadline
+        self._gen[name] = self._gen.get(name, 0) + 1
+
+    def remove(self, name):
+        self._deadline.pop(name, None)
+        self._last.pop(name, None)
+        self._armed.discard(name)
+        if name in self._gen:
+            self._gen[name] += 1
+
+    def beat(self, name, now=None):
+        """Record a heartbeat; False when `name` is not a push-mode target."""
+        if name not in self._deadline:
+            return False
+        now = self._clock() if now is None else now
+        self._last[name] = now
+        if name not in self._armed:
+            self._armed.add(name)
+            self._push(name, now + self._deadline[name])
+        return True
+
+    def drop(self, name):
+        """Treat `name` as missed right away (its stream closed); True if it was live."""
+        if name not in self._armed:
+            return False
+        self._armed.discard(name)
+        self._gen[name] += 1
+        return True
+
+    def next_due(self):
+        """Earliest live deadline, or None."""
+        heap = self._heap
+        while heap:
+            due, _, name, gen = heap[0]
+            if self._gen.get(name) == gen and name in self._armed:
+                return due
+            heapq.heappop(heap)
+        return None
+
+    def expired(self, now=None):
+        """Names whose deadline passed without a heartbeat; they are disarmed."""
+        now = self._clock() if now is None else now
+        missed = []
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            _, _, name, gen = heapq.heappop(heap)
+            if self._gen.get(name) != gen or name not in self._armed:
+                continue
+            due = self._last[name] + self._deadline[name]
+            if due > now:
+                self._push(name, due)
+            else:
+                self._armed.discard(name)
+                missed.append(name)
+        return missed
+
+
+def parse_heartbeats(data):
+    """Heartbeats in `data`: one JSON object per line, or a JSON list of objects."""
+    out = []
+    for line in data.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError:
+            continue
+        for hb in item if isinstance(item, list) else [item]:
+            # service se usa como clave: solo un nombre de texto es válido
+            if isinstance(hb, dict) and isinstance(hb.get("service"), str) and hb["service"]:
+                out.append(hb)
+    return out
+
+
+class _UDPReceiver(asyncio.DatagramProtocol):
+    def __init__(self, on_heartbeat):
+        self.on_heartbeat = on_heartbeat
+
+    def datagram_received(self, data, addr):
+        for hb in parse_heartbeats(data.decode("utf-8", errors="replace")):
+            self.on_heartbeat(hb, "udp")
+
+
+async def serve_udp(port, on_heartbeat, host="0.0.0.0"):
+    """UDP listener: each datagram carries one or more heartbeats."""
+    transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+        lambda: _UDPReceiver(on_heartbeat), local_addr=(host, port))
+    return transport
+
+
+async def serve_ws(port, on_heartbeat, on_disconnect, host="0.0.0.0"):
+    """WebSocket endpoint /heartbeats: a long-lived stream of heartbeat messages.
+
+    When a connection closes, the services it reported that no other open
+    connection is still reporting are passed to `on_disconnect`, so they
+    can be checked without waiting for a deadline.
+    """
+    streams = collections.Counter()  # service -> conexiones abiertas que lo reportan
+
+    async def handle(request):
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+        seen = set()
+        try:
+            async for msg in ws:
+                if msg.type != aiohttp.WSMsgType.TEXT:
+                    continue
+                for hb in parse_heartbeats(msg.data):
+                    if on_heartbeat(hb, "ws") and hb["service"] not in seen:
+                        seen.add(hb["service"])
+                        streams[hb["service"]] += 1
+        finally:
+            gone = set()
+            for name in seen:
+                streams[name] -= 1
+                if streams[name] <= 0:
+                    del streams[name]
+                    gone.add(name)
+            on_disconnect(gone)
+        return ws
+
+    app = web.Application()
+    app.router.add_get("/heartbeats", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
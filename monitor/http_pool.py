@@ -0,0 +1,115 @@
+import asyncio, contextvars, ssl, time
+from urllib.parse import urlsplit
+import aiohttp
+
+# Marcas de tiempo del sondeo en curso (una por task), para el hook TLS
+_phase_marks = contextvars.ContextVar("phase_marks", default=None)
+
+class _TimedSSLContext(ssl.SSLContext):
+    """SSLContext that stamps the start of the TLS handshake.
+
+    asyncio calls wrap_bio right after the TCP connect succeeds, inside the
+    probing task, so the stamp splits aiohttp's connection time into TCP
+    connect and TLS handshake.
+    """
+
+    def wrap_bio(self, *args, **kwargs):
+        marks = _phase_marks.get()
+        if marks is not None:
+            marks["tls_start"] = time.perf_counter()
+        return super().wrap_bio(*args, **kwargs)
+
+def _tls_context():
+    ctx = _TimedSSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    ctx.load_default_certs()
+    return ctx
+
+def _mark(key):
+    async def on_signal(session, ctx, params):
+        if ctx.trace_request_ctx is not None:
+            ctx.trace_request_ctx[key] = time.perf_counter()
+    return on_signal
+
+async def _on_reuse(session, ctx, params):
+    if ctx.trace_request_ctx is not None:
+        ctx.trace_request_ctx["reused"] = True
+
+def _phase_trace():
+    trace = aiohttp.TraceConfig()
+    trace.on_dns_resolvehost_start.append(_mark("dns_start"))
+    trace.on_dns_resolvehost_end.append(_mark("dns_end"))
+    trace.on_connection_create_start.append(_mark("conn_start"))
+    trace.on_connection_create_end.append(_mark("conn_end"))
+    trace.on_connection_reuseconn.append(_on_reuse)
+    trace.on_request_headers_sent.append(_mark("headers_sent"))
+    trace.on_request_end.append(_mark("headers_received"))
+    return trace
+
+def phase_breakdown(marks):
+    """Milliseconds spent in DNS, TCP connect, TLS, time-to-first-byte and body read."""
+    def span(a, b):
+        return (marks[b] - marks[a]) * 1000 if a in marks and b in marks else 0.0
+
+    dns = span("dns_start", "dns_end")
+    tls = span("tls_start", "conn_end")
+    # connection_create abarca DNS, TCP y TLS
+    connect = max(0.0, span("conn_start", "conn_end") - dns - tls)
+    return {
+        "dns_ms": round(dns, 1),
+        "connect_ms": round(connect, 1),
+        "tls_ms": round(tls, 1),
+        "ttfb_ms": round(span("headers_sent", "headers_received"), 1),
+        "body_ms": round(span("headers_received", "body_end"), 1),
+        "total_ms": round(span("start", "body_end"), 1),
+        "reused": marks.get("reused", False),
+    }
+
+class SessionPool:
+    """Keep-alive aiohttp sessions, one per scheme://host:port, reused across probes."""
+
+    def __init__(self, timeout, per_host, keepalive_sec):
+        self._timeout = timeout
+        self._per_host = per_host
+        self._keepalive = keepalive_sec
+        self._ssl = _tls_context()
+        self._trace = _phase_trace()
+        self._sessions = {}
+
+    def _session(self, url):
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        session = self._sessions.get(key)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self._per_host,
+                keepalive_timeout=self._keepalive,
+                ssl=self._ssl,
+            )
+            session = self._sessions[key] = aiohttp.ClientSession(
+                connector=connector, timeout=self._timeout, trace_configs=[self._trace],
+            )
+        return session
+
+    async def get(self, url, headers):
+        """GET `url`; returns (status_code, raw_body, phases)."""
+        session = self._session(url)
+        for attempt in (0, 1):
+            marks = {}
+            token = _phase_marks.set(marks)
+            try:
+                marks["start"] = time.perf_counter()
+                async with session.get(url, headers=headers, trace_request_ctx=marks) as resp:
+                    raw = await resp.read()
+                    marks["body_end"] = time.perf_counter()
+                    return resp.status, raw, phase_breakdown(marks)
+            except (aiohttp.ServerDisconnectedError, aiohttp.ClientOSError):
+                # El servidor cerró la conexión keep-alive justo al reutilizarla:
+                # se reintenta una vez con conexión nueva en vez de reportar failure
+                if attempt or not marks.get("reused"):
+                    raise
+            finally:
+                _phase_marks.reset(token)
+
+    async def close(self):
+        await asyncio.gather(*(s.close() for s in self._sessions.values()))
+        self._sessions.clear()
@@ -0,0 +1,183 @@
+import math
+from array import array
+
+# Buckets logarítmicos de 5%: 1ms .. ~250s en 256 buckets (error de percentil ±2.5%)
+_GROWTH = 1.05
+_LOG_GROWTH = math.log(_GROWTH)
+_BUCKETS = 256
+_FAILED = 0xFFFF
+
+def _bucket(ms):
+    if ms < 1:
+        return 0
+    return min(_BUCKETS - 1, 1 + int(math.log(ms) / _LOG_GROWTH))
+
+def _bucket_value(i):
+    # Punto medio geométrico del bucket [g^(i-1), g^i)
+    return 0 if i == 0 else int(round(_GROWTH ** (i - 0.5)))
+
+class LatencyWindow:
+    """Ring buffer of the last `size` samples with an O(1)-update latency histogram.
+
+    The ring stores one bucket index per sample (failed probes use a
+    sentinel and are excluded from percentiles), so a window costs about
+    2 bytes per sample plus a fixed 1 KiB histogram.
+    """
+
+    __slots__ = ("_ring", "_counts", "_size", "_pos", "_len", "_failures")
+
+    def __init__(self, size):
+        if size <= 0:
+            raise ValueError("window debe ser > 0")
+        self._ring = array("H", [0]) * size
+        self._counts = array("I", [0]) * _BUCKETS
+        self._size = size
+        self._pos = 0
+        self._len = 0
+        self._failures = 0
+
+    def __len__(self):
+        return self._len
+
+    @property
+    def failures(self):
+        return self._failures
+
+    @property
+    def successes(self):
+        return self._len - self._failures
+
+    def add(self, ok, latency_ms):
+        # Bucket antes de tocar el estado: si falla, la ventana queda intacta
+        b = _bucket(latency_ms) if ok else _FAILED
+        if self._len == self._size:
+            old = self._ring[self._pos]
+            if old == _FAILED:
+                self._failures -= 1
+            else:
+                self._counts[old] -= 1
+        else:
+            self._len += 1
+        if ok:
+            self._counts[b] += 1
+        else:
+            self._failures += 1
+        self._ring[self._pos] = b
+        self._pos = (self._pos + 1) % self._size
+
+    def clear(self):
+        for i in range(_BUCKETS):
+            self._counts[i] = 0
+        self._pos = self._len = self._failures = 0
+
+    def failure_ratio(self):
+        return self._failures / self._len if self._len else 0.0
+
+    def percentiles(self, *ps):
+        """Nearest-rank percentiles (ms) over successful samples, in the order given."""
+        n = self.successes
+        if n == 0:
+            return tuple(0 for _ in ps)
+        order = sorted(range(len(ps)), key=lambda k: ps[k])
+        out = [0] * len(ps)
+        cum = 0
+        b = 0
+        for k in order:
+            rank = max(1, math.ceil(ps[k] / 100 * n))
+            while cum + self._counts[b] < rank:
+                cum += self._counts[b]
+                b += 1
+            out[k] = _bucket_value(b)
+        return tuple(out)
+
+class StatusClassifier:
+    """Windowed ok/degradation/failure classification with enter/exit hysteresis.
+
+    - failure: `fail_after` consecutive failed probes, or a failure ratio of
+      at least `failure_ratio` over the window; left after `recover_after`
+      consecutive successes.
+    - degradation: the `percentile` latency exceeds `threshold_ms`; left when
+      it falls to `threshold_ms * exit_ratio` or below.
+
+    The window is cleared on every transition, so each state is left on
+    fresh evidence instead of waiting for old samples to age out.
+    """
+
+    def __init__(self, threshold_ms, window=20, percentile=95, min_samples=3,
+                 exit_ratio=0.8, fail_after=2, recover_after=2, failure_ratio=0.5):
+        self.threshold_ms = threshold_ms
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.exit_ratio = exit_ratio
+        self.fail_after = fail_after
+        self.recover_after = recover_after
+        self.failure_ratio = failure_ratio
+        self.window = LatencyWindow(window)
+        self.status = "unknown"
+        self._fail_run = 0
+        self._ok_run = 0
+        self.stats = {}
+
+    @classmethod
+    def from_target(cls, t):
+        return cls(
+            int(t.get("threshold_ms", 500)),
+            window=int(t.get("window", 20)),
+            percentile=float(t.get("percentile", 95)),
+            min_samples=int(t.get("min_samples", 3)),
+            exit_ratio=float(t.get("exit_ratio", 0.8)),
+            fail_after=int(t.get("fail_after", 2)),
+            recover_after=int(t.get("recover_after", 2)),
+            failure_ratio=float(t.get("failure_ratio", 0.5)),
+        )
+
+    def _latency_status(self, current):
+        p = self.window.percentiles(self.percentile)[0]
+        if p > self.threshold_ms:
+            return "degradation"
+        if current == "degradation" and p > self.threshold_ms * self.exit_ratio:
+            return "degradation"
+        return "ok"
+
+    def update(self, ok, latency_ms):
+        """Record one probe and return the (possibly unchanged) status."""
+        w = self.window
+        w.add(ok, latency_ms)
+        if ok:
+            self._ok_run += 1
+            self._fail_run = 0
+        else:
+            self._fail_run += 1
+            self._ok_run = 0
+
+        current = self.status
+        if current == "unknown":
+            # Sin historial: el primer sondeo decide, como antes
+            new = "failure" if not ok else ("degradation" if latency_ms > self.threshold_ms else "ok")
+        elif current == "failure":
+            new = self._latency_status(current) if self._ok_run >= self.recover_after else current
+        elif self._fail_run >= self.fail_after or (
+            len(w) >= self.min_samples and w.failure_ratio() >= self.failure_ratio
+        ):
+            new = "failure"
+        elif w.successes >= self.min_samples:
+            new = self._latency_status(current)
+        else:
+            new = current
+
+        # Estadísticas de la ventana que justificó la decisión, antes de limpiarla
+        self.stats = self._snapshot()
+        if new != current and current != "unknown":
+            w.clear()
+        self.status = new
+        return new
+
+    def _snapshot(self):
+        p50, p95, p99 = self.window.percentiles(50, 95, 99)
+        return {
+            "p50_ms": p50,
+            "p95_ms": p95,
+            "p99_ms": p99,
+            "failure_ratio": round(self.window.failure_ratio(), 3),
+            "samples": len(self.window),
+        }
@@ -0,0 +1,205 @@
+import asyncio, bisect
+from aiohttp import web
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+STATUS_CODES = {"ok": 0, "degradation": 1, "failure": 2}
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(**labels):
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def copy(self):
+        h = Histogram(self.bounds)
+        h.counts, h.sum, h.count = list(self.counts), self.sum, self.count
+        return h
+
+    def lines(self, name, **labels):
+        cum = 0
+        for bound, c in zip(self.bounds, self.counts):
+            cum += c
+            yield f"{name}_bucket{_labels(**labels, le=bound)} {cum}"
+        yield f"{name}_bucket{_labels(**labels, le='+Inf')} {self.count}"
+        yield f"{name}_sum{_labels(**labels) if labels else ''} {self.sum:.6f}"
+        yield f"{name}_count{_labels(**labels) if labels else ''} {self.count}"
+
+class MonitorMetrics:
+    """In-process metrics of the monitor, exposed in Prometheus text format.
+
+    Every update happens on the event loop thread, so updates are plain
+    dict/list operations with no locks. A scrape takes snapshot() on the
+    loop, which only copies the values, and formats it with format() in a
+    worker thread, so a scrape of thousands of series does not stall
+    probing and the thread never reads state the loop is mutating.
+    """
+
+    def __init__(self):
+        self.latency = {}        # (target, probe) -> Histogram
+        self.errors = {}         # (target, probe, error) -> int
+        self.status = {}         # target -> status
+        self.lag = {}            # target -> último retraso de agenda (s)
+        self.cycle = {}          # target -> tiempo real entre sus dos últimos sondeos (s)
+        self._last_start = {}
+        self.lag_hist = Histogram(LAG_BUCKETS)
+        self.check_duration = Histogram(LATENCY_BUCKETS)
+        self.in_flight = 0
+        self.targets = 0
+        self.heartbeats = {}     # transport -> int
+        self.heartbeats_rejected = 0
+        self.heartbeats_missed = {}  # (target, reason) -> int
+        self.push_live = 0
+
+    def observe_probe(self, target, probe, seconds):
+        h = self.latency.get((target, probe))
+        if h is None:
+            h = self.latency[(target, probe)] = Histogram(LATENCY_BUCKETS)
+        h.observe(seconds)
+
+    def probe_error(self, target, probe, exc):
+        key = (target, probe, type(exc).__name__)
+        self.errors[key] = self.errors.get(key, 0) + 1
+
+    def set_status(self, target, status):
+        self.status[target] = status
+
+    def probe_started(self, target, lag, now):
+        self.lag[target] = lag
+        self.lag_hist.observe(lag)
+        last = self._last_start.get(target)
+        if last is not None:
+            self.cycle[target] = now - last
+        self._last_start[target] = now
+
+    def heartbeat_received(self, transport):
+        self.heartbeats[transport] = self.heartbeats.get(transport, 0) + 1
+
+    def heartbeat_missed(self, target, reason):
+        key = (target, reason)
+        self.heartbeats_missed[key] = self.heartbeats_missed.get(key, 0) + 1
+
+    def forget(self, target):
+        self.status.pop(target, None)
+        self.lag.pop(target, None)
+        self.cycle.pop(target, None)
+        self._last_start.pop(target, None)
+        for key in [k for k in self.latency if k[0] == target]:
+            del self.latency[key]
+        for key in [k for k in self.errors if k[0] == target]:
+            del self.errors[key]
+        for key in [k for k in self.heartbeats_missed if k[0] == target]:
+            del self.heartbeats_missed[key]
+
+    def snapshot(self):
+        """Copy of every value render() needs; call it on the event loop thread."""
+        return {
+            "latency": [(key, h.copy()) for key, h in self.latency.items()],
+            "errors": list(self.errors.items()),
+            "status": list(self.status.items()),
+            "lag": list(self.lag.items()),
+            "cycle": list(self.cycle.items()),
+            "lag_hist": self.lag_hist.copy(),
+            "check_duration": self.check_duration.copy(),
+            "in_flight": self.in_flight,
+            "targets": self.targets,
+            "heartbeats": list(self.heartbeats.items()),
+            "heartbeats_rejected": self.heartbeats_rejected,
+            "heartbeats_missed": list(self.heartbeats_missed.items()),
+            "push_live": self.push_live,
+        }
+
+    def render(self):
+        return self.format(self.snapshot())
+
+    @staticmethod
+    def format(snap):
+        """Prometheus text for a snapshot(); safe to run off the event loop."""
+        out = [
+            "# HELP monitor_probe_latency_seconds Server latency (TTFB + body) per probe.",
+            "# TYPE monitor_probe_latency_seconds histogram",
+        ]
+        for (target, probe), h in snap["latency"]:
+            out.extend(h.lines("monitor_probe_latency_seconds", target=target, probe=probe))
+        out += [
+            "# HELP monitor_probe_errors_total Failed probes by exception class.",
+            "# TYPE monitor_probe_errors_total counter",
+        ]
+        out += [f"monitor_probe_errors_total{_labels(target=t, probe=p, error=e)} {n}" for (t, p, e), n in snap["errors"]]
+        out += [
+            "# HELP monitor_target_status Current status (0=ok, 1=degradation, 2=failure).",
+            "# TYPE monitor_target_status gauge",
+        ]
+        out += [f"monitor_target_status{_labels(target=t, status=s)} {STATUS_CODES.get(s, -1)}" for t, s in snap["status"]]
+        out += [
+            "# HELP monitor_schedule_lag_seconds Delay between a probe's scheduled tick and its start.",
+            "# TYPE monitor_schedule_lag_seconds gauge",
+        ]
+        out += [f"monitor_schedule_lag_seconds{_labels(target=t)} {v:.6f}" for t, v in snap["lag"]]
+        out += [
+            "# HELP monitor_schedule_lag_distribution_seconds Schedule lag of every probe.",
+            "# TYPE monitor_schedule_lag_distribution_seconds histogram",
+        ]
+        out.extend(snap["lag_hist"].lines("monitor_schedule_lag_distribution_seconds"))
+        out += [
+            "# HELP monitor_check_duration_seconds Wall time of a full target check, including waits for concurrency slots.",
+            "# TYPE monitor_check_duration_seconds histogram",
+        ]
+        out.extend(snap["check_duration"].lines("monitor_check_duration_seconds"))
+        out += [
+            "# HELP monitor_cycle_duration_seconds Actual time between the last two probes of a target.",
+            "# TYPE monitor_cycle_duration_seconds gauge",
+        ]
+        out += [f"monitor_cycle_duration_seconds{_labels(target=t)} {v:.6f}" for t, v in snap["cycle"]]
+        out += [
+            "# HELP monitor_checks_in_flight Target checks currently running.",
+            "# TYPE monitor_checks_in_flight gauge",
+            f"monitor_checks_in_flight {snap['in_flight']}",
+            "# HELP monitor_targets Targets currently scheduled.",
+            "# TYPE monitor_targets gauge",
+            f"monitor_targets {snap['targets']}",
+            "# HELP monitor_heartbeats_total Heartbeats accepted, by transport.",
+            "# TYPE monitor_heartbeats_total counter",
+        ]
+        out += [f"monitor_heartbeats_total{_labels(transport=t)} {n}" for t, n in snap["heartbeats"]]
+        out += [
+            "# HELP monitor_heartbeats_rejected_total Heartbeats for unknown, non-push or foreign targets.",
+            "# TYPE monitor_heartbeats_rejected_total counter",
+            f"monitor_heartbeats_rejected_total {snap['heartbeats_rejected']}",
+            "# HELP monitor_heartbeats_missed_total Push targets that fell back to polling (deadline or disconnect).",
+            "# TYPE monitor_heartbeats_missed_total counter",
+        ]
+        out += [f"monitor_heartbeats_missed_total{_labels(target=t, reason=r)} {n}" for (t, r), n in snap["heartbeats_missed"]]
+        out += [
+            "# HELP monitor_push_targets_live Push targets whose heartbeats are on time (not polled).",
+            "# TYPE monitor_push_targets_live gauge",
+            f"monitor_push_targets_live {snap['push_live']}",
+        ]
+        return "\n".join(out) + "\n"
+
+    async def serve(self, port, host="0.0.0.0"):
+        async def handle(request):
+            # La copia se toma en el loop; solo el formateo va al hilo
+            body = await asyncio.to_thread(self.format, self.snapshot())
+            return web.Response(text=body, content_type="text/plain")
+
+        app = web.Application()
+        app.router.add_get("/metrics", handle)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        return runner
@@ -1,98 +1,134 @@
-import os, time, json, argparse, requests, yaml, pathlib
+import os, time, json, math, argparse, asyncio, signal, socket
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+import aiohttp
+from scheduler import ProbeScheduler
+from http_pool import SessionPool
+from latency_window import StatusClassifier
+from targets_config import TargetsConfig, parse_targets
+from state_store import StateStore
+from outbox import NotificationOutbox
+from sharding import ShardMembership
+from metrics import MonitorMetrics
+from heartbeats import HeartbeatIndex, serve_udp, serve_ws
 
 TIMEOUT = float(os.getenv("TIMEOUT_SEC", "2"))
+MAX_CONCURRENCY = int(os.getenv("MAX_CONCURRENCY", "200"))
+MAX_PER_HOST = int(os.getenv("MAX_PER_HOST", "20"))
+KEEPALIVE_SEC = float(os.getenv("KEEPALIVE_SEC", "60"))
 STATE_FILE = os.getenv("STATE_FILE", "/tmp/monitor_state.json")
+STATE_FSYNC_SEC = float(os.getenv("STATE_FSYNC_SEC", "1"))
+STATE_COMPACT_AFTER = int(os.getenv("STATE_COMPACT_AFTER", "10000"))
 SLACK_WEBHOOK_URL = os.getenv("SLACK_WEBHOOK_URL", "")
 NOTIFICATION_SERVICE_URL = os.getenv("NOTIFICATION_SERVICE_URL", "http://10.0.3.199:8082")
 TARGETS_FILE = os.getenv("TARGETS_FILE", "targets.yaml")
+OUTBOX_SPOOL_DIR = os.getenv("OUTBOX_SPOOL_DIR", "/tmp/monitor_spool")
+OUTBOX_BATCH = int(os.getenv("OUTBOX_BATCH", "20"))
+OUTBOX_MAX_MEMORY = int(os.getenv("OUTBOX_MAX_MEMORY", "1000"))
+OUTBOX_BACKOFF_MAX_SEC = float(os.getenv("OUTBOX_BACKOFF_MAX_SEC", "60"))
+SHARD_MEMBERS_FILE = os.getenv("SHARD_MEMBERS_FILE", "")
+SHARD_ID = os.getenv("SHARD_ID", socket.gethostname())
+SHARD_LEASE_SEC = float(os.getenv("SHARD_LEASE_SEC", "15"))
+METRICS_PORT = int(os.getenv("METRICS_PORT", "8081"))
+# Heartbeats push de los targets con heartbeat_deadline_sec (0 = deshabilitado)
+HEARTBEAT_UDP_PORT = int(os.getenv("HEARTBEAT_UDP_PORT", "0"))
+HEARTBEAT_WS_PORT = int(os.getenv("HEARTBEAT_WS_PORT", "0"))
+
+METRICS = MonitorMetrics()
+CONFIG_POLL_SEC = float(os.getenv("CONFIG_POLL_SEC", "5"))
 
 def load_targets():
-    with open(TARGETS_FILE, "r", encoding="utf-8") as f:
-        return yaml.safe_load(f).get("targets", [])
+    with open(TARGETS_FILE, "rb") as f:
+        return list(parse_targets(f.read()).values())
 
-def load_state():
-    p = pathlib.Path(STATE_FILE)
-    if p.exists():
-        try:
-            return json.loads(p.read_text(encoding="utf-8"))
-        except Exception:
-            return {}
-    return {}
-
-def save_state(state):
-    p = pathlib.Path(STATE_FILE)
-    p.parent.mkdir(parents=True, exist_ok=True)
-    p.write_text(json.dumps(state, ensure_ascii=False, indent=2), encoding="utf-8")
-
-def notify(level, payload):
-    """Send notifications via notification service and/or direct Slack"""
-    notification_sent = False
-    
-    if NOTIFICATION_SERVICE_URL:
-        try:
-            print(f"🔔 Intentando enviar notificación a: {NOTIFICATION_SERVICE_URL}/notify")
-            response = requests.post(
-                f"{NOTIFICATION_SERVICE_URL}/notify", 
-                json=payload, 
-                timeout=10
-            )
-            print(f"✅ Notificación enviada exitosamente - Status: {response.status_code}")
-            notification_sent = True
-            return
-        except Exception as e:
-            print(f"❌ Error enviando notificación al service: {str(e)}")
+def make_outbox():
+    return NotificationOutbox(
+        NOTIFICATION_SERVICE_URL, SLACK_WEBHOOK_URL, OUTBOX_SPOOL_DIR,
+        batch=OUTBOX_BATCH, max_memory=OUTBOX_MAX_MEMORY, backoff_max=OUTBOX_BACKOFF_MAX_SEC,
+    )
 
-     
-    if SLACK_WEBHOOK_URL:
-        try:
-            print(f"🔔 Enviando fallback a Slack webhook")
-            requests.post(SLACK_WEBHOOK_URL, json={
-                "text": f"*[{level.upper()}]* {payload['service']} ({payload['status']})\n```{json.dumps(payload, ensure_ascii=False, indent=2)}```"
-            }, timeout=3)
-            print(f"✅ Notificación Slack enviada")
-            notification_sent = True
-        except Exception as e:
-            print(f"❌ Error enviando notificación a Slack: {str(e)}")
-    
-    if not notification_sent:
-        print(f"⚠️ No se pudo enviar notificación para {payload['service']} status {payload['status']}")
-
-def do_get(url, headers):
-    start = time.perf_counter()
-    resp = requests.get(url, headers=headers, timeout=TIMEOUT)
-    latency = int((time.perf_counter() - start) * 1000)
+# Mismo significado que timeout= en requests: límite de conexión y de lectura,
+# sin contar la espera por un cupo de concurrencia.
+PROBE_TIMEOUT = aiohttp.ClientTimeout(total=None, sock_connect=TIMEOUT, sock_read=TIMEOUT)
+PROBE_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError)
+
+class ProbeLimiter:
+    """Bounds in-flight probes globally and per host (scheme://host:port)."""
+
+    def __init__(self, global_limit=MAX_CONCURRENCY, per_host=MAX_PER_HOST):
+        self._global = asyncio.Semaphore(global_limit)
+        self._per_host = per_host
+        self._hosts = {}
+
+    def _host_sem(self, url):
+        key = urlsplit(url).netloc
+        sem = self._hosts.get(key)
+        if sem is None:
+            sem = self._hosts[key] = asyncio.Semaphore(self._per_host)
+        return sem
+
+    @asynccontextmanager
+    async def slot(self, url):
+        # Primero el cupo del host: un host saturado no acapara cupos globales
+        async with self._host_sem(url):
+            async with self._global:
+                yield
+
+async def do_get(pool, limiter, url, headers):
+    async with limiter.slot(url):
+        status_code, raw, phases = await pool.get(url, headers)
+    # Latencia del servidor (TTFB + cuerpo), sin DNS/TCP/TLS propios del monitor
+    latency = int(phases["ttfb_ms"] + phases["body_ms"])
     body = {}
     try:
-        body = resp.json()
+        body = json.loads(raw)
     except Exception:
         pass
-    ok = 200 <= resp.status_code < 300
+    if not isinstance(body, dict):
+        body = {}
+    ok = 200 <= status_code < 300
     logical_ok = ok and (str(body.get("status", "up")).lower() in ("up","ok","healthy") or body.get("ok", True))
-    return logical_ok, latency, resp.status_code, body
+    return logical_ok, latency, status_code, body, phases
 
-def check_target(t):
+async def _probe(pool, limiter, t, kind):
+    url = t["url"] if kind == "shallow" else t["deep_url"]
+    try:
+        result = await do_get(pool, limiter, url, t.get("headers", {}))
+    except PROBE_ERRORS as e:
+        METRICS.probe_error(t["name"], kind, e)
+        return None
+    METRICS.observe_probe(t["name"], kind, result[1] / 1000)
+    return result
+
+async def check_target(pool, limiter, t, classifier=None):
+    """Probe `t` once. With a StatusClassifier the status comes from its sliding
+    window and hysteresis; without one, from this single sample."""
     name = t["name"]
-    headers = t.get("headers", {})
     threshold_ms = int(t.get("threshold_ms", 500))
 
     shallow_ok=deep_ok=False
     shallow_lat=deep_lat=0
     shallow_code=deep_code=0
     shallow_body=deep_body={}
+    shallow_phases=deep_phases={}
 
-    status_txt = "unknown"
-    try:
-        shallow_ok, shallow_lat, shallow_code, shallow_body = do_get(t["url"], headers)
-        if "deep_url" in t:
-            deep_ok, deep_lat, deep_code, deep_body = do_get(t["deep_url"], headers)
-    except requests.exceptions.RequestException:
-        status_txt = "failure"
+    # Shallow y deep en paralelo: el chequeo tarda max(shallow, deep)
+    probes = [_probe(pool, limiter, t, "shallow")]
+    if "deep_url" in t:
+        probes.append(_probe(pool, limiter, t, "deep"))
+    results = await asyncio.gather(*probes)
+    if results[0] is not None:
+        shallow_ok, shallow_lat, shallow_code, shallow_body, shallow_phases = results[0]
+    if len(results) > 1 and results[1] is not None:
+        deep_ok, deep_lat, deep_code, deep_body, deep_phases = results[1]
 
     latency_ms = max(shallow_lat, deep_lat) if deep_lat else shallow_lat
     degraded = latency_ms > threshold_ms
     success = shallow_ok and (deep_ok if "deep_url" in t else True)
 
-    if not success:
+    if classifier is not None:
+        status_txt = classifier.update(success, latency_ms)
+    elif not success:
         status_txt = "failure"
     elif degraded:
         status_txt = "degradation"
@@ -106,38 +142,360 @@ def check_target(t):
         "threshold_ms": threshold_ms,
         "http": {"shallow": shallow_code, "deep": deep_code},
         "bodies": {"shallow": shallow_body, "deep": deep_body},
+        "phases": {"shallow": shallow_phases, "deep": deep_phases},
         "ts": int(time.time()),
     }
+    if classifier is not None:
+        payload["stats"] = classifier.stats
+    METRICS.set_status(name, status_txt)
     print(json.dumps({"level": status_txt, **payload}, ensure_ascii=False))
     return status_txt, payload
 
-def run_once():
+@asynccontextmanager
+async def probe_session():
+    """Keep-alive session pool and limiter for a batch or a long-running loop."""
+    pool = SessionPool(PROBE_TIMEOUT, MAX_PER_HOST, KEEPALIVE_SEC)
+    try:
+        yield pool, ProbeLimiter()
+    finally:
+        await pool.close()
+
+async def check_all(targets):
+    """Probe every target concurrently; returns [(status_txt, payload)] in target order."""
+    async with probe_session() as (pool, limiter):
+        return await asyncio.gather(*(check_target(pool, limiter, t) for t in targets))
+
+def transition_level(status_txt):
+    return "warning" if status_txt == "degradation" else ("critical" if status_txt == "failure" else "info")
+
+async def _run_once():
     targets = load_targets()
-    state = load_state()
-    changed = False
-    for t in targets:
+    store = StateStore(STATE_FILE, compact_after=STATE_COMPACT_AFTER)
+    state = store.load()
+    outbox = make_outbox()
+    try:
+        results = await check_all(targets)
+        for t, (status_txt, payload) in zip(targets, results):
+            name = t["name"]
+            last = state.get(name, "unknown")
+            # Notificar sólo cambios de estado para evitar ruido
+            if last != status_txt:
+                outbox.put(transition_level(status_txt), payload)
+                store.record(name, status_txt)
+        # Lo que no se entregue queda en el spool para la próxima ejecución
+        await outbox.flush()
+        if store.should_compact():
+            store.compact()
+    finally:
+        outbox.close()
+        store.close()
+
+def run_once():
+    asyncio.run(_run_once())
+
+_SCHEDULE_KEYS = ("interval_sec", "jitter_sec", "fast_interval_sec")
+_CLASSIFIER_KEYS = ("threshold_ms", "window", "percentile", "min_samples", "exit_ratio",
+                    "fail_after", "recover_after", "failure_ratio")
+
+class MonitorLoop:
+    """Long-running monitor: one fixed-rate schedule per target.
+
+    Targets in degradation/failure are probed at `fast_interval_sec`
+    (default interval/4, at least 1s) so recovery is noticed sooner.
+    targets.yaml is polled every CONFIG_POLL_SEC and changes are applied
+    as a diff, keeping schedule and window state of unchanged targets.
+
+    With SHARD_MEMBERS_FILE set, every instance keeps the full schedule but
+    only probes the targets the shared hash ring assigns to it.
+
+    Targets with `heartbeat_deadline_sec` can also push heartbeats (UDP or
+    WebSocket) carrying their own latency and health. While heartbeats
+    arrive within the deadline they feed the classifier and the target is
+    not polled; a missed deadline or a closed stream is flagged and the
+    target is probed right away and polled again until heartbeats resume.
+    """
+
+    def __init__(self, default_interval):
+        self.default_interval = default_interval
+        self.config = TargetsConfig(TARGETS_FILE)
+        self.store = StateStore(STATE_FILE, compact_after=STATE_COMPACT_AFTER)
+        self.state = self.store.load()
+        self.outbox = make_outbox()
+        self.shard = ShardMembership(SHARD_MEMBERS_FILE, SHARD_ID, SHARD_LEASE_SEC) if SHARD_MEMBERS_FILE else None
+        # Targets con estado propio; al perder la propiedad se descarta ese estado
+        self.owned = set(self.state)
+        self.targets = {}
+        self.classifiers = {}
+        self.scheduler = ProbeScheduler()
+        self.heartbeats = HeartbeatIndex()
+        self.in_flight = set()
+        self.tasks = set()
+        self._probe_now = set()  # targets push sin heartbeat: se sondean ya
+        self._wake = asyncio.Event()
+
+    def _schedule(self, t, phase=None):
+        self.scheduler.add(
+            t["name"],
+            t.get("interval_sec", self.default_interval),
+            jitter=t.get("jitter_sec", 0),
+            fast_interval=t.get("fast_interval_sec"),
+            phase=phase,
+        )
+        self.scheduler.set_fast(t["name"], self.state.get(t["name"]) in ("degradation", "failure"))
+
+    def _classifier(self, t):
+        c = StatusClassifier.from_target(t)
+        # La histéresis continúa desde el último estado conocido
+        c.status = self.state.get(t["name"], "unknown")
+        return c
+
+    def add_target(self, t, phase=None):
+        name = t["name"]
+        self.targets[name] = t
+        self.classifiers[name] = self._classifier(t)
+        self._schedule(t, phase)
+        if "heartbeat_deadline_sec" in t:
+            self.heartbeats.add(name, t["heartbeat_deadline_sec"])
+
+    def remove_target(self, name):
+        METRICS.forget(name)
+        self.owned.discard(name)
+        self.targets.pop(name, None)
+        self.classifiers.pop(name, None)
+        self.scheduler.remove(name)
+        self.heartbeats.remove(name)
+        if name in self.state:
+            self.store.record(name, None)
+
+    def update_target(self, t):
         name = t["name"]
-        status_txt, payload = check_target(t)
-        last = state.get(name, "unknown")
+        old = self.targets[name]
+        self.targets[name] = t
+        if any(old.get(k) != t.get(k) for k in _SCHEDULE_KEYS):
+            self.scheduler.remove(name)
+            self._schedule(t)
+        if any(old.get(k) != t.get(k) for k in _CLASSIFIER_KEYS):
+            self.classifiers[name] = self._classifier(t)
+        if old.get("heartbeat_deadline_sec") != t.get("heartbeat_deadline_sec"):
+            self.heartbeats.remove(name)
+            if "heartbeat_deadline_sec" in t:
+                self.heartbeats.add(name, t["heartbeat_deadline_sec"])
+
+    def apply_diff(self, diff):
+        for name in diff.removed:
+            self.remove_target(name)
+        for name in diff.modified:
+            self.update_target(self.config.targets[name])
+        for name in diff.added:
+            self.add_target(self.config.targets[name])
+        print(f"🔄 targets recargados ({diff})")
+        self._wake.set()
+
+    async def watch_config(self):
+        while True:
+            await asyncio.sleep(CONFIG_POLL_SEC)
+            try:
+                diff = self.config.reload()
+            except Exception as e:
+                print(f"❌ targets inválidos, se mantiene la configuración anterior: {e}")
+                continue
+            if diff:
+                self.apply_diff(diff)
+
+    def owns(self, name):
+        if self.shard is None:
+            return True
+        if self.shard.owns(name):
+            self.owned.add(name)
+            return True
+        if name in self.owned:
+            # Target cedido a otra instancia: su estado y su ventana dejan de ser nuestros
+            self.owned.discard(name)
+            if name in self.state:
+                self.store.record(name, None)
+            self.classifiers[name] = self._classifier(self.targets[name])
+            METRICS.forget(name)
+        return False
+
+    async def renew_shard(self):
+        while True:
+            await asyncio.sleep(self.shard.renew_sec)
+            try:
+                await asyncio.to_thread(self.shard.renew)
+            except Exception as e:
+                print(f"❌ Error renovando lease de shard {SHARD_ID}: {e}")
+
+    async def probe(self, pool, limiter, name):
+        METRICS.in_flight += 1
+        start = time.perf_counter()
+        try:
+            status_txt, payload = await check_target(pool, limiter, self.targets[name], self.classifiers[name])
+            METRICS.check_duration.observe(time.perf_counter() - start)
+            if name not in self.targets:
+                return  # eliminado durante el sondeo
+            self.scheduler.set_fast(name, status_txt in ("degradation", "failure"))
+            self._transition(name, status_txt, payload)
+        except Exception as e:
+            print(f"❌ Error sondeando {name}: {e}")
+        finally:
+            METRICS.in_flight -= 1
+            self.in_flight.discard(name)
+
+    def _transition(self, name, status_txt, payload):
         # Notificar sólo cambios de estado para evitar ruido
+        last = self.state.get(name, "unknown")
         if last != status_txt:
-            level = "warning" if status_txt == "degradation" else ("critical" if status_txt == "failure" else "info")
-            notify(level, payload)
-            state[name] = status_txt
-            changed = True
-    if changed:
-        save_state(state)
+            self.store.record(name, status_txt)
+            # Un target recién recibido de otra instancia que está ok no es una transición
+            if not (self.shard and last == "unknown" and status_txt == "ok"):
+                self.outbox.put(transition_level(status_txt), payload)
+
+    def _start_probe(self, pool, limiter, name, due):
+        now = time.monotonic()
+        METRICS.probe_started(name, max(0.0, now - due), now)
+        self.in_flight.add(name)
+        task = asyncio.create_task(self.probe(pool, limiter, name))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    def on_heartbeat(self, hb, transport):
+        """Apply one pushed heartbeat; False when its target does not take heartbeats here."""
+        name = hb["service"]
+        try:
+            latency_ms = float(hb.get("latency_ms", 0))
+        except (TypeError, ValueError):
+            latency_ms = float("nan")
+        # NaN/Infinity son JSON válido para json.loads pero no una latencia
+        if name not in self.heartbeats or not math.isfinite(latency_ms) or not self.owns(name):
+            METRICS.heartbeats_rejected += 1
+            return False
+        if not self.heartbeats.is_live(name):
+            self._wake.set()  # su deadline puede ser anterior al próximo tick
+        self.heartbeats.beat(name)
+        METRICS.heartbeat_received(transport)
+        t = self.targets[name]
+        status_txt = self.classifiers[name].update(hb.get("ok", True) is not False, latency_ms)
+        METRICS.set_status(name, status_txt)
+        self.scheduler.set_fast(name, status_txt in ("degradation", "failure"))
+        if self.state.get(name, "unknown") != status_txt:
+            payload = {
+                "service": name,
+                "status": status_txt,
+                "latency_ms": latency_ms,
+                "threshold_ms": int(t.get("threshold_ms", 500)),
+                "source": "heartbeat",
+                "heartbeat": {k: v for k, v in hb.items() if k != "service"},
+                "ts": int(time.time()),
+                "stats": self.classifiers[name].stats,
+            }
+            print(json.dumps({"level": status_txt, **payload}, ensure_ascii=False))
+            self._transition(name, status_txt, payload)
+        return True
+
+    def on_disconnect(self, names):
+        for name in names:
+            if self.heartbeats.drop(name):
+                self._missed(name, "disconnect")
+
+    def _missed(self, name, reason):
+        METRICS.heartbeat_missed(name, reason)
+        print(json.dumps({"level": "warning", "service": name, "event": "heartbeat_missed",
+                          "reason": reason, "ts": int(time.time())}, ensure_ascii=False))
+        self._probe_now.add(name)
+        self._wake.set()
+
+    async def persist(self):
+        """Batch fsyncs of the state journal and compact it in the background."""
+        while True:
+            await asyncio.sleep(STATE_FSYNC_SEC)
+            try:
+                await asyncio.to_thread(self.store.sync)
+                if self.store.should_compact():
+                    await asyncio.to_thread(self.store.compact)
+            except Exception as e:
+                print(f"❌ Error persistiendo estado: {e}")
+
+    def _next_due(self):
+        dues = [d for d in (self.scheduler.next_due(), self.heartbeats.next_due()) if d is not None]
+        return min(dues) if dues else None
+
+    async def _sleep_until(self, due):
+        self._wake.clear()
+        timeout = self.default_interval if due is None else max(0.0, due - time.monotonic())
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def run(self):
+        targets = self.config.load()
+        for i, t in enumerate(targets.values()):
+            self.add_target(t, phase=i / len(targets))
+        # SIGTERM (docker stop) cancela el bucle para vaciar journal y outbox a disco
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        background = [
+            asyncio.create_task(self.watch_config()),
+            asyncio.create_task(self.persist()),
+            asyncio.create_task(self.outbox.run()),
+        ]
+        if METRICS_PORT:
+            await METRICS.serve(METRICS_PORT)
+            print(f"📈 Métricas en http://0.0.0.0:{METRICS_PORT}/metrics")
+        if self.shard:
+            await asyncio.to_thread(self.shard.join)
+            print(f"🧩 Shard {SHARD_ID} registrado en {SHARD_MEMBERS_FILE}")
+            background.append(asyncio.create_task(self.renew_shard()))
+        listeners = []
+        if HEARTBEAT_UDP_PORT:
+            listeners.append(await serve_udp(HEARTBEAT_UDP_PORT, self.on_heartbeat))
+            print(f"💓 Heartbeats UDP en 0.0.0.0:{HEARTBEAT_UDP_PORT}")
+        if HEARTBEAT_WS_PORT:
+            listeners.append(await serve_ws(HEARTBEAT_WS_PORT, self.on_heartbeat, self.on_disconnect))
+            print(f"💓 Heartbeats WebSocket en ws://0.0.0.0:{HEARTBEAT_WS_PORT}/heartbeats")
+        try:
+            async with probe_session() as (pool, limiter):
+                while True:
+                    await self._sleep_until(self._next_due())
+                    METRICS.targets = len(self.scheduler)
+                    for name in self.heartbeats.expired():
+                        self._missed(name, "deadline")
+                    METRICS.push_live = self.heartbeats.live
+                    now = time.monotonic()
+                    for name in self._probe_now:
+                        if name in self.targets and name not in self.in_flight and self.owns(name):
+                            self._start_probe(pool, limiter, name, now)
+                    self._probe_now.clear()
+                    for name, due in self.scheduler.pop_due():
+                        # Si el sondeo anterior sigue en curso se omite este tick;
+                        # con heartbeats al día el target no se sondea
+                        if name in self.in_flight or self.heartbeats.is_live(name) or not self.owns(name):
+                            continue
+                        self._start_probe(pool, limiter, name, due)
+        finally:
+            for task in background:
+                task.cancel()
+            await asyncio.gather(*background, return_exceptions=True)
+            for listener in listeners:
+                if isinstance(listener, asyncio.BaseTransport):
+                    listener.close()
+                else:
+                    await listener.cleanup()
+            if self.shard:
+                self.shard.leave()
+            self.outbox.close()
+            self.store.close()
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--loop", action="store_true", help="Ejecuta en bucle")
-    parser.add_argument("--interval", type=int, default=30, help="Intervalo en segundos")
+    parser.add_argument("--interval", type=int, default=30, help="Intervalo por defecto en segundos (interval_sec por target)")
     args = parser.parse_args()
 
     if args.loop:
-        while True:
-            run_once()
-            time.sleep(args.interval)
+        try:
+            asyncio.run(MonitorLoop(args.interval).run())
+        except (asyncio.CancelledError, KeyboardInterrupt):
+            pass
     else:
         run_once()
 
@@ -0,0 +1,230 @@
+import asyncio, collections, json, os, pathlib, random
+import aiohttp
+
+class Spool:
+    """On-disk queue of JSONL segments, consumed oldest first.
+
+    Lines are flushed on every append (they survive a process crash) and
+    segments are fsynced when they are closed.
+    """
+
+    def __init__(self, directory, segment_size=500):
+        self.dir = pathlib.Path(directory)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.segment_size = segment_size
+        self._segments = sorted(self.dir.glob("*.jsonl"))
+        self._seq = int(self._segments[-1].stem) + 1 if self._segments else 0
+        self._active = None
+        self._active_path = None
+        self._active_count = 0
+
+    def __bool__(self):
+        return bool(self._segments)
+
+    def _rotate(self):
+        if self._active is not None:
+            self._active.flush()
+            os.fsync(self._active.fileno())
+            self._active.close()
+            self._active = None
+
+    def append(self, item):
+        if self._active is None or self._active_count >= self.segment_size:
+            self._rotate()
+            self._active_path = self.dir / f"{self._seq:012d}.jsonl"
+            self._seq += 1
+            self._active = open(self._active_path, "a", encoding="utf-8")
+            self._active_count = 0
+            self._segments.append(self._active_path)
+        self._active.write(json.dumps(item, ensure_ascii=False) + "\n")
+        self._active.flush()
+        self._active_count += 1
+
+    def oldest(self):
+        """Return (path, items) of the oldest segment, or None when empty."""
+        if not self._segments:
+            return None
+        path = self._segments[0]
+        if path == self._active_path:
+            self._rotate()
+        items = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    items.append(json.loads(line))
+                except ValueError:
+                    pass  # línea cortada por un crash
+        return path, items
+
+    def remove(self, path):
+        self._segments.remove(path)
+        path.unlink(missing_ok=True)
+
+    def close(self):
+        self._rotate()
+
+class NotificationOutbox:
+    """Non-blocking delivery of state transitions to the notification service.
+
+    put() only enqueues. A background sender delivers batches of up to
+    `batch` items, one in-order chain per service, with the Slack webhook
+    as fallback like before. When delivery fails, the in-memory queue and
+    everything after it go to the Spool. The sender then retries from the
+    spool with exponential backoff until it is empty, so pending alerts
+    survive outages and restarts. Delivery is at-least-once: a crash while
+    a spool segment is half delivered resends that segment. A batch taken
+    from memory stays tracked until it is delivered, so close() spools
+    whatever a cancellation cut short.
+    """
+
+    def __init__(self, service_url, slack_url, spool_dir, batch=20, max_memory=1000,
+                 backoff_max=60.0):
+        self.service_url = service_url
+        self.slack_url = slack_url
+        self.batch = batch
+        self.max_memory = max_memory
+        self.backoff_max = backoff_max
+        self.spool = Spool(spool_dir)
+        self._queue = collections.deque()
+        self._inflight = {}  # id(item) -> item de la memoria sin confirmar, en orden
+        self._current = None  # (path, items) del segmento del spool en curso
+        self._wake = asyncio.Event()
+        self._failures = 0
+        self._session = None
+
+    @property
+    def spooling(self):
+        return bool(self.spool) or self._current is not None
+
+    def __len__(self):
+        return len(self._queue) + len(self._inflight) + (len(self._current[1]) if self._current else 0)
+
+    def put(self, level, payload):
+        item = {"level": level, "payload": payload}
+        if self.spooling:
+            self.spool.append(item)
+        else:
+            self._queue.append(item)
+            if len(self._queue) > self.max_memory:
+                self._spill()
+        self._wake.set()
+
+    def _spill(self):
+        while self._queue:
+            self.spool.append(self._queue.popleft())
+
+    async def _post(self, url, body, timeout):
+        async with self._session.post(url, json=body, timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+            await resp.read()
+            return resp.status
+
+    async def deliver(self, item):
+        """Send one notification; True when the service or Slack accepted it."""
+        level, payload = item["level"], item["payload"]
+        if self.service_url:
+            try:
+                status = await self._post(f"{self.service_url}/notify", payload, 10)
+                if status < 500:
+                    print(f"✅ Notificación enviada exitosamente - Status: {status}")
+                    return True
+                print(f"❌ Error enviando notificación al service: HTTP {status}")
+            except Exception as e:
+                print(f"❌ Error enviando notificación al service: {str(e)}")
+
+        if self.slack_url:
+            try:
+                print(f"🔔 Enviando fallback a Slack webhook")
+                status = await self._post(self.slack_url, {
+                    "text": f"*[{level.upper()}]* {payload['service']} ({payload['status']})\n```{json.dumps(payload, ensure_ascii=False, indent=2)}```"
+                }, 3)
+                if status < 400:
+                    print(f"✅ Notificación Slack enviada")
+                    return True
+                print(f"❌ Error enviando notificación a Slack: HTTP {status}")
+            except Exception as e:
+                print(f"❌ Error enviando notificación a Slack: {str(e)}")
+
+        print(f"⚠️ No se pudo enviar notificación para {payload['service']} status {payload['status']}")
+        return False
+
+    async def _deliver_chain(self, items):
+        # Transiciones de un mismo servicio en orden; se corta en el primer fallo
+        for i, item in enumerate(items):
+            if not await self.deliver(item):
+                return items[i:]
+            self._inflight.pop(id(item), None)
+        return []
+
+    async def _send(self, batch):
+        """Deliver `batch`; returns the undelivered items in their original order."""
+        chains = collections.OrderedDict()
+        for item in batch:
+            chains.setdefault(item["payload"].get("service"), []).append(item)
+        leftovers = await asyncio.gather(*(self._deliver_chain(c) for c in chains.values()))
+        pending = {id(item) for chain in leftovers for item in chain}
+        return [item for item in batch if id(item) in pending]
+
+    async def _send_memory(self):
+        """Send one batch from the in-memory queue; True when all of it was delivered."""
+        batch = [self._queue.popleft() for _ in range(min(self.batch, len(self._queue)))]
+        self._inflight = {id(item): item for item in batch}
+        failed = await self._send(batch)
+        self._inflight = {}
+        if failed:
+            self._queue.extendleft(reversed(failed))
+            self._spill()
+        return not failed
+
+    async def _backoff(self):
+        self._failures += 1
+        delay = min(self.backoff_max, 2 ** (self._failures - 1)) * random.uniform(0.5, 1.0)
+        print(f"⏳ Notificaciones pendientes: {len(self)} (+spool), reintento en {delay:.1f}s")
+        await asyncio.sleep(delay)
+
+    async def _step(self):
+        """One delivery round. Returns False when there is nothing to send."""
+        if self.spooling:
+            if self._current is None:
+                self._current = self.spool.oldest()
+            path, items = self._current
+            failed = await self._send(items[:self.batch]) if items else []
+            self._current = (path, failed + items[self.batch:])
+            if not self._current[1]:
+                self.spool.remove(path)
+                self._current = None
+        elif self._queue:
+            failed = not await self._send_memory()
+        else:
+            return False
+        if failed:
+            await self._backoff()
+        else:
+            self._failures = 0
+        return True
+
+    async def run(self):
+        async with aiohttp.ClientSession() as self._session:
+            while True:
+                if not await self._step():
+                    self._wake.clear()
+                    await self._wake.wait()
+
+    async def flush(self):
+        """Try each pending item once (one-shot mode); what fails stays spooled."""
+        async with aiohttp.ClientSession() as self._session:
+            while self._queue:
+                if not await self._send_memory():
+                    return
+            while self.spool:
+                path, items = self.spool.oldest()
+                failed = await self._send(items)
+                if failed:
+                    return
+                self.spool.remove(path)
+
+    def close(self):
+        """Persist whatever is still in memory, including a batch cut short mid-send."""
+        self._queue.extendleft(reversed(list(self._inflight.values())))
+        self._inflight = {}
+        self._spill()
+        self.spool.close()
@@ -0,0 +1,108 @@
+import heapq, math, random, time
+
+
+class _Entry:
+    __slots__ = ("interval", "fast_interval", "jitter", "base", "fast", "token")
+
+    def __init__(self, interval, fast_interval, jitter, base):
+        self.interval = interval
+        self.fast_interval = fast_interval
+        self.jitter = jitter
+        self.base = base  # instante del tick sin jitter
+        self.fast = False
+        self.token = 0  # seq del único item vigente en el heap
+
+    @property
+    def period(self):
+        return self.fast_interval if self.fast else self.interval
+
+
+class ProbeScheduler:
+    """Fixed-rate per-target probe schedule backed by a min-heap.
+
+    Each target keeps a jitter-free base tick that always advances by whole
+    periods, so the cadence never drifts with probe duration. Jitter only
+    shifts the firing time of a single tick. Stale heap items are discarded
+    lazily: each entry remembers the scheduler-wide sequence number of its
+    live item, so items left by a removed target never match a re-added one.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._heap = []
+        self._entries = {}
+        self._seq = 0
+
+    def __contains__(self, name):
+        return name in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _push(self, name, entry):
+        due = entry.base + (random.uniform(0, entry.jitter) if entry.jitter else 0.0)
+        self._seq += 1
+        entry.token = self._seq
+        heapq.heappush(self._heap, (due, self._seq, name))
+
+    def add(self, name, interval, jitter=0.0, fast_interval=None, phase=None):
+        """Schedule `name` every `interval` seconds.
+
+        `phase` in [0, 1) places the first tick inside the first period so a
+        fleet added at once is spread evenly instead of firing in a burst.
+        """
+        interval = float(interval)
+        if interval <= 0:
+            raise ValueError(f"interval debe ser > 0 para {name}")
+        fast_interval = float(fast_interval) if fast_interval else max(1.0, interval / 4)
+        if phase is None:
+            phase = random.random()
+        entry = _Entry(interval, min(fast_interval, interval), float(jitter or 0), self._clock() + phase * interval)
+        self._entries[name] = entry
+        self._push(name, entry)
+
+    def remove(self, name):
+        self._entries.pop(name, None)
+
+    def set_fast(self, name, fast):
+        """Switch `name` to the fast cadence (or back) without losing the grid."""
+        entry = self._entries.get(name)
+        if entry is None or entry.fast == fast:
+            return
+        entry.fast = fast
+        if fast:
+            now = self._clock()
+            if entry.base > now + entry.fast_interval:
+                entry.base = now + entry.fast_interval
+                self._push(name, entry)
+
+    def next_due(self):
+        """Firing time of the earliest live tick, or None when empty."""
+        heap = self._heap
+        while heap:
+            due, seq, name = heap[0]
+            entry = self._entries.get(name)
+            if entry is not None and entry.token == seq:
+                return due
+            heapq.heappop(heap)
+        return None
+
+    def pop_due(self, now=None):
+        """Return [(name, due)] for the ticks that have arrived and schedule the next ones."""
+        now = self._clock() if now is None else now
+        fired = []
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            due, seq, name = heapq.heappop(heap)
+            entry = self._entries.get(name)
+            if entry is None or entry.token != seq:
+                continue
+            fired.append((name, due))
+            period = entry.period
+            entry.base += period
+            if entry.base <= now:
+                # Ticks perdidos (ciclo lento, pausa del proceso): se saltan
+                # en vez de dispararlos en ráfaga, sin mover la fase.
+                entry.base += period * math.ceil((now - entry.base) / period + 1e-9)
+            self._push(name, entry)
+        return fired
@@ -0,0 +1,125 @@
+import bisect, fcntl, hashlib, json, os, pathlib, time
+
+def _hash(key):
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+class HashRing:
+    """Consistent hash ring with `vnodes` virtual nodes per member."""
+
+    def __init__(self, members, vnodes=64):
+        points = sorted((_hash(f"{m}#{i}"), m) for m in members for i in range(vnodes))
+        self._keys = [p[0] for p in points]
+        self._owners = [p[1] for p in points]
+
+    def owner(self, key):
+        if not self._keys:
+            return None
+        i = bisect.bisect(self._keys, _hash(key)) % len(self._keys)
+        return self._owners[i]
+
+class ShardMembership:
+    """Lease-based membership of monitor instances in a shared JSON file.
+
+    Each member entry carries `active_from`, `expires` and an optional
+    `leaving_at`. Ownership at time t is the ring over members active at t.
+    Every instance applies the same rule to the same file, so they agree on
+    the owner at every instant. Two rules keep a target from being probed
+    twice:
+
+    - a joining instance becomes active `settle_sec` after it registers,
+      by which time every peer has re-read the file (settle > renew period);
+    - an instance that fails to renew stops owning anything once its own
+      lease expires, while peers keep its targets reserved for one more
+      renew period (their copy of its lease may be that stale).
+
+    Views may only differ by members a peer still counts but that already
+    stopped, and removing a ring member never moves targets between the
+    remaining ones, so a stale view can orphan a target briefly but never
+    double-probe it.
+
+    A crashed instance's targets stay unprobed until its lease expires plus
+    one renew period. A graceful leave is picked up at the peers' next renew.
+    """
+
+    def __init__(self, path, instance_id, lease_sec=15.0, vnodes=64, clock=time.time):
+        self.path = pathlib.Path(path)
+        self.lock_path = self.path.with_name(self.path.name + ".lock")
+        self.instance_id = instance_id
+        self.lease_sec = lease_sec
+        self.renew_sec = lease_sec / 3
+        self.settle_sec = lease_sec / 3 * 2
+        self.vnodes = vnodes
+        self._clock = clock
+        self._members = {}
+        self._rings = {}
+
+    def _read(self):
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8")).get("members", {})
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _update(self, mutate):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            members = self._read()
+            mutate(members, self._clock())
+            tmp = self.path.with_name(f"{self.path.name}.{self.instance_id}.tmp")
+            tmp.write_text(json.dumps({"members": members}, indent=2), encoding="utf-8")
+            os.replace(tmp, self.path)
+        self._members = members
+
+    def join(self):
+        def mutate(members, now):
+            own = members.get(self.instance_id)
+            if own and own["expires"] > now and not own.get("leaving_at"):
+                active_from = own["active_from"]  # reinicio rápido con el mismo id
+            else:
+                active_from = now + self.settle_sec
+            members[self.instance_id] = {"active_from": active_from, "expires": now + self.lease_sec}
+        self._update(mutate)
+
+    def renew(self):
+        def mutate(members, now):
+            own = members.get(self.instance_id)
+            if own is None or own.get("leaving_at") or own["expires"] <= now:
+                # Lease perdido: se vuelve a entrar con un nuevo periodo de asentamiento
+                own = {"active_from": now + self.settle_sec}
+            own["expires"] = now + self.lease_sec
+            members[self.instance_id] = own
+            for mid in [m for m, e in members.items() if e["expires"] < now - 10 * self.lease_sec]:
+                del members[mid]
+        self._update(mutate)
+
+    def leave(self):
+        def mutate(members, now):
+            if self.instance_id in members:
+                members[self.instance_id]["leaving_at"] = now
+        self._update(mutate)
+
+    def active(self, now=None):
+        now = self._clock() if now is None else now
+        active = []
+        for mid, e in self._members.items():
+            # Los leases ajenos se leyeron hasta un periodo de renovación atrás:
+            # se les da ese margen para no quitarle targets a un par vivo
+            grace = 0.0 if mid == self.instance_id else self.renew_sec
+            if e["active_from"] <= now < min(e["expires"] + grace, e.get("leaving_at") or float("inf")):
+                active.append(mid)
+        return sorted(active)
+
+    def _ring(self, active):
+        key = tuple(active)
+        ring = self._rings.get(key)
+        if ring is None:
+            if len(self._rings) > 8:
+                self._rings.clear()
+            ring = self._rings[key] = HashRing(active, self.vnodes)
+        return ring
+
+    def owns(self, name, now=None):
+        active = self.active(now)
+        if self.instance_id not in active:
+            return False
+        return self._ring(active).owner(name) == self.instance_id
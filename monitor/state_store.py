@@ -0,0 +1,160 @@
+import json, os, pathlib, threading
+
+class StateStore:
+    """Target statuses kept as a snapshot plus append-only transition journals.
+
+    Every transition appends one JSON line to `<path>.<gen>.journal`; fsync
+    happens in batches via sync(). compact() rotates to a new journal
+    generation, atomically replaces the snapshot at `path` (tmp + fsync +
+    rename) and deletes the journals it covers. load() replays the journals
+    newer than the snapshot and truncates a torn last line, so a crash loses
+    at most the unsynced tail, never the whole state.
+
+    record() runs on the event loop; sync() and compact() are meant for a
+    worker thread. A plain {name: status} JSON file from older versions is
+    read as generation 0.
+    """
+
+    def __init__(self, path, compact_after=10000):
+        self.path = pathlib.Path(path)
+        self.compact_after = compact_after
+        self.state = {}
+        self._lock = threading.Lock()
+        self._gen = 0
+        self._journal = None
+        self._records = 0
+        self._unsynced = 0
+
+    def _journal_path(self, gen):
+        return self.path.with_name(f"{self.path.name}.{gen}.journal")
+
+    def _journal_gens(self):
+        prefix, suffix = self.path.name + ".", ".journal"
+        gens = []
+        for p in self.path.parent.glob(f"{self.path.name}.*.journal"):
+            middle = p.name[len(prefix):-len(suffix)]
+            if middle.isdigit():
+                gens.append(int(middle))
+        return sorted(gens)
+
+    def _read_snapshot(self):
+        if not self.path.exists():
+            return {}, 0
+        try:
+            doc = json.loads(self.path.read_text(encoding="utf-8"))
+        except Exception as e:
+            print(f"⚠️ Snapshot de estado ilegible ({e}), se reconstruye desde el journal")
+            return {}, 0
+        if isinstance(doc, dict) and "gen" in doc and isinstance(doc.get("state"), dict):
+            return doc["state"], int(doc["gen"])
+        return (doc if isinstance(doc, dict) else {}), 0
+
+    def _replay(self, gen, state):
+        p = self._journal_path(gen)
+        data = p.read_bytes()
+        good = 0
+        count = 0
+        while good < len(data):
+            end = data.find(b"\n", good)
+            if end < 0:
+                break
+            try:
+                rec = json.loads(data[good:end])
+                name, status = rec["n"], rec["s"]
+            except Exception:
+                break
+            if status is None:
+                state.pop(name, None)
+            else:
+                state[name] = status
+            good = end + 1
+            count += 1
+        if good < len(data):
+            # Cola escrita a medias por un crash: se descarta desde el último registro íntegro
+            print(f"⚠️ Journal {p.name} truncado en el byte {good} de {len(data)}")
+            with open(p, "r+b") as f:
+                f.truncate(good)
+        return count
+
+    def load(self):
+        """Recover the last consistent state and open the journal for appends."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        state, gen = self._read_snapshot()
+        records = 0
+        for g in self._journal_gens():
+            if g < gen:
+                self._journal_path(g).unlink(missing_ok=True)
+                continue
+            records = self._replay(g, state)
+            gen = g
+        self.state = state
+        self._gen = gen
+        self._records = records
+        self._journal = open(self._journal_path(gen), "a", encoding="utf-8")
+        return state
+
+    def record(self, name, status):
+        """Append a transition; status=None removes the target."""
+        line = json.dumps({"n": name, "s": status}, ensure_ascii=False) + "\n"
+        with self._lock:
+            if status is None:
+                self.state.pop(name, None)
+            else:
+                self.state[name] = status
+            self._journal.write(line)
+            self._records += 1
+            self._unsynced += 1
+
+    @property
+    def unsynced(self):
+        return self._unsynced
+
+    def should_compact(self):
+        return self._records >= self.compact_after
+
+    def sync(self):
+        """Flush and fsync the pending journal tail."""
+        with self._lock:
+            if not self._unsynced:
+                return
+            self._journal.flush()
+            # dup: compact() puede cerrar el journal mientras se hace el fsync
+            fd = os.dup(self._journal.fileno())
+            self._unsynced = 0
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def compact(self):
+        """Write a snapshot of the current state and drop the journals it covers."""
+        with self._lock:
+            old = self._journal
+            old.flush()
+            self._gen += 1
+            gen = self._gen
+            self._journal = open(self._journal_path(gen), "a", encoding="utf-8")
+            self._records = 0
+            self._unsynced = 0
+            snapshot = dict(self.state)
+        old.close()
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"gen": gen, "state": snapshot}, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        dir_fd = os.open(self.path.parent, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+        for g in self._journal_gens():
+            if g < gen:
+                self._journal_path(g).unlink(missing_ok=True)
+
+    def close(self):
+        if self._journal is not None:
+            self.sync()
+            self._journal.close()
+            self._journal = None
@@ -0,0 +1,48 @@
+import asyncio
+import json
+import socket
+
+import aiohttp
+
+from heartbeats import parse_heartbeats, serve_ws
+
+
+def test_parse_keeps_only_text_service_names():
+    data = "\n".join(json.dumps(hb) for hb in [
+        {"service": "api", "latency_ms": 3},
+        {"service": ["api"]},
+        {"service": {"name": "api"}},
+        {"service": 7},
+        {"service": ""},
+        [{"service": "db"}, {"service": None}],
+    ])
+    assert [hb["service"] for hb in parse_heartbeats(data)] == ["api", "db"]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_disconnect_waits_for_the_last_stream_of_a_service():
+    disconnected = []
+
+    async def run():
+        port = free_port()
+        runner = await serve_ws(port, lambda hb, transport: True, disconnected.append, host="127.0.0.1")
+        url = f"http://127.0.0.1:{port}/heartbeats"
+        async with aiohttp.ClientSession() as session:
+            first = await session.ws_connect(url)
+            second = await session.ws_connect(url)
+            await first.send_str(json.dumps([{"service": "api"}, {"service": "db"}]))
+            await second.send_str(json.dumps({"service": "api"}))
+            await asyncio.sleep(0.1)
+            await first.close()
+            await asyncio.sleep(0.1)
+            await second.close()
+            await asyncio.sleep(0.1)
+        await runner.cleanup()
+
+    asyncio.run(run())
+    assert disconnected == [{"db"}, {"api"}]
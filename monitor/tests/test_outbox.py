@@ -0,0 +1,70 @@
+import asyncio
+import json
+
+from aiohttp import web
+
+from outbox import NotificationOutbox
+
+
+async def slow_notify_server(fast=()):
+    """/notify that answers the services in `fast` at once and stalls the rest."""
+    received = []
+
+    async def notify(request):
+        body = await request.json()
+        received.append(body)
+        if body["service"] not in fast:
+            await asyncio.sleep(5)
+        return web.json_response({"status": "sent"})
+
+    app = web.Application()
+    app.router.add_post("/notify", notify)
+    runner = web.AppRunner(app, access_log=None, shutdown_timeout=0.1)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}", received
+
+
+def spooled(directory):
+    return [json.loads(line) for path in sorted(directory.glob("*.jsonl"))
+            for line in path.read_text().splitlines()]
+
+
+def payload(i):
+    return {"service": f"svc-{i}", "status": "failure"}
+
+
+def test_cancel_during_send_spools_the_batch(tmp_path):
+    async def run():
+        runner, url, received = await slow_notify_server()
+        outbox = NotificationOutbox(url, None, tmp_path)
+        for i in range(3):
+            outbox.put("failure", payload(i))
+        task = asyncio.create_task(outbox.run())
+        while len(received) < 3:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        outbox.close()
+        await runner.cleanup()
+    asyncio.run(run())
+    assert [item["payload"] for item in spooled(tmp_path)] == [payload(i) for i in range(3)]
+
+
+def test_cancel_keeps_only_undelivered_items(tmp_path):
+    async def run():
+        runner, url, received = await slow_notify_server(fast={"svc-0"})
+        outbox = NotificationOutbox(url, None, tmp_path)
+        for i in range(3):
+            outbox.put("failure", payload(i))
+        task = asyncio.create_task(outbox.flush())
+        while len(received) < 3:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        outbox.close()
+        await runner.cleanup()
+    asyncio.run(run())
+    assert [item["payload"] for item in spooled(tmp_path)] == [payload(1), payload(2)]
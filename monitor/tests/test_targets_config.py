@@ -0,0 +1,34 @@
+import pytest
+
+import targets_config
+from targets_config import TargetsConfig
+
+GOOD = "targets:\n  - name: api\n    url: http://api/health\n"
+
+
+def test_broken_file_is_reparsed_until_it_loads(tmp_path):
+    path = tmp_path / "targets.yaml"
+    path.write_text("targets:\n  - name: api\n")
+    config = TargetsConfig(str(path))
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            config.reload()
+    assert config.targets == {}
+
+
+def test_transient_parse_error_is_retried(tmp_path, monkeypatch):
+    path = tmp_path / "targets.yaml"
+    path.write_text(GOOD)
+    config = TargetsConfig(str(path))
+    parse = targets_config.parse_targets
+
+    def flaky(raw):
+        monkeypatch.setattr(targets_config, "parse_targets", parse)
+        raise OSError("transient")
+    monkeypatch.setattr(targets_config, "parse_targets", flaky)
+
+    with pytest.raises(OSError):
+        config.reload()
+    diff = config.reload()
+    assert diff.added == ["api"]
+    assert config.reload() is None
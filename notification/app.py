@@ -5,25 +5,142 @@ import requests
 import logging
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-import aiosmtplib
-from fastapi import FastAPI, HTTPException
+from typing import Optional
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 import boto3
-from botocore.exceptions import ClientError
-import asyncpg
 import asyncio
+import base64
+import csv
+import datetime
+import io
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from writer import NotificationWriter
+from delivery import DeliveryWorkers
+from mailer import SMTPPool, EmailBatcher
+from coalesce import AlertCoalescer
+from sns import SNSBatcher
+from metrics import NotificationMetrics
+from tracelog import TraceLog, new_trace_id
+from db import Database, compact_payload, SELECT_NOTIFICATION, SELECT_DELIVERIES, SELECT_TOTAL, select_page, select_export, SELECT_WINDOW
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Notification Service", description="Servicio de notificaciones para availability lab")
-
 # Configuration
 SLACK_WEBHOOK_URL = os.getenv("SLACK_WEBHOOK_URL", "")
 SNS_TOPIC_ARN = os.getenv("SNS_TOPIC_ARN", "")
 AWS_REGION = os.getenv("AWS_REGION", "us-east-1")
 DB_DSN = os.getenv("DB_DSN", "")
 DB_ENABLED = os.getenv("DB_ENABLED", "false").lower() == "true"
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "2"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_ACQUIRE_TIMEOUT = float(os.getenv("DB_ACQUIRE_TIMEOUT", "5"))
+# 0 deshabilita el caché de sentencias preparadas (necesario detrás de PgBouncer en modo transacción)
+DB_STATEMENT_CACHE = int(os.getenv("DB_STATEMENT_CACHE", "256"))
+# sync: /notify responde cuando la fila está confirmada; async: responde al encolarla
+DB_WRITE_MODE = os.getenv("DB_WRITE_MODE", "sync").lower()
+DB_BATCH_MAX = int(os.getenv("DB_BATCH_MAX", "500"))
+DB_BATCH_DELAY_MS = float(os.getenv("DB_BATCH_DELAY_MS", "10"))
+DB_MAX_PENDING = int(os.getenv("DB_MAX_PENDING", "10000"))
+
+# sync: /notify entrega en línea; queue: guarda el evento, responde 202 y los workers entregan
+NOTIFY_MODE = os.getenv("NOTIFY_MODE", "sync").lower()
+# Entregas simultáneas por canal y réplica, p.ej. "slack=4,sns=8,email=2"
+DELIVERY_CONCURRENCY = dict(
+    (k.strip(), int(v)) for k, v in (item.split("=") for item in os.getenv("DELIVERY_CONCURRENCY", "slack=4,sns=8,email=2").split(",") if item)
+)
+DELIVERY_MAX_ATTEMPTS = int(os.getenv("DELIVERY_MAX_ATTEMPTS", "8"))
+DELIVERY_BACKOFF_BASE_SEC = float(os.getenv("DELIVERY_BACKOFF_BASE_SEC", "2"))
+DELIVERY_BACKOFF_MAX_SEC = float(os.getenv("DELIVERY_BACKOFF_MAX_SEC", "300"))
+DELIVERY_LEASE_SEC = float(os.getenv("DELIVERY_LEASE_SEC", "60"))
+DELIVERY_POLL_SEC = float(os.getenv("DELIVERY_POLL_SEC", "1"))
+
+# Particiones diarias de notifications: retención (0 = sin límite), días creados por adelantado y mantenimiento
+NOTIFICATION_RETENTION_DAYS = int(os.getenv("NOTIFICATION_RETENTION_DAYS", "30"))
+PARTITION_PREMAKE_DAYS = int(os.getenv("PARTITION_PREMAKE_DAYS", "3"))
+PARTITION_MAINTENANCE_SEC = float(os.getenv("PARTITION_MAINTENANCE_SEC", "3600"))
+# Campos del payload que no se guardan (los bodies del health check ya tienen su status en columnas)
+PAYLOAD_DROP_FIELDS = [f.strip() for f in os.getenv("PAYLOAD_DROP_FIELDS", "bodies").split(",") if f.strip()]
+# Compresión TOAST del payload: lz4, pglz o vacío para la del servidor
+PAYLOAD_COMPRESSION = os.getenv("PAYLOAD_COMPRESSION", "lz4").lower()
+
+# Filas por lote del cursor de /notifications/export
+EXPORT_PREFETCH = int(os.getenv("EXPORT_PREFETCH", "1000"))
+
+# Caché en proceso de /notifications/stats por ventana
+STATS_CACHE_TTL_SEC = float(os.getenv("STATS_CACHE_TTL_SEC", "5"))
+
+# Log estructurado de trazas: fracción de notificaciones exitosas que se registra (los fallos siempre)
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.1"))
+TRACE_QUEUE_MAX = int(os.getenv("TRACE_QUEUE_MAX", "10000"))
+
+# Coalescing por servicio antes de los canales (la base de datos registra todos los eventos)
+COALESCE_ENABLED = os.getenv("COALESCE_ENABLED", "true").lower() == "true"
+COALESCE_DEDUP_SEC = float(os.getenv("COALESCE_DEDUP_SEC", "60"))
+COALESCE_RATE_PER_MIN = float(os.getenv("COALESCE_RATE_PER_MIN", "2"))
+COALESCE_BURST = int(os.getenv("COALESCE_BURST", "5"))
+COALESCE_DIGEST_SEC = float(os.getenv("COALESCE_DIGEST_SEC", "30"))
+
+db = Database(DB_DSN, min_size=DB_POOL_MIN, max_size=DB_POOL_MAX,
+              acquire_timeout=DB_ACQUIRE_TIMEOUT, statement_cache_size=DB_STATEMENT_CACHE,
+              retention_days=NOTIFICATION_RETENTION_DAYS, premake_days=PARTITION_PREMAKE_DAYS,
+              maintenance_sec=PARTITION_MAINTENANCE_SEC, payload_drop_fields=PAYLOAD_DROP_FIELDS,
+              payload_compression=PAYLOAD_COMPRESSION) if DB_DSN else None
+writer = NotificationWriter(db, max_batch=DB_BATCH_MAX, max_delay=DB_BATCH_DELAY_MS / 1000,
+                            max_pending=DB_MAX_PENDING) if db else None
+workers = None
+METRICS = NotificationMetrics()
+trace_log = TraceLog(sample_rate=TRACE_SAMPLE_RATE, max_queue=TRACE_QUEUE_MAX)
+stats_cache = {}  # window seconds -> (expires, stats without the request's window label)
+coalescer = AlertCoalescer(lambda payload: send_digest(payload), dedup_window=COALESCE_DEDUP_SEC,
+                           rate_per_min=COALESCE_RATE_PER_MIN, burst=COALESCE_BURST,
+                           digest_window=COALESCE_DIGEST_SEC) if COALESCE_ENABLED else None
+
+@asynccontextmanager
+async def lifespan(app):
+    global workers
+    trace_log.start()
+    if email_misconfigured():
+        logger.warning(f"📧 Email not properly configured! EMAIL_TO present: {bool(EMAIL_TO)}, "
+                       f"SMTP_USERNAME present: {bool(SMTP_USERNAME)}, SMTP_PASSWORD present: {bool(SMTP_PASSWORD)}")
+    if db:
+        await db.start()
+        writer.start()
+        workers = DeliveryWorkers(
+            db, channel_senders(), DELIVERY_CONCURRENCY,
+            max_attempts=DELIVERY_MAX_ATTEMPTS,
+            backoff_base=DELIVERY_BACKOFF_BASE_SEC,
+            backoff_max=DELIVERY_BACKOFF_MAX_SEC,
+            # El lease debe cubrir el timeout del canal más lento
+            lease_sec=max(DELIVERY_LEASE_SEC, 2 * max(SLACK_TIMEOUT_SEC, SNS_TIMEOUT_SEC, EMAIL_TIMEOUT_SEC)),
+            poll_sec=DELIVERY_POLL_SEC,
+        )
+        workers.start()
+    elif NOTIFY_MODE == "queue":
+        raise RuntimeError("NOTIFY_MODE=queue requires DB_DSN")
+    try:
+        yield
+    finally:
+        if coalescer:
+            await coalescer.close()
+        if db:
+            await workers.close()
+            # Lo que quede en el buffer se escribe antes de cerrar el pool
+            await writer.close()
+            await db.close()
+        if email_batcher:
+            await email_batcher.close()
+        await smtp_pool.close()
+        if sns_batcher:
+            await sns_batcher.close()
+        channel_executor.shutdown(wait=False)
+        trace_log.close()
+
+app = FastAPI(title="Notification Service", description="Servicio de notificaciones para availability lab", lifespan=lifespan)
 
 # Email Configuration
 SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
@@ -33,9 +150,40 @@ SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "")
 SMTP_USE_TLS = os.getenv("SMTP_USE_TLS", "true").lower() == "true"
 EMAIL_FROM = os.getenv("EMAIL_FROM", SMTP_USERNAME)
 EMAIL_TO = os.getenv("EMAIL_TO", "").split(",") if os.getenv("EMAIL_TO") else []
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "2"))
+# off: un email por alerta; session: las alertas de la ventana comparten sesión; digest: un solo email resumen
+EMAIL_BATCH_MODE = os.getenv("EMAIL_BATCH_MODE", "off").lower()
+EMAIL_BATCH_WINDOW_MS = float(os.getenv("EMAIL_BATCH_WINDOW_MS", "500"))
+EMAIL_BATCH_MAX = int(os.getenv("EMAIL_BATCH_MAX", "50"))
+
+# Per-channel time budgets for /notify
+DB_TIMEOUT_SEC = float(os.getenv("DB_TIMEOUT_SEC", "5"))
+SLACK_TIMEOUT_SEC = float(os.getenv("SLACK_TIMEOUT_SEC", "5"))
+SNS_TIMEOUT_SEC = float(os.getenv("SNS_TIMEOUT_SEC", "5"))
+EMAIL_TIMEOUT_SEC = float(os.getenv("EMAIL_TIMEOUT_SEC", "10"))
+CHANNEL_THREADS = int(os.getenv("CHANNEL_THREADS", "16"))
+# Alertas SNS agrupadas en PublishBatch (hasta 10 por llamada) en su propio pool de hilos
+SNS_BATCH_MAX = int(os.getenv("SNS_BATCH_MAX", "10"))
+SNS_BATCH_LINGER_MS = float(os.getenv("SNS_BATCH_LINGER_MS", "50"))
+SNS_THREADS = int(os.getenv("SNS_THREADS", "4"))
+# Endpoint alternativo para SNS, p.ej. un moto_server local
+SNS_ENDPOINT_URL = os.getenv("SNS_ENDPOINT_URL", "") or None
 
 # Initialize AWS SNS client
-sns_client = boto3.client('sns', region_name=AWS_REGION) if SNS_TOPIC_ARN else None
+sns_client = boto3.client('sns', region_name=AWS_REGION, endpoint_url=SNS_ENDPOINT_URL) if SNS_TOPIC_ARN else None
+sns_batcher = SNSBatcher(sns_client, SNS_TOPIC_ARN, max_batch=SNS_BATCH_MAX, linger=SNS_BATCH_LINGER_MS / 1000,
+                         threads=SNS_THREADS) if sns_client else None
+
+# Blocking clients (requests) run here so they never stall the event loop; SNS has its own pool
+channel_executor = ThreadPoolExecutor(max_workers=CHANNEL_THREADS, thread_name_prefix="channel")
+http_session = requests.Session()
+slack_retry_until = 0.0  # time.monotonic() until which Slack asked us to back off
+
+# Long-lived SMTP sessions: connect, STARTTLS and AUTH once instead of per alert
+smtp_pool = SMTPPool(SMTP_HOST, SMTP_PORT, username=SMTP_USERNAME, password=SMTP_PASSWORD,
+                     start_tls=SMTP_USE_TLS, size=SMTP_POOL_SIZE, timeout=EMAIL_TIMEOUT_SEC)
+email_batcher = EmailBatcher(smtp_pool, lambda payloads: create_digest_email(payloads), mode=EMAIL_BATCH_MODE,
+                             window=EMAIL_BATCH_WINDOW_MS / 1000, max_batch=EMAIL_BATCH_MAX) if EMAIL_BATCH_MODE in ("session", "digest") else None
 
 @app.get("/health")
 async def health():
@@ -51,153 +199,390 @@ async def config():
         "database_configured": bool(DB_ENABLED and DB_DSN),
         "email_recipients": len(EMAIL_TO) if EMAIL_TO else 0,
         "smtp_host": SMTP_HOST if EMAIL_TO else None,
-        "smtp_port": SMTP_PORT if EMAIL_TO else None
+        "smtp_port": SMTP_PORT if EMAIL_TO else None,
+        "email_batch_mode": EMAIL_BATCH_MODE,
+        "sns_batches": sns_batcher.stats() if sns_batcher else None,
+        "smtp_sessions": smtp_pool.stats()
     }
 
+@app.get("/db/stats")
+async def db_stats():
+    """Connection pool saturation and acquire wait times"""
+    if db is None:
+        return {"configured": False}
+    return {"configured": True, **db.stats(), "writer": writer.stats(),
+            "deliveries": workers.stats() if workers else {}}
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: channel latency and outcomes, in-flight work, DB timings"""
+    body = METRICS.render(db=db, writer=writer, workers=workers, trace_log=trace_log, sns=sns_batcher)
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+@app.get("/coalesce/stats")
+async def coalesce_stats():
+    """Coalescing decisions and open digests"""
+    if coalescer is None:
+        return {"enabled": False}
+    return {"enabled": True, **coalescer.stats()}
+
 @app.get("/notifications")
-async def get_notifications(limit: int = 50):
-    """Get recent notifications from database"""
+async def get_notifications(limit: int = 50, cursor: Optional[str] = None, service: Optional[str] = None,
+                            status: Optional[str] = None, since: Optional[str] = None, until: Optional[str] = None):
+    """Get notifications from database, newest first, one keyset page at a time"""
+    limit = max(1, min(limit, 1000))
     try:
-        conn = await asyncpg.connect(dsn=DB_DSN, timeout=5)
-        
-        rows = await conn.fetch("""
-            SELECT id, service_name, status, message, latency_ms, 
-                   http_shallow_status, http_deep_status, 
-                   timestamp_event, timestamp_notified
-            FROM notifications 
-            ORDER BY timestamp_notified DESC 
-            LIMIT $1
-        """, limit)
-        
-        await conn.close()
+        filters = {"service": service, "status": status,
+                   "since": parse_time_param(since), "until": parse_time_param(until),
+                   "before": decode_cursor(cursor)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        sql, args = select_page(limit, **filters)
+        async with db_connection() as conn:
+            rows = await conn.fetch(sql, *args)
         
-        notifications = []
-        for row in rows:
-            notifications.append({
-                "id": row['id'],
-                "service_name": row['service_name'],
-                "status": row['status'],
-                "message": row['message'],
-                "latency_ms": row['latency_ms'],
-                "http_shallow_status": row['http_shallow_status'],
-                "http_deep_status": row['http_deep_status'],
-                "timestamp_event": row['timestamp_event'].isoformat(),
-                "timestamp_notified": row['timestamp_notified'].isoformat()
-            })
+        notifications = [notification_to_dict(row) for row in rows]
         
         return {
             "notifications": notifications,
-            "count": len(notifications)
+            "count": len(notifications),
+            "next_cursor": encode_cursor(rows[-1]) if len(rows) == limit else None
         }
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
+class ClosingStreamingResponse(StreamingResponse):
+    """StreamingResponse that closes its body generator on every path, client disconnects included"""
+    
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.body_iterator.aclose()
+
+EXPORT_FIELDS = ["id", "service_name", "status", "message", "latency_ms", "http_shallow_status",
+                 "http_deep_status", "timestamp_event", "timestamp_notified"]
+
+@app.get("/notifications/export")
+async def export_notifications(format: str = "ndjson", service: Optional[str] = None, status: Optional[str] = None,
+                               since: Optional[str] = None, until: Optional[str] = None, include_payload: bool = False):
+    """Stream every matching notification, oldest first, as NDJSON or CSV"""
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="format must be ndjson or csv")
+    try:
+        filters = {"service": service, "status": status,
+                   "since": parse_time_param(since), "until": parse_time_param(until)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    sql, args = select_export(include_payload, **filters)
+    fields = EXPORT_FIELDS + (["payload"] if include_payload else [])
+    
+    async def rows_as_text():
+        # Server-side cursor: rows come in chunks of EXPORT_PREFETCH, memory stays flat
+        async with db_connection() as conn:
+            async with conn.transaction(readonly=True):
+                cursor = await conn.cursor(sql, *args)
+                yield ""  # cursor abierto: desde aquí un error corta el stream
+                buffer = io.StringIO()
+                out = csv.writer(buffer) if format == "csv" else None
+                if out:
+                    out.writerow(fields)
+                while rows := await cursor.fetch(EXPORT_PREFETCH):
+                    for row in rows:
+                        record = notification_to_dict(row)
+                        if include_payload:
+                            record["payload"] = row['payload']
+                        if out:
+                            out.writerow([record[f] for f in fields])
+                        else:
+                            if include_payload and record["payload"] is not None:
+                                record["payload"] = json.loads(record["payload"])
+                            buffer.write(json.dumps(record) + "\n")
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+                yield buffer.getvalue()
+    
+    # The cursor is opened before the response starts so a database error is still a 500;
+    # the generator owns the connection and the response always closes it
+    body = rows_as_text()
+    try:
+        await body.__anext__()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return ClosingStreamingResponse(body, media_type=media_type,
+                                    headers={"Content-Disposition": f"attachment; filename=notifications.{format}"})
+
 @app.get("/notifications/stats")
-async def get_notification_stats():
-    """Get notification statistics"""
+async def get_notification_stats(window: str = "24h"):
+    """Get notification statistics from the per-minute rollups (window: 90s, 15m, 6h, 7d...)"""
     try:
-        conn = await asyncpg.connect(dsn=DB_DSN, timeout=5)
-        
-        # Get counts by status
-        status_counts = await conn.fetch("""
-            SELECT status, COUNT(*) as count
-            FROM notifications
-            WHERE timestamp_notified >= NOW() - INTERVAL '24 hours'
-            GROUP BY status
-            ORDER BY count DESC
-        """)
-        
-        # Get recent activity
-        recent_count = await conn.fetchval("""
-            SELECT COUNT(*)
-            FROM notifications
-            WHERE timestamp_notified >= NOW() - INTERVAL '1 hour'
-        """)
-        
-        # Get total notifications
-        total_count = await conn.fetchval("SELECT COUNT(*) FROM notifications")
+        window_sec = parse_window(window)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid window: {window}")
+    
+    # El caché guarda solo los números; la etiqueta "window" es la de cada petición
+    cached = stats_cache.get(window_sec)
+    if cached and cached[0] > time.monotonic():
+        return {**cached[1], "window": window}
+    
+    try:
+        async with db_connection() as conn:
+            # Get total notifications
+            total_count = await conn.fetchval(SELECT_TOTAL)
+            
+            # Get counts by status and service for each window
+            day = await conn.fetch(SELECT_WINDOW, 86400.0)
+            hour = await conn.fetch(SELECT_WINDOW, 3600.0)
+            rows = day if window_sec == 86400 else await conn.fetch(SELECT_WINDOW, float(window_sec))
         
-        await conn.close()
+        by_status, by_service = {}, {}
+        for row in rows:
+            by_status[row['status']] = by_status.get(row['status'], 0) + row['count']
+            by_service[row['service_name']] = by_service.get(row['service_name'], 0) + row['count']
+        last_24h = {}
+        for row in day:
+            last_24h[row['status']] = last_24h.get(row['status'], 0) + row['count']
         
         stats = {
             "total_notifications": total_count,
-            "last_24h_by_status": {row['status']: row['count'] for row in status_counts},
-            "last_hour_count": recent_count
+            "last_24h_by_status": dict(sorted(last_24h.items(), key=lambda kv: -kv[1])),
+            "last_hour_count": sum(row['count'] for row in hour),
+            "window_seconds": window_sec,
+            "window_count": sum(by_status.values()),
+            "window_by_status": by_status,
+            "window_by_service": by_service
         }
+        stats_cache[window_sec] = (time.monotonic() + STATS_CACHE_TTL_SEC, stats)
+        if len(stats_cache) > 64:
+            stats_cache.clear()
         
-        return stats
+        return {**stats, "window": window}
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
+@app.get("/notifications/{notification_id}")
+async def get_notification(notification_id: int):
+    """Get one notification and the delivery status of each channel"""
+    try:
+        async with db_connection() as conn:
+            row = await conn.fetchrow(SELECT_NOTIFICATION, notification_id)
+            deliveries = await conn.fetch(SELECT_DELIVERIES, notification_id) if row else []
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    
+    if row is None:
+        raise HTTPException(status_code=404, detail="Notification not found")
+    
+    channels = [{
+        "channel": d['channel'],
+        "state": d['state'],
+        "attempts": d['attempts'],
+        "next_attempt_at": d['next_attempt_at'].isoformat() if d['state'] in ("pending", "in_progress") else None,
+        "last_error": d['last_error'],
+        "result": json.loads(d['result']) if d['result'] else None,
+        "updated_at": d['updated_at'].isoformat()
+    } for d in deliveries]
+    states = {d["state"] for d in channels}
+    if not channels:
+        # Sin filas de entrega (modo inline o aún sin encolar) no hay nada que confirmar
+        delivery_status = "not_queued"
+    elif "dead" in states:
+        delivery_status = "dead"
+    elif states & {"pending", "in_progress"}:
+        delivery_status = "pending"
+    elif all(d["state"] == "delivered" and d["attempts"] > 0 and (d["result"] or {}).get("success")
+             for d in channels):
+        delivery_status = "delivered"
+    else:
+        delivery_status = "unknown"
+    
+    return {**notification_to_dict(row), "delivery_status": delivery_status, "deliveries": channels}
+
 @app.post("/notify")
-async def notify(payload: dict):
+async def notify(payload: dict, mode: Optional[str] = None, x_trace_id: Optional[str] = Header(None)):
     """
     Envía notificaciones via Slack, SNS y/o Email y guarda en base de datos
+
+    Con NOTIFY_MODE=queue (o ?mode=queue) guarda el evento, responde 202 y
+    los canales se entregan desde la cola. El trace_id (cabecera X-Trace-Id,
+    campo trace_id del payload o uno nuevo) viaja en el payload guardado y en
+    el resultado de cada canal.
     """
-    logger.info(f"🔔 Received notification request: {json.dumps(payload, indent=2)}")
+    start = time.perf_counter()
+    trace_id = x_trace_id or payload.get('trace_id') or new_trace_id()
+    payload['trace_id'] = trace_id
+    mode = mode or NOTIFY_MODE
     
+    # El finally descuenta la petición pase lo que pase desde aquí
+    METRICS.notify_in_flight += 1
     try:
-        message = format_message(payload)
-        results = {}
-        logger.info(f"📝 Formatted message: {message}")
-        
-        # Save to database if enabled and configured
-        if DB_ENABLED and DB_DSN:
-            logger.info("💾 Database is enabled, saving notification...")
-            db_result = await save_notification_to_db(payload)
-            results["database"] = db_result
-            logger.info(f"💾 Database result: {db_result}")
-        else:
-            logger.info("💾 Database is disabled")
-        
-        # Send to Slack if configured
-        if SLACK_WEBHOOK_URL:
-            logger.info("📱 Slack webhook configured, sending notification...")
-            slack_result = await send_slack_notification(message, payload)
-            results["slack"] = slack_result
-            logger.info(f"📱 Slack result: {slack_result}")
-        else:
-            logger.info("📱 Slack webhook not configured")
-        
-        # Send to SNS if configured
-        if sns_client and SNS_TOPIC_ARN:
-            logger.info("📨 SNS configured, sending notification...")
-            sns_result = await send_sns_notification(message, payload)
-            results["sns"] = sns_result
-            logger.info(f"📨 SNS result: {sns_result}")
-        else:
-            logger.info("📨 SNS not configured")
+        # Duplicates and rate-limited bursts skip the channels; the event is still stored
+        decision = coalescer.offer(payload) if coalescer else {"action": "send"}
+        send_channels = decision["action"] == "send"
+        METRICS.count_coalesced(decision["action"])
+        trace = {"event": "notify", "trace_id": trace_id, "mode": mode,
+                 "service": payload.get('service', 'unknown'), "status": payload.get('status', 'unknown'),
+                 "coalesce": decision["action"]}
+        
+        if mode == "queue":
+            if workers is None:
+                raise HTTPException(status_code=503, detail="Delivery queue requires DB_DSN")
+            channels = workers.channels if send_channels else []
+            try:
+                notification_id = await workers.enqueue(notification_record(payload), channels)
+            except Exception as e:
+                trace_log.emit({**trace, "error": f"Database error: {e}"}, error=True)
+                raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+            if decision["action"] == "held":
+                # El digest se entregará colgado del último evento retenido
+                queued_digests[trace["service"]] = notification_id
+            content = {
+                "status": "queued",
+                "id": notification_id,
+                "trace_id": trace_id,
+                "timestamp": int(time.time()),
+                "channels": channels
+            }
+            if not send_channels:
+                content["coalesced"] = decision
+            trace_log.emit({**trace, "id": notification_id, "channels": channels,
+                            "duration_ms": round((time.perf_counter() - start) * 1000, 1)})
+            return JSONResponse(status_code=202, content=content)
+        
+        try:
+            message = format_message(payload)
+            results = {}
             
-        # Send Email if configured
-        logger.info(f"📧 Checking email configuration:")
-        logger.info(f"📧 EMAIL_TO: {EMAIL_TO}")
-        logger.info(f"📧 SMTP_USERNAME: {SMTP_USERNAME}")
-        logger.info(f"📧 SMTP_PASSWORD: {'***' if SMTP_PASSWORD else 'NOT_SET'}")
-        
-        if EMAIL_TO and SMTP_USERNAME and SMTP_PASSWORD:
-            logger.info("📧 Email is configured, sending notification...")
-            email_result = await send_email_notification(message, payload)
-            results["email"] = email_result
-            logger.info(f"📧 Email result: {email_result}")
-        else:
-            logger.warning("📧 Email not properly configured!")
-            logger.warning(f"📧 EMAIL_TO present: {bool(EMAIL_TO)}")
-            logger.warning(f"📧 SMTP_USERNAME present: {bool(SMTP_USERNAME)}")
-            logger.warning(f"📧 SMTP_PASSWORD present: {bool(SMTP_PASSWORD)}")
-            results["email"] = {"success": False, "error": "Email not configured"}
+            # Every configured channel runs concurrently with its own time budget
+            jobs = {}
+            if DB_ENABLED and DB_DSN:
+                jobs["database"] = (save_notification_to_db(payload), DB_TIMEOUT_SEC)
+            if send_channels:
+                for name, (send, timeout) in configured_channels().items():
+                    jobs[name] = (send(message, payload), timeout)
+            else:
+                results["coalesced"] = decision
             
-        logger.info(f"✅ Notification processing completed. Results: {results}")
-        
-        return {
-            "status": "sent",
-            "timestamp": int(time.time()),
-            "results": results
-        }
-        
+            if send_channels and "email" not in jobs:
+                results["email"] = {"success": False, "error": "Email not configured"}
+            
+            for done in asyncio.as_completed([run_channel(name, coro, timeout, trace_id)
+                                              for name, (coro, timeout) in jobs.items()]):
+                name, result = await done
+                results[name] = result
+            
+            # Any failed channel keeps the trace regardless of sampling
+            trace_log.emit({**trace, "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+                            "results": {name: {k: results[name].get(k) for k in ("success", "duration_ms", "error")
+                                               if k in results[name]} for name in jobs}},
+                           error=any(not results[name].get("success") for name in jobs))
+            
+            return {
+                "status": "sent",
+                "trace_id": trace_id,
+                "timestamp": int(time.time()),
+                "results": results
+            }
+            
+        except Exception as e:
+            trace_log.emit({**trace, "error": str(e)}, error=True)
+            raise HTTPException(status_code=500, detail=f"Notification failed: {str(e)}")
+    finally:
+        METRICS.notify_in_flight -= 1
+        METRICS.observe_notify(mode, time.perf_counter() - start)
+
+def email_misconfigured():
+    """Email is partially configured or not at all"""
+    return not (EMAIL_TO and SMTP_USERNAME and SMTP_PASSWORD)
+
+def configured_channels():
+    """Outbound channels that are configured: name -> (sender, timeout in seconds)"""
+    channels = {}
+    if SLACK_WEBHOOK_URL:
+        channels["slack"] = (send_slack_notification, SLACK_TIMEOUT_SEC)
+    if sns_client and SNS_TOPIC_ARN:
+        channels["sns"] = (send_sns_notification, SNS_TIMEOUT_SEC)
+    if EMAIL_TO and SMTP_USERNAME and SMTP_PASSWORD:
+        channels["email"] = (send_email_notification, EMAIL_TIMEOUT_SEC)
+    return channels
+
+# Servicios cuyo digest abierto retiene eventos recibidos en modo cola
+queued_digests = {}  # service -> id of its latest event held in queue mode
+
+async def send_digest(payload):
+    """Send a coalesced digest (its events are already stored).
+
+    Digests of events received in queue mode go through the delivery queue
+    as deliveries of the latest held event, so they add no notification row;
+    the rest fan out to every channel inline.
+    """
+    start = time.perf_counter()
+    # The digest gets its own trace; the events it covers are in digest.trace_ids
+    trace_id = payload['trace_id'] = new_trace_id()
+    service = payload.get('service', 'unknown')
+    anchor_id = queued_digests.pop(service, None)
+    trace = {"event": "digest", "trace_id": trace_id, "service": service,
+             "covers": payload['digest'].get('trace_ids', [])}
+    if anchor_id is not None and workers is not None:
+        try:
+            await workers.enqueue_for(anchor_id, compact_payload(payload, PAYLOAD_DROP_FIELDS))
+        except Exception as e:
+            trace_log.emit({**trace, "mode": "queue", "error": f"Database error: {e}"}, error=True)
+            raise
+        trace_log.emit({**trace, "mode": "queue", "id": anchor_id, "channels": workers.channels,
+                        "duration_ms": round((time.perf_counter() - start) * 1000, 1)})
+        return
+    message = format_message(payload)
+    results = dict(await asyncio.gather(*(run_channel(name, send(message, payload), timeout, trace_id)
+                                          for name, (send, timeout) in configured_channels().items())))
+    trace_log.emit({**trace, "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+                    "results": {name: {k: r.get(k) for k in ("success", "duration_ms", "error") if k in r}
+                                for name, r in results.items()}},
+                   error=any(not r.get("success") for r in results.values()))
+
+def channel_senders():
+    """Queue senders per configured channel: payload -> result, within the channel budget"""
+    async def deliver(name, send, timeout, payload):
+        _, result = await run_channel(name, send(format_message(payload), payload), timeout, payload.get('trace_id'))
+        trace_log.emit({"event": "delivery", "trace_id": payload.get('trace_id'), "channel": name,
+                        **{k: result.get(k) for k in ("success", "duration_ms", "error") if k in result}},
+                       error=not result.get("success"))
+        return result
+    return {name: functools.partial(deliver, name, send, timeout)
+            for name, (send, timeout) in configured_channels().items()}
+
+async def run_channel(name, coro, timeout, trace_id=None):
+    """Await one channel within its budget; returns (name, result) with the elapsed time and trace ID"""
+    start = time.perf_counter()
+    METRICS.channel_started(name)
+    outcome = "failure"
+    try:
+        result = await asyncio.wait_for(coro, timeout)
+        if result.get("success"):
+            outcome = "success"
+    except asyncio.TimeoutError:
+        result = {"success": False, "error": f"Timed out after {timeout}s"}
+        outcome = "timeout"
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Notification failed: {str(e)}")
+        result = {"success": False, "error": str(e)}
+    elapsed = time.perf_counter() - start
+    METRICS.channel_finished(name, elapsed, outcome)
+    result["duration_ms"] = round(elapsed * 1000, 1)
+    if trace_id:
+        result["trace_id"] = trace_id
+    return name, result
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking client call (requests, boto3) on the channel thread pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(channel_executor, functools.partial(func, *args, **kwargs))
 
 def format_message(payload):
     """Format message for notifications"""
@@ -207,62 +592,109 @@ def format_message(payload):
     
     emoji = {"ok": "✅", "degradation": "⚠️", "failure": "🚨"}.get(status, "❓")
     
-    return f"{emoji} Service: {service} | Status: {status.upper()} | Latency: {latency_ms}ms"
+    text = f"{emoji} Service: {service} | Status: {status.upper()} | Latency: {latency_ms}ms"
+    digest = payload.get('digest')
+    if digest:
+        counts = ", ".join(f"{n} {s}" for s, n in digest.get('statuses', {}).items())
+        text += f" | {digest.get('count')} events coalesced ({counts})"
+    return text
+
+def parse_window(window):
+    """'90s' | '15m' | '6h' | '7d' | plain seconds -> whole seconds"""
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    window = window.strip().lower()
+    if window and window[-1] in units:
+        seconds = float(window[:-1]) * units[window[-1]]
+    else:
+        seconds = float(window)
+    if not 0 < seconds <= 366 * 86400:
+        raise ValueError(window)
+    return int(seconds)
+
+def parse_time_param(value):
+    """Query time bound: epoch seconds or ISO 8601 -> aware datetime (None passes through)"""
+    if not value:
+        return None
+    try:
+        return datetime.datetime.fromtimestamp(float(value), datetime.timezone.utc)
+    except ValueError:
+        pass
+    try:
+        parsed = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f"Invalid time: {value}")
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=datetime.timezone.utc)
+
+def encode_cursor(row):
+    """Opaque keyset cursor for the (timestamp_notified, id) of the last row of a page"""
+    raw = json.dumps([row['timestamp_notified'].isoformat(), row['id']])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        ts, notification_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.datetime.fromisoformat(ts), int(notification_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def db_connection():
+    """Pooled connection with the schema in place"""
+    if db is None:
+        raise RuntimeError("DB_DSN not configured")
+    return db.connection()
+
+def parse_event_timestamp(event_timestamp):
+    """Event time from the payload (ISO string or epoch), or now"""
+    if not event_timestamp:
+        return datetime.datetime.now(datetime.timezone.utc)
+    if isinstance(event_timestamp, str):
+        return datetime.datetime.fromisoformat(event_timestamp.replace('Z', '+00:00'))
+    return datetime.datetime.fromtimestamp(event_timestamp, datetime.timezone.utc)
+
+def notification_to_dict(row):
+    """API representation of a notifications row"""
+    return {
+        "id": row['id'],
+        "service_name": row['service_name'],
+        "status": row['status'],
+        "message": row['message'],
+        "latency_ms": row['latency_ms'],
+        "http_shallow_status": row['http_shallow_status'],
+        "http_deep_status": row['http_deep_status'],
+        "timestamp_event": row['timestamp_event'].isoformat(),
+        "timestamp_notified": row['timestamp_notified'].isoformat()
+    }
+
+def notification_record(payload):
+    """Row of the notifications table for `payload`, in NOTIFICATION_COLUMNS order"""
+    # Extract data from payload
+    service_name = payload.get('service', 'unknown')
+    status = payload.get('status', 'unknown')
+    message = payload.get('message', '')
+    latency_ms = payload.get('latency_ms', 0)
+    
+    # Extract HTTP status codes
+    http_info = payload.get('http', {})
+    http_shallow = http_info.get('shallow') if http_info else None
+    http_deep = http_info.get('deep') if http_info else None
+    
+    # Parse timestamp
+    event_ts = parse_event_timestamp(payload.get('timestamp'))
+    
+    return (service_name, status, message, latency_ms, http_shallow, http_deep, event_ts,
+            json.dumps(compact_payload(payload, PAYLOAD_DROP_FIELDS)))
 
 async def save_notification_to_db(payload):
     """Save notification event to database"""
     try:
-        conn = await asyncpg.connect(dsn=DB_DSN, timeout=5)
-        
-        # Create notifications table if it doesn't exist
-        await conn.execute("""
-            CREATE TABLE IF NOT EXISTS notifications (
-                id SERIAL PRIMARY KEY,
-                service_name VARCHAR(255) NOT NULL,
-                status VARCHAR(50) NOT NULL,
-                message TEXT,
-                latency_ms INTEGER,
-                http_shallow_status INTEGER,
-                http_deep_status INTEGER,
-                timestamp_event TIMESTAMP WITH TIME ZONE,
-                timestamp_notified TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-                payload JSONB
-            )
-        """)
-        
-        # Extract data from payload
-        service_name = payload.get('service', 'unknown')
-        status = payload.get('status', 'unknown')
-        message = payload.get('message', '')
-        latency_ms = payload.get('latency_ms', 0)
-        
-        # Extract HTTP status codes
-        http_info = payload.get('http', {})
-        http_shallow = http_info.get('shallow') if http_info else None
-        http_deep = http_info.get('deep') if http_info else None
-        
-        # Parse timestamp
-        event_timestamp = payload.get('timestamp')
-        if event_timestamp:
-            # Convert from ISO string to timestamp
-            import datetime
-            if isinstance(event_timestamp, str):
-                event_ts = datetime.datetime.fromisoformat(event_timestamp.replace('Z', '+00:00'))
-            else:
-                event_ts = datetime.datetime.fromtimestamp(event_timestamp, datetime.timezone.utc)
-        else:
-            event_ts = datetime.datetime.now(datetime.timezone.utc)
-        
-        # Insert notification
-        await conn.execute("""
-            INSERT INTO notifications 
-            (service_name, status, message, latency_ms, http_shallow_status, http_deep_status, timestamp_event, payload)
-            VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
-        """, service_name, status, message, latency_ms, http_shallow, http_deep, event_ts, json.dumps(payload))
-        
-        await conn.close()
-        
-        return {"success": True, "message": "Saved to database"}
+        # Insert notification (batched with other concurrent requests)
+        if writer is None:
+            raise RuntimeError("DB_DSN not configured")
+        if await writer.write(notification_record(payload), wait=DB_WRITE_MODE != "async"):
+            return {"success": True, "message": "Saved to database"}
+        return {"success": True, "message": "Queued for database"}
         
     except Exception as e:
         return {"success": False, "error": f"Database error: {str(e)}"}
@@ -292,29 +724,34 @@ async def send_slack_notification(message, payload):
             ]
         }
         
-        response = requests.post(SLACK_WEBHOOK_URL, json=slack_payload, timeout=5)
+        # Honor Slack's Retry-After instead of hammering the webhook while rate limited
+        global slack_retry_until
+        wait = slack_retry_until - time.monotonic()
+        if wait > 0:
+            return {"success": False, "status_code": 429, "error": "Slack rate limited", "retry_after": round(wait, 3)}
+        
+        response = await run_blocking(http_session.post, SLACK_WEBHOOK_URL, json=slack_payload, timeout=SLACK_TIMEOUT_SEC)
+        if response.status_code == 429:
+            try:
+                retry_after = float(response.headers.get("Retry-After", "1"))
+            except ValueError:
+                retry_after = 1.0
+            slack_retry_until = time.monotonic() + retry_after
+            return {"success": False, "status_code": 429, "error": "Slack rate limited", "retry_after": retry_after}
         return {"success": response.status_code == 200, "status_code": response.status_code}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
 async def send_sns_notification(message, payload):
-    """Send notification via AWS SNS"""
-    try:
-        response = sns_client.publish(
-            TopicArn=SNS_TOPIC_ARN,
-            Message=json.dumps(payload, indent=2),
-            Subject=message
-        )
-        return {"success": True, "message_id": response['MessageId']}
-    except ClientError as e:
-        return {"success": False, "error": str(e)}
+    """Send notification via AWS SNS (batched with other pending alerts)"""
+    return await sns_batcher.publish(json.dumps(payload, indent=2), subject=message)
 
 async def send_email_notification(message, payload):
     """Send notification via Email"""
-    logger.info("📧 Starting email notification process...")
+    logger.debug("📧 Starting email notification process...")
     
     try:
-        logger.info(f"📧 Creating email message for recipients: {EMAIL_TO}")
+        logger.debug(f"📧 Creating email message for recipients: {EMAIL_TO}")
         
         # Create message
         msg = MIMEMultipart('alternative')
@@ -322,9 +759,9 @@ async def send_email_notification(message, payload):
         msg['From'] = EMAIL_FROM
         msg['To'] = ", ".join(EMAIL_TO)
         
-        logger.info(f"📧 Email subject: {msg['Subject']}")
-        logger.info(f"📧 Email from: {msg['From']}")
-        logger.info(f"📧 Email to: {msg['To']}")
+        logger.debug(f"📧 Email subject: {msg['Subject']}")
+        logger.debug(f"📧 Email from: {msg['From']}")
+        logger.debug(f"📧 Email to: {msg['To']}")
         
         # Create HTML content
         html_content = create_email_html(payload, message)
@@ -332,7 +769,7 @@ async def send_email_notification(message, payload):
         # Create text content
         text_content = create_email_text(payload, message)
         
-        logger.info(f"📧 Email content created (HTML: {len(html_content)} chars, Text: {len(text_content)} chars)")
+        logger.debug(f"📧 Email content created (HTML: {len(html_content)} chars, Text: {len(text_content)} chars)")
         
         # Attach parts
         part1 = MIMEText(text_content, 'plain')
@@ -341,26 +778,63 @@ async def send_email_notification(message, payload):
         msg.attach(part1)
         msg.attach(part2)
         
-        logger.info(f"📧 Connecting to SMTP server: {SMTP_HOST}:{SMTP_PORT}")
-        
-        # Send email
-        await aiosmtplib.send(
-            msg,
-            hostname=SMTP_HOST,
-            port=SMTP_PORT,
-            start_tls=SMTP_USE_TLS,
-            username=SMTP_USERNAME,
-            password=SMTP_PASSWORD,
-        )
+        # Send email over a pooled SMTP session (batched when EMAIL_BATCH_MODE is set)
+        if email_batcher:
+            batch_info = await email_batcher.send(payload, msg)
+        else:
+            await smtp_pool.send(msg)
+            batch_info = {}
         
-        logger.info("📧 ✅ Email sent successfully!")
+        logger.debug("📧 ✅ Email sent successfully!")
         
-        return {"success": True, "recipients": len(EMAIL_TO)}
+        return {"success": True, "recipients": len(EMAIL_TO), **batch_info}
     except Exception as e:
-        logger.error(f"📧 ❌ Email sending failed: {str(e)}")
-        logger.error(f"📧 Exception type: {type(e).__name__}")
+        logger.error(f"📧 ❌ Email sending failed ({type(e).__name__}): {str(e)}")
         return {"success": False, "error": str(e)}
 
+def create_digest_email(payloads):
+    """Single email summarizing several alerts"""
+    counts = {}
+    for p in payloads:
+        status = p.get('status', 'unknown').upper()
+        counts[status] = counts.get(status, 0) + 1
+    summary = ", ".join(f"{n} {status}" for status, n in sorted(counts.items()))
+    
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = f"[MediSupply Alert] {len(payloads)} alerts: {summary}"
+    msg['From'] = EMAIL_FROM
+    msg['To'] = ", ".join(EMAIL_TO)
+    
+    lines = []
+    rows = []
+    for p in payloads:
+        status = p.get('status', 'unknown')
+        readable_time = time.strftime('%Y-%m-%d %H:%M:%S UTC', time.gmtime(p.get('ts', int(time.time()))))
+        lines.append(f"- {readable_time} | {p.get('service', 'Unknown')} | {status.upper()} | {p.get('latency_ms', 0)}ms")
+        emoji = {'ok': '✅', 'degradation': '⚠️', 'failure': '🚨'}.get(status, '❓')
+        rows.append(f"<tr><td>{readable_time}</td><td>{p.get('service', 'Unknown')}</td>"
+                    f"<td>{emoji} {status.upper()}</td><td>{p.get('latency_ms', 0)}ms</td></tr>")
+    
+    text = "MediSupply Availability Alert Digest\n\n" + "\n".join(lines) + \
+        "\n\nThis is an automated alert from the MediSupply Availability Monitoring System."
+    html = f"""
+    <!DOCTYPE html>
+    <html>
+    <head><meta charset="utf-8"><title>MediSupply Alert Digest</title></head>
+    <body style="font-family: Arial, sans-serif;">
+        <h2>MediSupply Alert Digest: {summary}</h2>
+        <table cellpadding="6" style="border-collapse: collapse;">
+            <tr><th align="left">Timestamp</th><th align="left">Service</th><th align="left">Status</th><th align="left">Latency</th></tr>
+            {"".join(rows)}
+        </table>
+        <p style="font-size: 12px; color: #6c757d;">This is an automated alert from the MediSupply Availability Monitoring System.</p>
+    </body>
+    </html>
+    """
+    msg.attach(MIMEText(text, 'plain'))
+    msg.attach(MIMEText(html, 'html'))
+    return msg
+
 def create_email_text(payload, message):
     """Create plain text email content"""
     service = payload.get('service', 'Unknown')
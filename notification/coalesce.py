@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class _ServiceState:
+    __slots__ = ("tokens", "refilled", "last_status", "last_sent", "held", "flush_at", "flush_handle", "seen")
+
+    def __init__(self, burst, now):
+        self.tokens = float(burst)
+        self.refilled = now
+        self.last_status = None
+        self.last_sent = float("-inf")
+        self.held = []
+        self.flush_at = None
+        self.flush_handle = None
+        self.seen = now
+
+
+class AlertCoalescer:
+    """Per-service gate between incoming events and the outbound channels.
+
+    For each event `offer` decides:
+
+    - "duplicate": same status as the last one sent for the service within
+      `dedup_window` seconds, nothing is sent;
+    - "send": a token was taken from the service's bucket (`burst` tokens,
+      refilled at `rate_per_min`), the caller fans it out as usual;
+    - "held": the bucket is empty, the event joins the service's digest,
+      which is emitted through `emit(payload)` once a token is available
+      and at least `digest_window` seconds after it opened.
+
+    A digest carries the latest event plus a `digest` summary (count per
+    status, first and last timestamp), so a flapping service produces one
+    notification per window instead of one per flap. Storage is not gated
+    here: callers record every event regardless of the decision.
+    """
+
+    def __init__(self, emit, dedup_window=60.0, rate_per_min=2.0, burst=5, digest_window=30.0,
+                 clock=time.monotonic):
+        self.emit = emit
+        self.dedup_window = dedup_window
+        self.rate = rate_per_min / 60.0
+        self.burst = burst
+        self.digest_window = digest_window
+        self._clock = clock
+        self._services = {}
+        self._emitting = set()
+        self._offers = 0
+        # Métricas
+        self.decisions = {"send": 0, "duplicate": 0, "held": 0}
+        self.digests = 0
+
+    def _state(self, service, now):
+        st = self._services.get(service)
+        if st is None:
+            st = self._services[service] = _ServiceState(self.burst, now)
+        st.seen = now
+        return st
+
+    def _refill(self, st, now):
+        st.tokens = min(float(self.burst), st.tokens + (now - st.refilled) * self.rate)
+        st.refilled = now
+
+    def offer(self, payload):
+        now = self._clock()
+        service = payload.get("service", "unknown")
+        status = payload.get("status", "unknown")
+        st = self._state(service, now)
+        self._offers += 1
+        if self._offers % 1000 == 0:
+            self._prune(now)
+
+        if st.held:
+            st.held.append(payload)
+            return self._decide("held", digest_in_sec=round(st.flush_at - now, 3), digest_size=len(st.held))
+        if status == st.last_status and now - st.last_sent < self.dedup_window:
+            return self._decide("duplicate")
+        self._refill(st, now)
+        if st.tokens >= 1:
+            st.tokens -= 1
+            st.last_status, st.last_sent = status, now
+            return self._decide("send")
+
+        st.held = [payload]
+        wait_token = (1 - st.tokens) / self.rate if self.rate else self.digest_window
+        delay = max(self.digest_window, wait_token)
+        st.flush_at = now + delay
+        st.flush_handle = asyncio.get_running_loop().call_later(delay, self._flush, service)
+        return self._decide("held", digest_in_sec=round(delay, 3), digest_size=1)
+
+    def _decide(self, action, **extra):
+        self.decisions[action] += 1
+        return {"action": action, **extra}
+
+    def _flush(self, service):
+        st = self._services.get(service)
+        if st is None or not st.held:
+            return
+        held, st.held = st.held, []
+        st.flush_at = st.flush_handle = None
+        now = self._clock()
+        self._refill(st, now)
+        st.tokens = max(0.0, st.tokens - 1)
+        digest = self.build_digest(held)
+        st.last_status, st.last_sent = digest.get("status"), now
+        self.digests += 1
+        task = asyncio.ensure_future(self._emit(digest))
+        self._emitting.add(task)
+        task.add_done_callback(self._emitting.discard)
+
+    async def _emit(self, digest):
+        try:
+            await self.emit(digest)
+        except Exception as e:
+            logger.error(f"🧮 Digest for {digest.get('service')} failed: {e}")
+
+    @staticmethod
+    def build_digest(held):
+        latest = held[-1]
+        counts = {}
+        for p in held:
+            status = p.get("status", "unknown")
+            counts[status] = counts.get(status, 0) + 1
+        stamps = [p.get("ts") for p in held if p.get("ts") is not None]
+        return {
+            **latest,
+            "digest": {
+                "count": len(held),
+                "statuses": counts,
+                "first_ts": min(stamps) if stamps else None,
+                "last_ts": max(stamps) if stamps else None,
+                "trace_ids": [p["trace_id"] for p in held if "trace_id" in p],
+            },
+        }
+
+    def _prune(self, now):
+        horizon = max(self.dedup_window, self.digest_window, self.burst / self.rate if self.rate else 0)
+        for service in [s for s, st in self._services.items() if not st.held and now - st.seen > horizon]:
+            del self._services[service]
+
+    async def close(self):
+        """Emit every open digest now and wait for the emissions."""
+        for service, st in list(self._services.items()):
+            if st.held:
+                st.flush_handle.cancel()
+                self._flush(service)
+        if self._emitting:
+            await asyncio.gather(*self._emitting, return_exceptions=True)
+
+    def stats(self):
+        return {
+            "services": len(self._services),
+            "open_digests": sum(1 for st in self._services.values() if st.held),
+            "decisions": dict(self.decisions),
+            "digests": self.digests,
+        }
@@ -0,0 +1,573 @@
+import asyncio
+import datetime
+import logging
+import time
+from contextlib import asynccontextmanager
+
+import asyncpg
+
+from metrics import DB_BUCKETS, Histogram
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = ["""
+    CREATE SEQUENCE IF NOT EXISTS notifications_id_seq AS integer
+""", """
+    CREATE TABLE IF NOT EXISTS notifications (
+        id INTEGER NOT NULL DEFAULT nextval('notifications_id_seq'),
+        service_name VARCHAR(255) NOT NULL,
+        status VARCHAR(50) NOT NULL,
+        message TEXT,
+        latency_ms INTEGER,
+        http_shallow_status INTEGER,
+        http_deep_status INTEGER,
+        timestamp_event TIMESTAMP WITH TIME ZONE,
+        timestamp_notified TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+        payload JSONB,
+        PRIMARY KEY (id, timestamp_notified)
+    ) PARTITION BY RANGE (timestamp_notified)
+""", """
+    ALTER SEQUENCE notifications_id_seq OWNED BY notifications.id
+""", """
+    CREATE TABLE IF NOT EXISTS notifications_default PARTITION OF notifications DEFAULT
+""", """
+    CREATE TABLE IF NOT EXISTS notification_deliveries (
+        id BIGSERIAL PRIMARY KEY,
+        notification_id INTEGER NOT NULL,
+        channel VARCHAR(20) NOT NULL,
+        state VARCHAR(20) NOT NULL DEFAULT 'pending',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_attempt_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+        last_error TEXT,
+        result JSONB,
+        created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+        updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+        UNIQUE (notification_id, channel)
+    )
+""", """
+    ALTER TABLE notification_deliveries ADD COLUMN IF NOT EXISTS payload JSONB
+""", """
+    CREATE INDEX IF NOT EXISTS notification_deliveries_due_idx
+    ON notification_deliveries (channel, next_attempt_at)
+    WHERE state IN ('pending', 'in_progress')
+""", """
+    CREATE INDEX IF NOT EXISTS notifications_notified_id_idx ON notifications (timestamp_notified, id)
+""", """
+    DROP INDEX IF EXISTS notifications_notified_idx
+""", """
+    CREATE INDEX IF NOT EXISTS notifications_service_notified_id_idx
+    ON notifications (service_name, timestamp_notified, id)
+""", """
+    CREATE TABLE IF NOT EXISTS notification_rollups (
+        minute TIMESTAMP WITH TIME ZONE NOT NULL,
+        service_name VARCHAR(255) NOT NULL,
+        status VARCHAR(50) NOT NULL,
+        count BIGINT NOT NULL,
+        PRIMARY KEY (minute, service_name, status)
+    )
+""", """
+    CREATE TABLE IF NOT EXISTS notification_totals (
+        service_name VARCHAR(255) NOT NULL,
+        status VARCHAR(50) NOT NULL,
+        count BIGINT NOT NULL,
+        PRIMARY KEY (service_name, status)
+    )
+""", """
+    CREATE OR REPLACE FUNCTION notification_rollup() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO notification_rollups (minute, service_name, status, count)
+        SELECT date_trunc('minute', timestamp_notified), service_name, status, COUNT(*)
+        FROM new_rows GROUP BY 1, 2, 3
+        ON CONFLICT (minute, service_name, status)
+        DO UPDATE SET count = notification_rollups.count + EXCLUDED.count;
+        INSERT INTO notification_totals (service_name, status, count)
+        SELECT service_name, status, COUNT(*)
+        FROM new_rows GROUP BY 1, 2
+        ON CONFLICT (service_name, status)
+        DO UPDATE SET count = notification_totals.count + EXCLUDED.count;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+"""]
+
+# Contadores por minuto mantenidos por un trigger de sentencia: un INSERT o
+# un COPY de N filas hace un solo upsert agregado, no N.
+ROLLUP_TRIGGER_EXISTS = "SELECT 1 FROM pg_trigger WHERE tgname = 'notifications_rollup'"
+
+ROLLUP_TRIGGER = """
+    CREATE TRIGGER notifications_rollup
+    AFTER INSERT ON notifications
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notification_rollup()
+"""
+
+# Migración: rollups de las filas que ya existían antes del trigger
+ROLLUP_BACKFILL = ["""
+    INSERT INTO notification_rollups (minute, service_name, status, count)
+    SELECT date_trunc('minute', timestamp_notified), service_name, status, COUNT(*)
+    FROM notifications GROUP BY 1, 2, 3
+    ON CONFLICT (minute, service_name, status) DO UPDATE SET count = EXCLUDED.count
+""", """
+    INSERT INTO notification_totals (service_name, status, count)
+    SELECT service_name, status, COUNT(*)
+    FROM notifications GROUP BY 1, 2
+    ON CONFLICT (service_name, status) DO UPDATE SET count = EXCLUDED.count
+"""]
+
+# notifications está particionada por día de timestamp_notified. Las
+# particiones se crean por adelantado y la retención borra particiones
+# enteras (DROP TABLE) en lugar de filas; notifications_default recoge
+# lo que llegue fuera de rango hasta que exista su partición.
+TABLE_KIND = "SELECT relkind FROM pg_class WHERE oid = to_regclass('notifications')"
+
+LIST_PARTITIONS = """
+    SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'notifications'::regclass
+"""
+
+DEFAULT_HAS_ROWS = """
+    SELECT EXISTS (SELECT 1 FROM notifications_default
+                   WHERE timestamp_notified >= $1 AND timestamp_notified < $2)
+"""
+
+# Migración desde la tabla sin particionar: se renombra junto con los nombres
+# que la tabla nueva reutiliza (pkey, índices, secuencia de id).
+LEGACY_RENAME = [
+    "ALTER TABLE notifications RENAME TO notifications_legacy",
+    "ALTER TABLE notifications_legacy RENAME CONSTRAINT notifications_pkey TO notifications_legacy_pkey",
+    "DROP INDEX IF EXISTS notifications_notified_id_idx",
+    "DROP INDEX IF EXISTS notifications_service_notified_id_idx",
+    "ALTER SEQUENCE IF EXISTS notifications_id_seq OWNED BY NONE",
+]
+
+LEGACY_START = "SELECT min(timestamp_notified) FROM notifications_legacy WHERE timestamp_notified >= $1"
+
+# Copia conservando los id y con el payload ya compactado
+LEGACY_COPY = """
+    INSERT INTO notifications
+    (id, service_name, status, message, latency_ms, http_shallow_status, http_deep_status,
+     timestamp_event, timestamp_notified, payload)
+    SELECT id, service_name, status, message, latency_ms, http_shallow_status, http_deep_status,
+           timestamp_event, timestamp_notified, payload - $2::text[]
+    FROM notifications_legacy
+    WHERE timestamp_notified >= $1
+"""
+
+PAYLOAD_COMPRESSION = """
+    SELECT CASE attcompression WHEN 'l' THEN 'lz4' WHEN 'p' THEN 'pglz' END
+    FROM pg_attribute WHERE attrelid = 'notifications'::regclass AND attname = 'payload'
+"""
+
+# La retención también poda los rollups y descuenta de los totales lo que
+# se borra, para que /notifications/stats no cuente filas que ya no existen.
+# El corte es un límite de día, así que coincide con los minutos de los rollups.
+PURGE_EXPIRED = [
+    "DELETE FROM notifications_default WHERE timestamp_notified < $1",
+    "DELETE FROM notification_deliveries WHERE created_at < $1",
+    """
+    WITH expired AS (
+        DELETE FROM notification_rollups WHERE minute < $1
+        RETURNING service_name, status, count
+    ), dropped AS (
+        SELECT service_name, status, SUM(count) AS count FROM expired GROUP BY 1, 2
+    )
+    UPDATE notification_totals t SET count = GREATEST(t.count - d.count, 0)
+    FROM dropped d
+    WHERE t.service_name = d.service_name AND t.status = d.status
+    """,
+]
+
+NOTIFICATION_COLUMNS = (
+    "service_name", "status", "message", "latency_ms", "http_shallow_status",
+    "http_deep_status", "timestamp_event", "payload",
+)
+
+INSERT_NOTIFICATION = """
+    INSERT INTO notifications
+    (service_name, status, message, latency_ms, http_shallow_status, http_deep_status, timestamp_event, payload)
+    VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+"""
+
+INSERT_NOTIFICATION_RETURNING_ID = INSERT_NOTIFICATION.rstrip() + " RETURNING id"
+
+SELECT_NOTIFICATION = """
+    SELECT id, service_name, status, message, latency_ms,
+           http_shallow_status, http_deep_status,
+           timestamp_event, timestamp_notified
+    FROM notifications
+    WHERE id = $1
+"""
+
+# Cola de entregas: una fila por (notificación, canal). Estados:
+# pending -> in_progress -> delivered | pending (reintento) | dead
+INSERT_DELIVERY = """
+    INSERT INTO notification_deliveries (notification_id, channel) VALUES ($1, $2)
+"""
+
+# Entrega con su propio payload (un digest) colgada de una notificación ya guardada:
+# el digest no es un evento nuevo y no cuenta en notifications ni en los rollups
+INSERT_DELIVERY_WITH_PAYLOAD = """
+    INSERT INTO notification_deliveries (notification_id, channel, payload) VALUES ($1, $2, $3)
+    ON CONFLICT (notification_id, channel) DO NOTHING
+"""
+
+# Reclama entregas vencidas sin bloquear a otras réplicas. Una entrega
+# in_progress cuyo lease venció (worker caído) vuelve a ser reclamable.
+CLAIM_DELIVERIES = """
+    UPDATE notification_deliveries d
+    SET state = 'in_progress',
+        attempts = d.attempts + 1,
+        next_attempt_at = NOW() + make_interval(secs => $3),
+        updated_at = NOW()
+    FROM (
+        SELECT id FROM notification_deliveries
+        WHERE channel = $1 AND state IN ('pending', 'in_progress') AND next_attempt_at <= NOW()
+        ORDER BY next_attempt_at
+        LIMIT $2
+        FOR UPDATE SKIP LOCKED
+    ) due, notifications n
+    WHERE d.id = due.id AND n.id = d.notification_id
+    RETURNING d.id, d.notification_id, d.attempts, COALESCE(d.payload, n.payload) AS payload
+"""
+
+# Solo el dueño del intento actual (attempts) puede cerrar la entrega
+FINISH_DELIVERY = """
+    UPDATE notification_deliveries
+    SET state = $3, next_attempt_at = NOW() + make_interval(secs => $4),
+        last_error = $5, result = $6, updated_at = NOW()
+    WHERE id = $1 AND attempts = $2
+"""
+
+SELECT_DELIVERIES = """
+    SELECT channel, state, attempts, next_attempt_at, last_error, result, updated_at
+    FROM notification_deliveries
+    WHERE notification_id = $1
+    ORDER BY channel
+"""
+
+LIST_COLUMNS = """id, service_name, status, message, latency_ms,
+           http_shallow_status, http_deep_status,
+           timestamp_event, timestamp_notified"""
+
+
+def notification_filter(service=None, status=None, since=None, until=None, after=None, before=None):
+    """WHERE clause and args for listing/exporting notifications.
+
+    `after`/`before` are (timestamp_notified, id) keyset bounds; the row
+    comparison is served by the (timestamp_notified, id) index.
+    """
+    clauses, args = [], []
+
+    def arg(value):
+        args.append(value)
+        return f"${len(args)}"
+
+    if service:
+        clauses.append(f"service_name = {arg(service)}")
+    if status:
+        clauses.append(f"status = {arg(status)}")
+    if since:
+        clauses.append(f"timestamp_notified >= {arg(since)}")
+    if until:
+        clauses.append(f"timestamp_notified < {arg(until)}")
+    if after:
+        clauses.append(f"(timestamp_notified, id) > ({arg(after[0])}, {arg(after[1])})")
+    if before:
+        clauses.append(f"(timestamp_notified, id) < ({arg(before[0])}, {arg(before[1])})")
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), args
+
+
+def select_page(limit, **filters):
+    """Newest-first page of notifications; returns (sql, args)."""
+    where, args = notification_filter(**filters)
+    args.append(limit)
+    return (f"SELECT {LIST_COLUMNS} FROM notifications{where} "
+            f"ORDER BY timestamp_notified DESC, id DESC LIMIT ${len(args)}"), args
+
+
+def select_export(include_payload=False, **filters):
+    """Oldest-first scan of notifications for a server-side cursor; returns (sql, args)."""
+    where, args = notification_filter(**filters)
+    columns = LIST_COLUMNS + (", payload" if include_payload else "")
+    return f"SELECT {columns} FROM notifications{where} ORDER BY timestamp_notified, id", args
+
+
+def compact_payload(payload, drop_fields):
+    """Payload as stored: without `drop_fields` (the monitor's health-check bodies by default)."""
+    return {k: v for k, v in payload.items() if k not in drop_fields}
+
+
+def partition_name(day):
+    return f"notifications_p{day:%Y%m%d}"
+
+
+def day_bounds(day):
+    start = datetime.datetime.combine(day, datetime.time(), datetime.timezone.utc)
+    return start, start + datetime.timedelta(days=1)
+
+
+SELECT_TOTAL = "SELECT COALESCE(SUM(count), 0)::bigint FROM notification_totals"
+
+# Recorre a lo sumo (minutos de la ventana x servicios x estados) filas,
+# sin importar el tamaño de notifications
+SELECT_WINDOW = """
+    SELECT service_name, status, SUM(count)::bigint AS count
+    FROM notification_rollups
+    WHERE minute >= date_trunc('minute', NOW() - make_interval(secs => $1))
+    GROUP BY service_name, status
+"""
+
+
+class Database:
+    """Shared asyncpg pool, created once per process in the app lifespan.
+
+    Queries go through the pool's per-connection statement cache, so each
+    statement above is parsed and planned once per connection and then
+    executed as a prepared statement. The schema is created at startup; if
+    Postgres is not reachable yet it is retried on first use instead of
+    keeping the service from booting.
+
+    notifications is range-partitioned by day. Partitions up to
+    `premake_days` ahead are created with the schema and again every
+    `maintenance_sec`, which also drops the partitions entirely older than
+    `retention_days` (0 keeps everything). A pre-existing unpartitioned
+    table is migrated in place the first time the schema is set up.
+    """
+
+    def __init__(self, dsn, min_size=1, max_size=10, acquire_timeout=5.0,
+                 command_timeout=10.0, statement_cache_size=256, retention_days=30,
+                 premake_days=3, maintenance_sec=3600.0, payload_drop_fields=(),
+                 payload_compression="lz4"):
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.command_timeout = command_timeout
+        self.statement_cache_size = statement_cache_size
+        self.retention_days = retention_days
+        self.premake_days = premake_days
+        self.maintenance_sec = maintenance_sec
+        self.payload_drop_fields = list(payload_drop_fields)
+        self.payload_compression = payload_compression
+        self.pool = None
+        self.schema_ready = False
+        self._schema_lock = asyncio.Lock()
+        self._maintenance_task = None
+        # Métricas de particiones
+        self.partitions = 0
+        self.partitions_created = 0
+        self.partitions_dropped = 0
+        self.last_maintenance = None
+        # Métricas del pool
+        self.waiting = 0
+        self.acquires = 0
+        self.acquire_timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.wait_hist = Histogram(DB_BUCKETS)
+
+    async def start(self):
+        # min_size=0 al crear: el servicio arranca aunque Postgres aún no responda
+        self.pool = await asyncpg.create_pool(
+            dsn=self.dsn,
+            min_size=0,
+            max_size=self.max_size,
+            command_timeout=self.command_timeout,
+            statement_cache_size=self.statement_cache_size,
+            max_inactive_connection_lifetime=0,
+            timeout=5,
+        )
+        try:
+            await self.ensure_schema()
+            await self._warm_up()
+        except (OSError, asyncio.TimeoutError, asyncpg.PostgresError) as e:
+            logger.warning(f"💾 Database not ready at startup, will retry on first use: {e}")
+        if self.maintenance_sec > 0:
+            self._maintenance_task = asyncio.create_task(self._maintenance_loop())
+
+    async def close(self):
+        if self._maintenance_task:
+            self._maintenance_task.cancel()
+            try:
+                await self._maintenance_task
+            except asyncio.CancelledError:
+                pass
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    async def _warm_up(self):
+        conns = [await self.pool.acquire() for _ in range(max(0, self.min_size - self.pool.get_size()))]
+        for conn in conns:
+            await self.pool.release(conn)
+
+    async def ensure_schema(self):
+        if self.schema_ready:
+            return
+        async with self._schema_lock:
+            if self.schema_ready:
+                return
+            async with self.acquire() as conn:
+                async with conn.transaction():
+                    # Una sola réplica a la vez aplica el esquema y la migración
+                    await conn.execute("SELECT pg_advisory_xact_lock(hashtext('notifications_schema'))")
+                    had_rollups = bool(await conn.fetchval(ROLLUP_TRIGGER_EXISTS))
+                    legacy = await conn.fetchval(TABLE_KIND) == "r"
+                    if legacy:
+                        for statement in LEGACY_RENAME:
+                            await conn.execute(statement)
+                    for statement in SCHEMA:
+                        await conn.execute(statement)
+                    if self.payload_compression and await conn.fetchval(PAYLOAD_COMPRESSION) != self.payload_compression:
+                        await conn.execute(
+                            f"ALTER TABLE notifications ALTER COLUMN payload SET COMPRESSION {self.payload_compression}")
+                    if legacy:
+                        await self._migrate_legacy(conn)
+                    else:
+                        await self._maintain(conn)
+                    if not had_rollups:
+                        # Sin inserts concurrentes entre el backfill y el trigger
+                        await conn.execute("LOCK TABLE notifications IN SHARE ROW EXCLUSIVE MODE")
+                        for statement in ROLLUP_BACKFILL:
+                            await conn.execute(statement)
+                        logger.info("💾 Notification rollups backfilled")
+                    if legacy or not had_rollups:
+                        # El trigger de la tabla vieja se fue con ella; sus rollups siguen valiendo
+                        await conn.execute(ROLLUP_TRIGGER)
+            self.schema_ready = True
+            logger.info("💾 Database schema ready")
+
+    def retention_cutoff(self):
+        """Start of the oldest day kept, or None without retention."""
+        if self.retention_days <= 0:
+            return None
+        today = datetime.datetime.now(datetime.timezone.utc).date()
+        return day_bounds(today - datetime.timedelta(days=self.retention_days))[0]
+
+    async def _migrate_legacy(self, conn):
+        # Las filas fuera de la retención no se copian: se habrían borrado igual
+        cutoff = self.retention_cutoff() or datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+        start = await conn.fetchval(LEGACY_START, cutoff)
+        await self._maintain(conn, start.date() if start else None)
+        result = await conn.execute(LEGACY_COPY, cutoff, self.payload_drop_fields, timeout=3600)
+        await conn.execute("DROP TABLE notifications_legacy")
+        logger.info(f"💾 Migrated notifications to a partitioned table ({result.split()[-1]} rows)")
+
+    async def _maintain(self, conn, first_day=None):
+        """Create the missing daily partitions and drop the expired ones."""
+        today = datetime.datetime.now(datetime.timezone.utc).date()
+        existing = {row['relname'] for row in await conn.fetch(LIST_PARTITIONS)}
+        cutoff = self.retention_cutoff()
+        if cutoff is not None:
+            for name in sorted(existing):
+                try:
+                    day = datetime.datetime.strptime(name, "notifications_p%Y%m%d").date()
+                except ValueError:
+                    continue
+                if day_bounds(day)[1] <= cutoff:
+                    await conn.execute(f"DROP TABLE {name}")
+                    existing.discard(name)
+                    self.partitions_dropped += 1
+                    logger.info(f"💾 Dropped expired partition {name}")
+            for statement in PURGE_EXPIRED:
+                await conn.execute(statement, cutoff)
+        day = min(first_day or today, today)
+        if cutoff is not None:
+            day = max(day, cutoff.date())
+        while day <= today + datetime.timedelta(days=self.premake_days):
+            if partition_name(day) not in existing:
+                await self._create_partition(conn, day)
+                existing.add(partition_name(day))
+            day += datetime.timedelta(days=1)
+        self.partitions = len(existing)
+        self.last_maintenance = time.time()
+
+    async def _create_partition(self, conn, day):
+        name = partition_name(day)
+        start, end = day_bounds(day)
+        bounds = f"FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        # Sin escrituras nuevas en default mientras se revisa y se adjunta
+        await conn.execute("LOCK TABLE notifications_default IN SHARE ROW EXCLUSIVE MODE")
+        if await conn.fetchval(DEFAULT_HAS_ROWS, start, end):
+            # Filas que cayeron en default antes de existir la partición: se mueven
+            await conn.execute(f"CREATE TABLE {name} (LIKE notifications INCLUDING DEFAULTS INCLUDING COMPRESSION)")
+            await conn.execute(f"""
+                WITH moved AS (
+                    DELETE FROM notifications_default
+                    WHERE timestamp_notified >= $1 AND timestamp_notified < $2
+                    RETURNING *
+                )
+                INSERT INTO {name} SELECT * FROM moved
+            """, start, end)
+            await conn.execute(f"ALTER TABLE notifications ATTACH PARTITION {name} FOR VALUES {bounds}")
+        else:
+            await conn.execute(f"CREATE TABLE {name} PARTITION OF notifications FOR VALUES {bounds}")
+        self.partitions_created += 1
+
+    async def maintain(self):
+        await self.ensure_schema()
+        async with self.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute("SELECT pg_advisory_xact_lock(hashtext('notifications_schema'))")
+                await self._maintain(conn)
+
+    async def _maintenance_loop(self):
+        while True:
+            await asyncio.sleep(self.maintenance_sec)
+            try:
+                await self.maintain()
+            except Exception as e:
+                logger.warning(f"💾 Partition maintenance failed, will retry: {e}")
+
+    @asynccontextmanager
+    async def acquire(self):
+        if self.pool is None:
+            raise RuntimeError("Database pool not started")
+        self.waiting += 1
+        start = time.perf_counter()
+        try:
+            conn = await self.pool.acquire(timeout=self.acquire_timeout)
+        except asyncio.TimeoutError:
+            self.acquire_timeouts += 1
+            raise
+        finally:
+            self.waiting -= 1
+        wait = time.perf_counter() - start
+        self.acquires += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+        self.wait_hist.observe(wait)
+        try:
+            yield conn
+        finally:
+            await self.pool.release(conn)
+
+    @asynccontextmanager
+    async def connection(self):
+        """Acquire a connection once the schema exists."""
+        await self.ensure_schema()
+        async with self.acquire() as conn:
+            yield conn
+
+    def stats(self):
+        size = self.pool.get_size() if self.pool else 0
+        idle = self.pool.get_idle_size() if self.pool else 0
+        in_use = size - idle
+        return {
+            "size": size,
+            "idle": idle,
+            "in_use": in_use,
+            "max_size": self.max_size,
+            "saturation": round(in_use / self.max_size, 3) if self.max_size else 0,
+            "waiting": self.waiting,
+            "acquires": self.acquires,
+            "acquire_timeouts": self.acquire_timeouts,
+            "wait_ms_avg": round(1000 * self.wait_total / self.acquires, 3) if self.acquires else 0,
+            "wait_ms_max": round(1000 * self.wait_max, 3),
+            "schema_ready": self.schema_ready,
+            "partitions": self.partitions,
+            "partitions_created": self.partitions_created,
+            "partitions_dropped": self.partitions_dropped,
+            "retention_days": self.retention_days,
+            "last_maintenance": self.last_maintenance,
+        }
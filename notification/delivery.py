@@ -0,0 +1,166 @@
+import asyncio
+import json
+import logging
+import random
+
+from db import (CLAIM_DELIVERIES, FINISH_DELIVERY, INSERT_DELIVERY, INSERT_DELIVERY_WITH_PAYLOAD,
+                INSERT_NOTIFICATION_RETURNING_ID)
+
+logger = logging.getLogger(__name__)
+
+
+class DeliveryWorkers:
+    """Worker pool that drains the notification_deliveries queue.
+
+    Each channel has a poller that claims due rows with
+    `FOR UPDATE SKIP LOCKED`, so any number of replicas can drain the same
+    queue without handing a row to two workers. A claim is a lease: the row
+    stays `in_progress` until `lease_sec` and is claimable again after that
+    if its worker died. Each channel runs at most `limits[channel]`
+    deliveries at once per replica. Failures are retried with exponential
+    backoff up to `max_attempts`, then the row is left in the `dead` state.
+    Delivery is at-least-once.
+    """
+
+    def __init__(self, db, senders, limits, max_attempts=8, backoff_base=2.0,
+                 backoff_max=300.0, lease_sec=60.0, poll_sec=1.0):
+        self.db = db
+        self.senders = senders  # channel -> async fn(payload) -> result dict
+        self.limits = {ch: max(1, limits.get(ch, 4)) for ch in senders}
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease_sec = lease_sec
+        self.poll_sec = poll_sec
+        self.active = {ch: 0 for ch in senders}
+        self._slot_freed = {ch: asyncio.Event() for ch in senders}
+        self._wake = {ch: asyncio.Event() for ch in senders}
+        self._pollers = []
+        self._deliveries = set()
+        # Métricas
+        self.delivered = {ch: 0 for ch in senders}
+        self.retried = {ch: 0 for ch in senders}
+        self.dead = {ch: 0 for ch in senders}
+
+    @property
+    def channels(self):
+        return list(self.senders)
+
+    async def enqueue(self, record, channels=None):
+        """Store the notification row and one pending delivery per channel; returns its id.
+
+        `channels` defaults to every configured channel; an empty list only
+        records the notification.
+        """
+        channels = self.channels if channels is None else channels
+        async with self.db.connection() as conn:
+            async with conn.transaction():
+                notification_id = await conn.fetchval(INSERT_NOTIFICATION_RETURNING_ID, *record)
+                if channels:
+                    await conn.executemany(INSERT_DELIVERY, [(notification_id, ch) for ch in channels])
+        for event in self._wake.values():
+            event.set()
+        return notification_id
+
+    async def enqueue_for(self, notification_id, payload, channels=None):
+        """Queue deliveries of `payload` attached to an already stored notification.
+
+        Used for digests: the events they cover are already rows, so the
+        digest only adds deliveries and is not counted as a new event.
+        """
+        channels = self.channels if channels is None else channels
+        async with self.db.connection() as conn:
+            await conn.executemany(INSERT_DELIVERY_WITH_PAYLOAD,
+                                   [(notification_id, ch, json.dumps(payload)) for ch in channels])
+        for event in self._wake.values():
+            event.set()
+
+    def start(self):
+        self._pollers = [asyncio.create_task(self._poll(ch)) for ch in self.senders]
+
+    async def close(self, grace=5.0):
+        for task in self._pollers:
+            task.cancel()
+        await asyncio.gather(*self._pollers, return_exceptions=True)
+        if self._deliveries:
+            _, pending = await asyncio.wait(self._deliveries, timeout=grace)
+            # Lo que no termine a tiempo se cancela antes de cerrar el pool;
+            # otra réplica lo retoma al vencer el lease
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _poll(self, channel):
+        while True:
+            free = self.limits[channel] - self.active[channel]
+            if free <= 0:
+                self._slot_freed[channel].clear()
+                await self._slot_freed[channel].wait()
+                continue
+            try:
+                async with self.db.connection() as conn:
+                    rows = await conn.fetch(CLAIM_DELIVERIES, channel, free, self.lease_sec)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"📬 Claiming {channel} deliveries failed: {e}")
+                rows = []
+            for row in rows:
+                self.active[channel] += 1
+                task = asyncio.create_task(self._deliver(channel, row))
+                self._deliveries.add(task)
+                task.add_done_callback(self._deliveries.discard)
+            if len(rows) == free:
+                continue
+            self._wake[channel].clear()
+            try:
+                await asyncio.wait_for(self._wake[channel].wait(), self.poll_sec)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _deliver(self, channel, row):
+        try:
+            payload = json.loads(row["payload"]) if isinstance(row["payload"], str) else row["payload"]
+            try:
+                result = await self.senders[channel](payload)
+            except Exception as e:
+                result = {"success": False, "error": str(e)}
+            await self._finish(channel, row, result)
+        except Exception as e:
+            logger.error(f"📬 Recording {channel} delivery {row['id']} failed: {e}")
+        finally:
+            self.active[channel] -= 1
+            self._slot_freed[channel].set()
+
+    def backoff(self, attempts):
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1))
+        return delay * random.uniform(0.8, 1.0)
+
+    async def _finish(self, channel, row, result):
+        attempts = row["attempts"]
+        if result.get("success"):
+            state, delay, error = "delivered", 0.0, None
+            self.delivered[channel] += 1
+        elif attempts >= self.max_attempts:
+            state, delay, error = "dead", 0.0, result.get("error")
+            self.dead[channel] += 1
+            logger.error(f"📬 {channel} delivery of notification {row['notification_id']} dead after {attempts} attempts: {error}")
+        else:
+            # Un Retry-After del canal (p.ej. Slack 429) manda sobre el backoff
+            delay = max(self.backoff(attempts), float(result.get("retry_after") or 0))
+            state, error = "pending", result.get("error")
+            self.retried[channel] += 1
+        async with self.db.connection() as conn:
+            await conn.execute(FINISH_DELIVERY, row["id"], attempts, state, delay, error, json.dumps(result))
+
+    def stats(self):
+        return {
+            ch: {
+                "active": self.active[ch],
+                "limit": self.limits[ch],
+                "delivered": self.delivered[ch],
+                "retried": self.retried[ch],
+                "dead": self.dead[ch],
+            }
+            for ch in self.senders
+        }
@@ -0,0 +1,193 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+
+import aiosmtplib
+
+logger = logging.getLogger(__name__)
+
+# Errores tras los que la sesión ya no sirve y se abre otra
+SESSION_ERRORS = (aiosmtplib.SMTPServerDisconnected, aiosmtplib.SMTPConnectError, ConnectionError, asyncio.TimeoutError)
+
+
+class _Session:
+    __slots__ = ("smtp", "last_used", "messages")
+
+    def __init__(self, smtp):
+        self.smtp = smtp
+        self.last_used = time.monotonic()
+        self.messages = 0
+
+
+class SMTPPool:
+    """Small pool of long-lived, authenticated aiosmtplib sessions.
+
+    Sessions are opened lazily (connect, STARTTLS, AUTH once) and reused.
+    A session idle for more than `check_after` seconds is checked with NOOP
+    before use. Sessions are recycled after `max_messages` messages or
+    `max_idle` seconds, since providers drop long or busy sessions anyway.
+    A send that fails because the session died is retried once on a fresh
+    session.
+    """
+
+    def __init__(self, hostname, port, username=None, password=None, start_tls=None,
+                 size=2, timeout=10.0, check_after=30.0, max_idle=240.0, max_messages=100):
+        self.hostname = hostname
+        self.port = port
+        self.username = username or None
+        self.password = password or None
+        self.start_tls = start_tls
+        self.size = size
+        self.timeout = timeout
+        self.check_after = check_after
+        self.max_idle = max_idle
+        self.max_messages = max_messages
+        self._idle = []
+        self._slots = asyncio.Semaphore(size)
+        # Métricas
+        self.connects = 0
+        self.reconnects = 0
+        self.sent = 0
+
+    async def _open(self):
+        smtp = aiosmtplib.SMTP(hostname=self.hostname, port=self.port, username=self.username,
+                               password=self.password, start_tls=self.start_tls, timeout=self.timeout)
+        await smtp.connect()
+        self.connects += 1
+        return _Session(smtp)
+
+    @staticmethod
+    async def _discard(session):
+        try:
+            await session.smtp.quit()
+        except Exception:
+            session.smtp.close()
+
+    async def _healthy(self, session):
+        now = time.monotonic()
+        if not session.smtp.is_connected or now - session.last_used > self.max_idle:
+            return False
+        if session.messages >= self.max_messages:
+            return False
+        if now - session.last_used > self.check_after:
+            try:
+                await session.smtp.noop()
+            except Exception:
+                return False
+        return True
+
+    @asynccontextmanager
+    async def session(self):
+        async with self._slots:
+            session = None
+            while self._idle and session is None:
+                candidate = self._idle.pop()
+                if await self._healthy(candidate):
+                    session = candidate
+                else:
+                    await self._discard(candidate)
+            if session is None:
+                session = await self._open()
+            try:
+                yield session
+            except BaseException:
+                await self._discard(session)
+                raise
+            session.last_used = time.monotonic()
+            self._idle.append(session)
+
+    async def send(self, message):
+        """Send one message; returns the server response per recipient."""
+        return (await self.send_many([message]))[0]
+
+    async def send_many(self, messages):
+        """Send several messages over one session, reconnecting once if it drops."""
+        results = []
+        pending = list(messages)
+        retried = False
+        while pending:
+            try:
+                async with self.session() as session:
+                    while pending:
+                        results.append(await session.smtp.send_message(pending[0]))
+                        pending.pop(0)
+                        session.messages += 1
+                        self.sent += 1
+            except SESSION_ERRORS:
+                if retried:
+                    raise
+                retried = True
+                self.reconnects += 1
+        return results
+
+    async def close(self):
+        while self._idle:
+            await self._discard(self._idle.pop())
+
+    def stats(self):
+        return {"idle": len(self._idle), "size": self.size, "connects": self.connects,
+                "reconnects": self.reconnects, "sent": self.sent}
+
+
+class EmailBatcher:
+    """Groups alerts that arrive within `window` seconds into one send.
+
+    mode "session" sends every alert as its own email over one SMTP session;
+    mode "digest" folds two or more alerts into a single email built by
+    `render_digest(payloads)`. Each caller still gets its own result.
+    """
+
+    def __init__(self, pool, render_digest, mode="session", window=0.5, max_batch=50):
+        self.pool = pool
+        self.render_digest = render_digest
+        self.mode = mode
+        self.window = window
+        self.max_batch = max_batch
+        self._pending = []
+        self._timer = None
+        self._flushing = set()
+        self.batches = 0
+
+    async def send(self, payload, message):
+        fut = asyncio.get_running_loop().create_future()
+        self._pending.append((payload, message, fut))
+        if len(self._pending) >= self.max_batch:
+            self._flush_now()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._flush_now)
+        return await fut
+
+    def _flush_now(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._flush(batch))
+            self._flushing.add(task)
+            task.add_done_callback(self._flushing.discard)
+
+    async def _flush(self, batch):
+        self.batches += 1
+        try:
+            if self.mode == "digest" and len(batch) > 1:
+                await self.pool.send(self.render_digest([p for p, _, _ in batch]))
+                results = [{"digest": len(batch)}] * len(batch)
+            else:
+                await self.pool.send_many([m for _, m, _ in batch])
+                results = [{}] * len(batch)
+        except Exception as e:
+            for _, _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        for (_, _, fut), extra in zip(batch, results):
+            if not fut.done():
+                fut.set_result({**extra, "batch": len(batch)})
+
+    async def close(self):
+        """Send what is pending and wait for every batch in flight."""
+        self._flush_now()
+        if self._flushing:
+            await asyncio.gather(*self._flushing, return_exceptions=True)
@@ -0,0 +1,171 @@
+import bisect
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(**labels):
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, **labels):
+        counts, total, count = list(self.counts), self.sum, self.count
+        cum = 0
+        for bound, c in zip(self.bounds, counts):
+            cum += c
+            yield f"{name}_bucket{_labels(**labels, le=bound)} {cum}"
+        yield f"{name}_bucket{_labels(**labels, le='+Inf')} {count}"
+        yield f"{name}_sum{_labels(**labels) if labels else ''} {total:.6f}"
+        yield f"{name}_count{_labels(**labels) if labels else ''} {count}"
+
+class NotificationMetrics:
+    """In-process metrics of the notification service, in Prometheus text format.
+
+    Channel calls (inline /notify, digests and queue deliveries all go
+    through run_channel) report their latency, outcome and in-flight count
+    here. The database pool and the write-behind buffer keep their own
+    histograms and counters; render() reads them at scrape time. Every
+    update happens on the event loop thread, so there are no locks.
+    """
+
+    def __init__(self):
+        self.channel_latency = {}   # channel -> Histogram
+        self.channel_results = {}   # (channel, outcome) -> int
+        self.channel_in_flight = {} # channel -> int
+        self.notify_latency = {}    # mode -> Histogram
+        self.notify_in_flight = 0
+        self.coalesced = {}         # action -> int
+
+    def channel_started(self, channel):
+        self.channel_in_flight[channel] = self.channel_in_flight.get(channel, 0) + 1
+
+    def channel_finished(self, channel, seconds, outcome):
+        self.channel_in_flight[channel] -= 1
+        h = self.channel_latency.get(channel)
+        if h is None:
+            h = self.channel_latency[channel] = Histogram(LATENCY_BUCKETS)
+        h.observe(seconds)
+        key = (channel, outcome)
+        self.channel_results[key] = self.channel_results.get(key, 0) + 1
+
+    def observe_notify(self, mode, seconds):
+        h = self.notify_latency.get(mode)
+        if h is None:
+            h = self.notify_latency[mode] = Histogram(LATENCY_BUCKETS)
+        h.observe(seconds)
+
+    def count_coalesced(self, action):
+        self.coalesced[action] = self.coalesced.get(action, 0) + 1
+
+    def render(self, db=None, writer=None, workers=None, trace_log=None, sns=None):
+        out = [
+            "# HELP notification_channel_latency_seconds Time of one channel call, within its budget.",
+            "# TYPE notification_channel_latency_seconds histogram",
+        ]
+        for channel, h in list(self.channel_latency.items()):
+            out.extend(h.lines("notification_channel_latency_seconds", channel=channel))
+        out += [
+            "# HELP notification_channel_results_total Channel calls by outcome (success, failure, timeout).",
+            "# TYPE notification_channel_results_total counter",
+        ]
+        out += [f"notification_channel_results_total{_labels(channel=c, outcome=o)} {n}"
+                for (c, o), n in list(self.channel_results.items())]
+        out += [
+            "# HELP notification_channel_in_flight Channel calls currently running.",
+            "# TYPE notification_channel_in_flight gauge",
+        ]
+        out += [f"notification_channel_in_flight{_labels(channel=c)} {n}" for c, n in list(self.channel_in_flight.items())]
+        out += [
+            "# HELP notification_notify_latency_seconds Time to answer POST /notify.",
+            "# TYPE notification_notify_latency_seconds histogram",
+        ]
+        for mode, h in list(self.notify_latency.items()):
+            out.extend(h.lines("notification_notify_latency_seconds", mode=mode))
+        out += [
+            "# HELP notification_notify_in_flight POST /notify requests currently running.",
+            "# TYPE notification_notify_in_flight gauge",
+            f"notification_notify_in_flight {self.notify_in_flight}",
+            "# HELP notification_coalesce_decisions_total Coalescer decisions (send, duplicate, held).",
+            "# TYPE notification_coalesce_decisions_total counter",
+        ]
+        out += [f"notification_coalesce_decisions_total{_labels(action=a)} {n}" for a, n in list(self.coalesced.items())]
+        if db is not None:
+            stats = db.stats()
+            out += [
+                "# HELP notification_db_acquire_wait_seconds Wait for a pooled Postgres connection.",
+                "# TYPE notification_db_acquire_wait_seconds histogram",
+            ]
+            out.extend(db.wait_hist.lines("notification_db_acquire_wait_seconds"))
+            out += [
+                "# HELP notification_db_pool_connections Pool connections by state.",
+                "# TYPE notification_db_pool_connections gauge",
+                f"notification_db_pool_connections{_labels(state='in_use')} {stats['in_use']}",
+                f"notification_db_pool_connections{_labels(state='idle')} {stats['idle']}",
+                "# HELP notification_db_pool_waiting Callers waiting for a connection.",
+                "# TYPE notification_db_pool_waiting gauge",
+                f"notification_db_pool_waiting {stats['waiting']}",
+                "# HELP notification_db_acquire_timeouts_total Connection acquires that timed out.",
+                "# TYPE notification_db_acquire_timeouts_total counter",
+                f"notification_db_acquire_timeouts_total {stats['acquire_timeouts']}",
+            ]
+        if writer is not None:
+            stats = writer.stats()
+            out += [
+                "# HELP notification_db_flush_seconds Time of one batched write (COPY, or row-by-row fallback).",
+                "# TYPE notification_db_flush_seconds histogram",
+            ]
+            out.extend(writer.flush_hist.lines("notification_db_flush_seconds"))
+            out += [
+                "# HELP notification_db_rows_total Notification rows written or failed.",
+                "# TYPE notification_db_rows_total counter",
+                f"notification_db_rows_total{_labels(result='written')} {stats['rows_written']}",
+                f"notification_db_rows_total{_labels(result='failed')} {stats['rows_failed']}",
+                "# HELP notification_db_pending_rows Rows waiting in the write-behind buffer.",
+                "# TYPE notification_db_pending_rows gauge",
+                f"notification_db_pending_rows {stats['pending']}",
+            ]
+        if workers is not None:
+            stats = workers.stats()
+            out += [
+                "# HELP notification_delivery_active Queue deliveries running on this replica.",
+                "# TYPE notification_delivery_active gauge",
+            ]
+            out += [f"notification_delivery_active{_labels(channel=c)} {s['active']}" for c, s in stats.items()]
+        if sns is not None:
+            stats = sns.stats()
+            out += [
+                "# HELP notification_sns_api_calls_total PublishBatch and Publish calls made to SNS.",
+                "# TYPE notification_sns_api_calls_total counter",
+                f"notification_sns_api_calls_total {stats['api_calls']}",
+                "# HELP notification_sns_messages_total SNS alerts by result.",
+                "# TYPE notification_sns_messages_total counter",
+                f"notification_sns_messages_total{_labels(result='published')} {stats['published']}",
+                f"notification_sns_messages_total{_labels(result='failed')} {stats['failed']}",
+                "# HELP notification_sns_retries_total Alerts republished alone after PublishBatch failed them.",
+                "# TYPE notification_sns_retries_total counter",
+                f"notification_sns_retries_total {stats['retried']}",
+            ]
+        if trace_log is not None:
+            stats = trace_log.stats()
+            out += [
+                "# HELP notification_trace_log_records_total Trace log records by fate (written, sampled_out, dropped).",
+                "# TYPE notification_trace_log_records_total counter",
+            ]
+            out += [f"notification_trace_log_records_total{_labels(fate=k)} {stats[k]}"
+                    for k in ("written", "sampled_out", "dropped")]
+        return "\n".join(out) + "\n"
@@ -0,0 +1,130 @@
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+logger = logging.getLogger(__name__)
+
+# Límites de PublishBatch: 10 entradas y 256 KiB en total por llamada
+MAX_ENTRIES = 10
+MAX_BATCH_BYTES = 256 * 1024
+
+
+class SNSBatcher:
+    """Groups SNS alerts into PublishBatch calls made off the event loop.
+
+    `publish(message, subject)` queues an entry; pending entries are sent
+    together once `max_batch` (at most 10) are waiting or `linger` seconds
+    after the first one, and never more than 256 KiB per call. boto3 runs
+    on a dedicated thread pool of `threads` workers, so a slow SNS endpoint
+    only ties up those threads. Entries that PublishBatch reports as failed,
+    or every entry if the whole call fails, are retried once with a single
+    Publish each. Each caller gets its own result.
+    """
+
+    def __init__(self, client, topic_arn, max_batch=10, linger=0.05, threads=4):
+        self.client = client
+        self.topic_arn = topic_arn
+        self.max_batch = max(1, min(max_batch, MAX_ENTRIES))
+        self.linger = linger
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="sns")
+        self._pending = []
+        self._pending_bytes = 0
+        self._timer = None
+        self._flushing = set()
+        # Métricas
+        self.batches = 0
+        self.api_calls = 0
+        self.published = 0
+        self.retried = 0
+        self.failed = 0
+
+    async def publish(self, message, subject=None):
+        entry = {"Message": message}
+        if subject:
+            entry["Subject"] = subject
+        size = len(message.encode()) + len((subject or "").encode())
+        if self._pending and self._pending_bytes + size > MAX_BATCH_BYTES:
+            self._flush_now()
+        fut = asyncio.get_running_loop().create_future()
+        self._pending.append((entry, fut))
+        self._pending_bytes += size
+        if len(self._pending) >= self.max_batch:
+            self._flush_now()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.linger, self._flush_now)
+        return await fut
+
+    def _flush_now(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending, self._pending_bytes = self._pending, [], 0
+        if batch:
+            task = asyncio.ensure_future(self._flush(batch))
+            self._flushing.add(task)
+            task.add_done_callback(self._flushing.discard)
+
+    async def _call(self, method, **kwargs):
+        self.api_calls += 1
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(method, TopicArn=self.topic_arn, **kwargs))
+
+    async def _flush(self, batch):
+        self.batches += 1
+        try:
+            entries = [{"Id": str(i), **entry} for i, (entry, _) in enumerate(batch)]
+            try:
+                response = await self._call(self.client.publish_batch, PublishBatchRequestEntries=entries)
+            except (BotoCoreError, ClientError) as e:
+                logger.warning(f"📨 PublishBatch of {len(batch)} failed ({e}), publishing one by one")
+                response = {"Failed": [{"Id": entry["Id"]} for entry in entries]}
+            for ok in response.get("Successful", []):
+                self._settle(batch[int(ok["Id"])][1], {"success": True, "message_id": ok["MessageId"], "batch": len(batch)})
+            # Entradas que la respuesta no menciona se reintentan como fallidas
+            failed = [(entry, fut) for entry, fut in batch if not fut.done()]
+            if failed:
+                await asyncio.gather(*(self._publish_one(entry, fut, len(batch)) for entry, fut in failed))
+        except Exception as e:
+            # Ningún caller espera hasta el timeout del canal por un error inesperado
+            logger.error(f"📨 SNS batch of {len(batch)} failed: {type(e).__name__}: {e}")
+            for _, fut in batch:
+                if not fut.done():
+                    self._settle(fut, {"success": False, "error": f"{type(e).__name__}: {e}"})
+
+    async def _publish_one(self, entry, fut, batch_size):
+        self.retried += 1
+        try:
+            response = await self._call(self.client.publish, **entry)
+        except Exception as e:
+            self._settle(fut, {"success": False, "error": str(e)})
+            return
+        self._settle(fut, {"success": True, "message_id": response["MessageId"], "batch": batch_size, "retried": True})
+
+    def _settle(self, fut, result):
+        if result["success"]:
+            self.published += 1
+        else:
+            self.failed += 1
+        if not fut.done():
+            fut.set_result(result)
+
+    async def close(self):
+        """Send what is pending, wait for it and stop the thread pool."""
+        self._flush_now()
+        if self._flushing:
+            await asyncio.gather(*self._flushing, return_exceptions=True)
+        self.executor.shutdown(wait=False)
+
+    def stats(self):
+        return {
+            "pending": len(self._pending),
+            "batches": self.batches,
+            "api_calls": self.api_calls,
+            "published": self.published,
+            "retried": self.retried,
+            "failed": self.failed,
+            "avg_batch": round((self.published + self.failed) / self.batches, 2) if self.batches else 0,
+        }
@@ -0,0 +1,102 @@
+import asyncio
+import os
+
+import pytest
+
+# Necesita un Postgres desechable: TEST_DB_DSN=postgresql://... (sus tablas se recrean)
+DSN = os.getenv("TEST_DB_DSN")
+pytestmark = pytest.mark.skipif(not DSN, reason="TEST_DB_DSN not set")
+
+ENV = {"DB_DSN": DSN, "NOTIFY_MODE": "queue", "SLACK_WEBHOOK_URL": "http://127.0.0.1:9/slack",
+       "COALESCE_BURST": "1", "COALESCE_RATE_PER_MIN": "0", "COALESCE_DEDUP_SEC": "0",
+       "COALESCE_DIGEST_SEC": "0.2", "STATS_CACHE_TTL_SEC": "0", "DELIVERY_POLL_SEC": "0.05",
+       "PAYLOAD_COMPRESSION": "pglz"}
+
+
+class Service:
+    """The app module inside one lifespan, on one event loop, like in production."""
+
+    def __init__(self, app, loop):
+        self.app = app
+        self.loop = loop
+        self.slack = []  # payloads entregados al canal de Slack
+
+    def run(self, coro):
+        return self.loop.run_until_complete(coro)
+
+
+@pytest.fixture(scope="module")
+def service():
+    asyncpg = pytest.importorskip("asyncpg")
+    with pytest.MonkeyPatch.context() as mp:
+        for key, value in ENV.items():
+            mp.setenv(key, value)
+        loop = asyncio.new_event_loop()
+
+        async def reset():
+            conn = await asyncpg.connect(DSN)
+            await conn.execute("DROP TABLE IF EXISTS notifications, notifications_legacy, notification_deliveries, "
+                               "notification_rollups, notification_totals CASCADE")
+            await conn.close()
+        loop.run_until_complete(reset())
+
+        import app
+        svc = Service(app, loop)
+
+        async def fake_slack(message, payload):
+            svc.slack.append(payload)
+            return {"success": True}
+        mp.setattr(app, "send_slack_notification", fake_slack)
+
+        lifespan = app.lifespan(app.app)
+        loop.run_until_complete(lifespan.__aenter__())
+        try:
+            yield svc
+        finally:
+            loop.run_until_complete(lifespan.__aexit__(None, None, None))
+            loop.close()
+
+
+async def notify(app, service, status):
+    return await app.notify({"service": service, "status": status}, mode=None, x_trace_id=None)
+
+
+async def service_count(app, service):
+    stats = await app.get_notification_stats(window="1h")
+    listed = await app.get_notifications(limit=50, cursor=None, service=service, status=None,
+                                         since=None, until=None)
+    return stats["window_by_service"].get(service, 0), listed["count"]
+
+
+def test_queued_digest_adds_deliveries_not_events(service):
+    app = service.app
+
+    async def run():
+        for status in ("failure", "ok", "failure"):
+            await notify(app, "digest-svc", status)
+        for _ in range(100):
+            if any("digest" in p for p in service.slack):
+                break
+            await asyncio.sleep(0.05)
+        return await service_count(app, "digest-svc"), await app.get_notification_stats(window="1h")
+
+    (counted, listed), stats = service.run(run())
+    digest = next(p for p in service.slack if "digest" in p)
+    assert digest["digest"]["count"] == 2
+    assert counted == listed == 3
+    assert stats["total_notifications"] == stats["window_count"]
+
+
+def test_cached_stats_keep_each_callers_window_label(service, monkeypatch):
+    app = service.app
+    monkeypatch.setattr(app, "STATS_CACHE_TTL_SEC", 60)
+    app.stats_cache.clear()
+
+    async def run():
+        await notify(app, "stats-svc", "failure")
+        return await app.get_notification_stats(window="60m"), await app.get_notification_stats(window="1h")
+
+    first, second = service.run(run())
+    assert (first["window"], second["window"]) == ("60m", "1h")
+    assert first["window_seconds"] == second["window_seconds"] == 3600
+    assert first["window_by_service"] == second["window_by_service"]
@@ -0,0 +1,46 @@
+import asyncio
+import json
+from contextlib import asynccontextmanager
+
+from delivery import DeliveryWorkers
+
+
+class FakeDatabase:
+    """Hands out `rows` on the first claim and records every other statement."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.executed = []
+
+    @asynccontextmanager
+    async def connection(self):
+        yield self
+
+    async def fetch(self, sql, *args):
+        rows, self.rows = self.rows, []
+        return rows
+
+    async def execute(self, sql, *args):
+        self.executed.append(args)
+
+
+def test_close_cancels_deliveries_past_the_grace_period():
+    async def run():
+        running = asyncio.Event()
+
+        async def stuck(payload):
+            running.set()
+            await asyncio.sleep(60)
+            return {"success": True}
+
+        db = FakeDatabase([{"id": 1, "notification_id": 7, "attempts": 1, "payload": json.dumps({"service": "svc"})}])
+        workers = DeliveryWorkers(db, {"slack": stuck}, {"slack": 1}, poll_sec=0.01)
+        workers.start()
+        await asyncio.wait_for(running.wait(), 5)
+        await asyncio.wait_for(workers.close(grace=0.05), 5)
+        # Nada sigue corriendo cuando el lifespan cierra el pool
+        assert not workers._deliveries
+        assert workers.active == {"slack": 0}
+        assert db.executed == []
+
+    asyncio.run(run())
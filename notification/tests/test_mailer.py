@@ -0,0 +1,103 @@
+import asyncio
+import socket
+from email.message import EmailMessage
+
+import pytest
+from aiosmtpd.controller import Controller
+
+from mailer import EmailBatcher, SMTPPool
+
+
+class Inbox:
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope.content)
+        return "250 OK"
+
+
+@pytest.fixture
+def smtp():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    inbox = Inbox()
+    controller = Controller(inbox, hostname="127.0.0.1", port=port)
+    controller.start()
+    yield inbox, port
+    controller.stop()
+
+
+def message(i):
+    msg = EmailMessage()
+    msg["From"] = "monitor@example.com"
+    msg["To"] = "ops@example.com"
+    msg["Subject"] = f"alert {i}"
+    msg.set_content(f"body {i}")
+    return msg
+
+
+def digest(payloads):
+    return message(f"digest of {len(payloads)}")
+
+
+def test_pool_reuses_one_session(smtp):
+    inbox, port = smtp
+    async def run():
+        pool = SMTPPool("127.0.0.1", port, start_tls=False, size=1)
+        for i in range(3):
+            await pool.send(message(i))
+        await pool.send_many([message(3), message(4)])
+        await pool.close()
+        return pool
+    pool = asyncio.run(run())
+    assert len(inbox.messages) == 5
+    assert pool.connects == 1
+    assert pool.sent == 5
+
+
+def test_pool_reconnects_after_dropped_session(smtp):
+    inbox, port = smtp
+    async def run():
+        pool = SMTPPool("127.0.0.1", port, start_tls=False, size=1)
+        await pool.send(message(0))
+        pool._idle[0].smtp.close()
+        await pool.send(message(1))
+        await pool.close()
+        return pool
+    pool = asyncio.run(run())
+    assert len(inbox.messages) == 2
+    assert pool.connects == 2
+
+
+@pytest.mark.parametrize("mode,delivered", [("session", 4), ("digest", 1)])
+def test_batcher_groups_alerts(smtp, mode, delivered):
+    inbox, port = smtp
+    async def run():
+        pool = SMTPPool("127.0.0.1", port, start_tls=False)
+        batcher = EmailBatcher(pool, digest, mode=mode, window=0.05)
+        results = await asyncio.gather(*(batcher.send({"i": i}, message(i)) for i in range(4)))
+        await batcher.close()
+        await pool.close()
+        return results
+    results = asyncio.run(run())
+    assert len(inbox.messages) == delivered
+    assert all(r["batch"] == 4 for r in results)
+
+
+def test_close_sends_pending_batch(smtp):
+    inbox, port = smtp
+    async def run():
+        pool = SMTPPool("127.0.0.1", port, start_tls=False)
+        batcher = EmailBatcher(pool, digest, window=60)
+        sends = [asyncio.ensure_future(batcher.send({"i": i}, message(i))) for i in range(2)]
+        await asyncio.sleep(0)
+        await batcher.close()
+        assert not batcher._flushing
+        results = await asyncio.gather(*sends)
+        await pool.close()
+        return results
+    results = asyncio.run(run())
+    assert len(inbox.messages) == 2
+    assert [r["batch"] for r in results] == [2, 2]
@@ -0,0 +1,61 @@
+import asyncio
+
+import boto3
+import pytest
+from moto import mock_aws
+
+from sns import SNSBatcher
+
+
+@pytest.fixture
+def sns():
+    with mock_aws():
+        client = boto3.client("sns", region_name="us-east-1")
+        arn = client.create_topic(Name="alerts")["TopicArn"]
+        yield client, arn
+
+
+def publish_all(batcher, count):
+    async def run():
+        try:
+            return await asyncio.wait_for(
+                asyncio.gather(*(batcher.publish(f"alert {i}", "subject") for i in range(count))), 5)
+        finally:
+            await batcher.close()
+    return asyncio.run(run())
+
+
+def test_batches_up_to_ten_entries(sns):
+    batcher = SNSBatcher(*sns, max_batch=10, linger=0.01)
+    results = publish_all(batcher, 12)
+    assert all(r["success"] for r in results)
+    assert len({r["message_id"] for r in results}) == 12
+    assert batcher.batches == 2
+    assert batcher.stats()["published"] == 12
+
+
+def test_unexpected_batch_error_settles_every_caller(sns, monkeypatch):
+    client, arn = sns
+    def boom(**kwargs):
+        raise RuntimeError("boom")
+    monkeypatch.setattr(client, "publish_batch", boom)
+    batcher = SNSBatcher(client, arn, linger=0.01)
+    results = publish_all(batcher, 3)
+    assert [r["success"] for r in results] == [False] * 3
+    assert "RuntimeError" in results[0]["error"]
+
+
+def test_malformed_response_retries_one_by_one(sns, monkeypatch):
+    client, arn = sns
+    monkeypatch.setattr(client, "publish_batch", lambda **kwargs: {})
+    batcher = SNSBatcher(client, arn, linger=0.01)
+    results = publish_all(batcher, 3)
+    assert all(r["success"] and r["retried"] for r in results)
+    assert batcher.retried == 3
+
+
+def test_shut_down_pool_does_not_strand_callers(sns):
+    batcher = SNSBatcher(*sns, linger=0.01)
+    batcher.executor.shutdown()
+    results = publish_all(batcher, 2)
+    assert [r["success"] for r in results] == [False, False]
@@ -0,0 +1,77 @@
+import json
+import logging
+import queue
+import random
+import threading
+import uuid
+
+logger = logging.getLogger("notification.trace")
+
+
+def new_trace_id():
+    return uuid.uuid4().hex[:16]
+
+
+class TraceLog:
+    """Sampled, queue-backed structured log of notification traces.
+
+    emit() only makes the sampling decision and puts the event dict on a
+    bounded queue; a background thread serializes it as one JSON line on the
+    `notification.trace` logger, so neither JSON encoding nor the log
+    handler's I/O runs on the event loop. Events flagged as errors are
+    always kept, the rest with probability `sample_rate`. When the queue is
+    full the event is dropped and counted instead of blocking the request.
+    """
+
+    _STOP = object()
+
+    def __init__(self, sample_rate=0.1, max_queue=10000):
+        self.sample_rate = sample_rate
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        # Métricas
+        self.written = 0
+        self.sampled_out = 0
+        self.dropped = 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="trace-log", daemon=True)
+        self._thread.start()
+
+    def close(self, timeout=2.0):
+        if self._thread is None:
+            return
+        try:
+            self._queue.put(self._STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+
+    def emit(self, event, error=False):
+        if not error and random.random() >= self.sample_rate:
+            self.sampled_out += 1
+            return
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            event = self._queue.get()
+            if event is self._STOP:
+                return
+            try:
+                logger.info(json.dumps(event, default=str, ensure_ascii=False))
+                self.written += 1
+            except Exception:
+                self.dropped += 1
+
+    def stats(self):
+        return {
+            "sample_rate": self.sample_rate,
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "sampled_out": self.sampled_out,
+            "dropped": self.dropped,
+        }
@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import time
+
+import asyncpg
+
+from db import INSERT_NOTIFICATION, NOTIFICATION_COLUMNS
+from metrics import DB_BUCKETS, Histogram
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationWriter:
+    """Write-behind buffer for rows of the notifications table.
+
+    Callers append a record and get a future that resolves once the row is
+    committed. A single flusher drains the buffer with one COPY per batch,
+    when `max_batch` rows are pending or `max_delay` seconds after the first
+    one arrived; rows that arrive while a COPY is running form the next
+    batch, so the batch size grows with the load. If a COPY fails because of
+    a bad row, the batch is retried row by row with the prepared
+    INSERT so that row only fails its own caller; connection errors fail the
+    whole batch.
+    """
+
+    def __init__(self, db, max_batch=500, max_delay=0.05, max_pending=10000):
+        self.db = db
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self._buffer = []
+        self._arrived = asyncio.Event()
+        self._full = asyncio.Event()
+        self._task = None
+        self._closing = False
+        # Métricas
+        self.flushes = 0
+        self.rows_written = 0
+        self.rows_failed = 0
+        self.flush_hist = Histogram(DB_BUCKETS)
+
+    @property
+    def pending(self):
+        return len(self._buffer)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        self._closing = True
+        self._arrived.set()
+        if self._task:
+            await self._task
+
+    def submit(self, record):
+        """Queue `record` (a tuple in NOTIFICATION_COLUMNS order); returns its commit future."""
+        fut = asyncio.get_running_loop().create_future()
+        self._buffer.append((record, fut))
+        self._arrived.set()
+        if len(self._buffer) >= self.max_batch:
+            self._full.set()
+        return fut
+
+    async def write(self, record, wait=True):
+        """Queue `record`. Waits for the commit unless `wait` is False and the buffer has room."""
+        fut = self.submit(record)
+        if wait or len(self._buffer) > self.max_pending:
+            await fut
+            return True
+        fut.add_done_callback(self._log_failure)
+        return False
+
+    @staticmethod
+    def _log_failure(fut):
+        if not fut.cancelled() and fut.exception():
+            logger.error(f"💾 Deferred notification write failed: {fut.exception()}")
+
+    async def _run(self):
+        while True:
+            if not self._buffer:
+                if self._closing:
+                    return
+                self._arrived.clear()
+                await self._arrived.wait()
+                continue
+            if not self._closing and len(self._buffer) < self.max_batch:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.max_delay)
+                except asyncio.TimeoutError:
+                    pass
+            batch, self._buffer = self._buffer[:self.max_batch], self._buffer[self.max_batch:]
+            if len(self._buffer) < self.max_batch:
+                self._full.clear()
+            start = time.perf_counter()
+            await self._flush(batch)
+            self.flush_hist.observe(time.perf_counter() - start)
+
+    async def _flush(self, batch):
+        self.flushes += 1
+        try:
+            async with self.db.connection() as conn:
+                try:
+                    await conn.copy_records_to_table(
+                        "notifications", records=[r for r, _ in batch], columns=NOTIFICATION_COLUMNS)
+                except (asyncpg.PostgresError, ValueError, TypeError) as e:
+                    # Fila inválida (tipo, largo, encoding): se aísla en su propio INSERT
+                    if len(batch) == 1:
+                        raise
+                    logger.warning(f"💾 COPY of {len(batch)} notifications failed ({e}), retrying row by row")
+                    for item in batch:
+                        try:
+                            await conn.execute(INSERT_NOTIFICATION, *item[0])
+                            self._settle([item], None)
+                        except (asyncpg.PostgresError, ValueError, TypeError) as row_error:
+                            self._settle([item], row_error)
+                    return
+        except Exception as e:
+            self._settle(batch, e)
+            return
+        self._settle(batch, None)
+
+    def _settle(self, batch, error):
+        for _, fut in batch:
+            if fut.done():
+                continue
+            if error is None:
+                fut.set_result(None)
+            else:
+                fut.set_exception(error)
+        if error is None:
+            self.rows_written += len(batch)
+        else:
+            self.rows_failed += len(batch)
+
+    def stats(self):
+        return {
+            "pending": self.pending,
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "rows_failed": self.rows_failed,
+            "avg_batch": round(self.rows_written / self.flushes, 2) if self.flushes else 0,
+        }
@@ -1,51 +1,201 @@
-import os, time, random, asyncio
+import os, time, json, asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Response, status, Request
 import asyncpg
+from faults import FaultEngine, InjectedFault
 
-app = FastAPI()
 DB_DSN = os.getenv("DB_DSN", "postgresql://app:app@db:5432/app")
 EXTRA_LATENCY_MS = float(os.getenv("EXTRA_LATENCY_MS", "0"))
 ERROR_RATE = float(os.getenv("ERROR_RATE", "0.0"))
+# Pool para /ready: pocas conexiones bastan porque las comprobaciones concurrentes se comparten
+READY_POOL_MAX = int(os.getenv("READY_POOL_MAX", "2"))
+READY_TIMEOUT_SEC = float(os.getenv("READY_TIMEOUT_SEC", "1.5"))
+# 0 = sin caché; si no, las sondas dentro del TTL reciben el último resultado
+READY_CACHE_TTL_MS = float(os.getenv("READY_CACHE_TTL_MS", "0"))
+# Escenarios de fallas (JSON) para /admin/scenarios; FAULT_SCENARIO arranca uno al iniciar
+FAULT_SCENARIO_DIR = os.getenv("FAULT_SCENARIO_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "scenarios"))
+FAULT_SCENARIO = os.getenv("FAULT_SCENARIO", "")
+# Heartbeats push al monitor por UDP ("host:puerto"; vacío = deshabilitado)
+HEARTBEAT_TARGET = os.getenv("HEARTBEAT_TARGET", "")
+HEARTBEAT_NAME = os.getenv("HEARTBEAT_NAME", "local-svc")
+HEARTBEAT_INTERVAL_MS = float(os.getenv("HEARTBEAT_INTERVAL_MS", "250"))
 
-async def maybe_degrade():
-    # Simula latencia adicional y errores controlados (para pruebas)
+
+class ReadinessCheck:
+    """Single-flight `SELECT 1` against a small, long-lived pool.
+
+    Concurrent callers share the check that is already running instead of
+    each opening a connection, and with `ttl` > 0 callers within `ttl`
+    seconds of the last check get its result. A check reports the time
+    spent waiting for a pooled connection (opening one if the pool is
+    empty) apart from the query time.
+    """
+
+    def __init__(self, dsn, max_size=2, timeout=1.5, ttl=0.0):
+        self.dsn = dsn
+        self.max_size = max_size
+        self.timeout = timeout
+        self.ttl = ttl
+        self.pool = None
+        self._inflight = None
+        self._last = None  # (monotonic time, result)
+
+    async def start(self):
+        # min_size=0: el servicio arranca aunque Postgres no responda todavía
+        self.pool = await asyncpg.create_pool(dsn=self.dsn, min_size=0, max_size=self.max_size,
+                                              timeout=self.timeout, command_timeout=self.timeout)
+
+    async def close(self):
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    async def check(self):
+        """Result dict of the current check: db, db_acquire_ms, db_query_ms, cached/shared flags."""
+        if self._last is not None and time.monotonic() - self._last[0] < self.ttl:
+            return {**self._last[1], "cached": True}
+        # shield: si una sonda se cancela, la comprobación sigue para las demás
+        if self._inflight is not None:
+            return {**await asyncio.shield(self._inflight), "shared": True}
+        self._inflight = asyncio.ensure_future(self._run())
+        return await asyncio.shield(self._inflight)
+
+    async def _run(self):
+        start = time.perf_counter()
+        acquire_ms = query_ms = None
+        try:
+            async with asyncio.timeout(self.timeout):
+                async with self.pool.acquire() as conn:
+                    acquired = time.perf_counter()
+                    acquire_ms = round((acquired - start) * 1000, 2)
+                    row = await conn.fetchval("SELECT 1;")
+                    query_ms = round((time.perf_counter() - acquired) * 1000, 2)
+            result = {"db": row == 1}
+        except Exception as e:
+            result = {"db": False, "error": type(e).__name__}
+        result.update(db_acquire_ms=acquire_ms, db_query_ms=query_ms)
+        self._last = (time.monotonic(), result)
+        self._inflight = None
+        return result
+
+
+faults = FaultEngine(FAULT_SCENARIO_DIR)
+readiness = ReadinessCheck(DB_DSN, max_size=READY_POOL_MAX, timeout=READY_TIMEOUT_SEC,
+                           ttl=READY_CACHE_TTL_MS / 1000) if DB_DSN and DB_DSN.strip() else None
+
+async def heartbeat_loop(target, name, interval):
+    """Push a heartbeat to the monitor every `interval` seconds.
+
+    Each one carries the latency of a self-check that goes through the same
+    fault injection as /health plus the readiness check, so the monitor sees
+    what a probe would without polling.
+    """
+    host, port = target.rsplit(":", 1)
+    loop = asyncio.get_running_loop()
+    transport = None
+    try:
+        while True:
+            if transport is None:
+                try:
+                    transport, _ = await loop.create_datagram_endpoint(asyncio.DatagramProtocol,
+                                                                       remote_addr=(host, int(port)))
+                except OSError:
+                    await asyncio.sleep(max(interval, 1.0))  # el monitor todavía no resuelve
+                    continue
+            start = time.perf_counter()
+            ok = True
+            try:
+                await maybe_degrade(fault_profile("/health")[1])
+                if readiness:
+                    ok = (await readiness.check())["db"]
+            except InjectedFault:
+                ok = False
+            latency_ms = round((time.perf_counter() - start) * 1000, 1)
+            transport.sendto(json.dumps({"service": name, "ok": ok, "latency_ms": latency_ms}).encode())
+            await asyncio.sleep(interval)
+    finally:
+        if transport is not None:
+            transport.close()
+
+@asynccontextmanager
+async def lifespan(app):
+    if FAULT_SCENARIO:
+        faults.start(faults.load(FAULT_SCENARIO))
+    if readiness:
+        await readiness.start()
+    heartbeat = asyncio.create_task(heartbeat_loop(HEARTBEAT_TARGET, HEARTBEAT_NAME, HEARTBEAT_INTERVAL_MS / 1000)) \
+        if HEARTBEAT_TARGET else None
+    try:
+        yield
+    finally:
+        if heartbeat:
+            heartbeat.cancel()
+            await asyncio.gather(heartbeat, return_exceptions=True)
+        if readiness:
+            await readiness.close()
+
+app = FastAPI(lifespan=lifespan)
+
+def fault_profile(endpoint):
+    """(phase, profile): the running scenario's, or the fixed EXTRA_LATENCY_MS / ERROR_RATE"""
+    current = faults.profile(endpoint)
+    if current is not None:
+        return current
+    manual = {"error_rate": ERROR_RATE}
     if EXTRA_LATENCY_MS > 0:
-        await asyncio.sleep(EXTRA_LATENCY_MS / 1000.0)
-    if ERROR_RATE > 0 and random.random() < ERROR_RATE:
-        raise RuntimeError("Error inyectado para pruebas")
+        manual["latency"] = {"type": "fixed", "ms": EXTRA_LATENCY_MS}
+    return "manual", manual
+
+async def maybe_degrade(profile):
+    # Simula latencia adicional y errores controlados (para pruebas); devuelve los ms inyectados
+    return await faults.inject(profile)
 
 @app.get("/health")
 async def health():
-    await maybe_degrade()
-    return {"status": "up"}
+    start = time.perf_counter()
+    phase, profile = fault_profile("/health")
+    injected, error = 0.0, False
+    try:
+        injected = await maybe_degrade(profile)
+        return {"status": "up"}
+    except InjectedFault as e:
+        injected, error = e.injected_ms, True
+        raise
+    finally:
+        faults.record(phase, "/health", injected, (time.perf_counter() - start) * 1000, error)
 
 @app.get("/ready")
 async def ready(response: Response):
     start = time.perf_counter()
+    phase, profile = fault_profile("/ready")
+    injected, error, db_fault = 0.0, False, None
     try:
-        await maybe_degrade()
+        injected = await maybe_degrade(profile)
+        db_ms, db_fault = await faults.inject_db(profile)
+        injected += db_ms
         
         # Si no hay DB_DSN configurado, solo verificamos que el servicio esté up
-        if not DB_DSN or DB_DSN.strip() == "":
+        if readiness is None and db_fault is None:
             latency_ms = int((time.perf_counter() - start) * 1000)
             return {"status": "up", "db": None, "latency_ms": latency_ms}
         
-        # Si hay DB_DSN, verificamos la conexión a la base de datos
-        conn = await asyncpg.connect(dsn=DB_DSN, timeout=1.5)
-        row = await conn.fetchval("SELECT 1;")
-        await conn.close()
+        # Si hay DB_DSN, verificamos la base de datos con el pool (comprobación compartida)
+        result = {"db": False, "error": db_fault} if db_fault else await readiness.check()
         latency_ms = int((time.perf_counter() - start) * 1000)
-        ok = (row == 1)
+        ok = result["db"]
         status_txt = "up" if ok else "down"
-        if ok:
-            return {"status": status_txt, "db": True, "latency_ms": latency_ms}
-        else:
+        if not ok:
             response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
-            return {"status": status_txt, "db": False, "latency_ms": latency_ms}
-    except Exception:
+        return {"status": status_txt, **result, "latency_ms": latency_ms}
+    except Exception as e:
+        if isinstance(e, InjectedFault):
+            injected = e.injected_ms
+        error = True
         latency_ms = int((time.perf_counter() - start) * 1000)
         response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
         return {"status": "down", "db": False, "latency_ms": latency_ms}
+    finally:
+        faults.record(phase, "/ready", injected, (time.perf_counter() - start) * 1000, error, db_fault is not None)
 
 # Endpoints para control dinámico de latencia (para pruebas de DEGRADED)
 @app.post("/admin/set-latency")
@@ -79,3 +229,36 @@ async def reset_latency():
         "latency_ms": EXTRA_LATENCY_MS,
         "status": "normal"
     }
+
+# Escenarios de inyección de fallas (latencia por endpoint, errores, fallas de DB en /ready)
+@app.get("/admin/scenarios")
+async def list_scenarios():
+    """Escenarios disponibles en FAULT_SCENARIO_DIR y estado del que corre"""
+    return {"available": faults.available(), **faults.status()}
+
+@app.post("/admin/scenarios/start")
+async def start_scenario(request: Request, response: Response):
+    """Arranca un escenario: {"name": "brownout"} o {"scenario": {...}}, con "seed" opcional"""
+    try:
+        data = await request.json()
+        if not isinstance(data, dict):
+            raise ValueError("body must be a JSON object")
+        spec = data["scenario"] if "scenario" in data else faults.load(data["name"])
+        if not isinstance(spec, dict):
+            raise ValueError("scenario must be a JSON object")
+        faults.start(spec, seed=data.get("seed"))
+    except (KeyError, TypeError, ValueError, OSError) as e:
+        response.status_code = status.HTTP_400_BAD_REQUEST
+        return {"error": f"Invalid scenario: {e!r}"}
+    return faults.status()
+
+@app.post("/admin/scenarios/stop")
+async def stop_scenario():
+    """Detiene el escenario; vuelve a regir EXTRA_LATENCY_MS / ERROR_RATE"""
+    faults.stop()
+    return faults.status()
+
+@app.get("/admin/scenarios/report")
+async def scenario_report():
+    """Latencia inyectada vs observada por fase y endpoint, con la línea de tiempo de fases"""
+    return faults.report()
@@ -0,0 +1,313 @@
+import asyncio, json, math, os, random, time
+from collections import deque
+
+# Distribuciones de latencia (ms), como dicts:
+#   {"type": "fixed", "ms": 200}
+#   {"type": "uniform", "min_ms": 50, "max_ms": 150}
+#   {"type": "lognormal", "median_ms": 80, "sigma": 0.6}
+#   {"type": "bimodal", "fast": <dist>, "slow": <dist>, "p_slow": 0.1}
+#   {"type": "spikes", "base": <dist>, "spike": <dist>, "p": 0.01}
+# Cualquiera admite "max_ms" como tope.
+DIST_TYPES = ("fixed", "uniform", "lognormal", "bimodal", "spikes")
+# Claves numéricas obligatorias de cada tipo; las sub-distribuciones se validan aparte
+DIST_REQUIRED = {"fixed": ("ms",), "uniform": ("min_ms", "max_ms"), "lognormal": ("median_ms",)}
+DIST_NESTED = {"bimodal": ("fast", "slow"), "spikes": ("base", "spike")}
+# Probabilidades opcionales por tipo
+DIST_PROBABILITY = {"bimodal": "p_slow", "spikes": "p"}
+
+
+_REQUIRED = object()
+
+
+def _number(spec, key, default=_REQUIRED):
+    """spec[key] as a finite number (bools and NaN rejected); `default` when absent."""
+    if key not in spec and default is not _REQUIRED:
+        return default
+    value = spec[key]
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise ValueError(f"{key} must be a finite number: {spec}")
+    return value
+
+
+def validate_dist(spec):
+    if not isinstance(spec, dict) or spec.get("type") not in DIST_TYPES:
+        raise ValueError(f"latency must be one of {DIST_TYPES}: {spec}")
+    kind = spec["type"]
+    for key in DIST_REQUIRED.get(kind, ()):
+        if key not in spec:
+            raise ValueError(f"{kind} latency needs {key}: {spec}")
+    for key in ("ms", "min_ms", "max_ms", "median_ms", "sigma"):
+        if key in spec and _number(spec, key) < 0:
+            raise ValueError(f"{key} must be >= 0: {spec}")
+    if kind == "uniform" and spec["min_ms"] > spec["max_ms"]:
+        raise ValueError(f"uniform latency needs min_ms <= max_ms: {spec}")
+    p = DIST_PROBABILITY.get(kind)
+    if p in spec and not 0 <= _number(spec, p) <= 1:
+        raise ValueError(f"{p} must be in [0, 1]: {spec}")
+    for key in DIST_NESTED.get(kind, ()):
+        if key not in spec:
+            raise ValueError(f"{kind} latency needs {key}: {spec}")
+        validate_dist(spec[key])
+
+
+def sample_ms(spec, rng):
+    kind = spec["type"]
+    if kind == "fixed":
+        value = spec["ms"]
+    elif kind == "uniform":
+        value = rng.uniform(spec["min_ms"], spec["max_ms"])
+    elif kind == "lognormal":
+        value = rng.lognormvariate(math.log(max(spec["median_ms"], 1e-3)), spec.get("sigma", 0.5))
+    elif kind == "bimodal":
+        value = sample_ms(spec["slow"] if rng.random() < spec.get("p_slow", 0.1) else spec["fast"], rng)
+    else:
+        value = sample_ms(spec["spike"] if rng.random() < spec.get("p", 0.01) else spec["base"], rng)
+    return max(0.0, min(value, spec.get("max_ms", value)))
+
+
+def validate_profile(profile):
+    """Fault profile of one endpoint: latency, error_rate and, for /ready, db."""
+    if not isinstance(profile, dict):
+        raise ValueError(f"endpoint profile must be an object: {profile}")
+    if "latency" in profile:
+        validate_dist(profile["latency"])
+    if not 0 <= _number(profile, "error_rate", 0) <= 1:
+        raise ValueError(f"error_rate must be in [0, 1]: {profile}")
+    db = profile.get("db")
+    if db:
+        if not isinstance(db, dict):
+            raise ValueError(f"db must be an object: {db}")
+        if "latency" in db:
+            validate_dist(db["latency"])
+        if not 0 <= _number(db, "error_rate", 0) <= 1:
+            raise ValueError(f"db.error_rate must be in [0, 1]: {db}")
+
+
+def validate_endpoints(endpoints):
+    if not isinstance(endpoints, dict):
+        raise ValueError(f"endpoints must map paths to profiles: {endpoints}")
+    for profile in endpoints.values():
+        validate_profile(profile)
+
+
+def interpolate(a, b, t):
+    """Blend two specs: numbers move linearly from a to b, everything else is taken from b."""
+    if isinstance(a, dict) and isinstance(b, dict):
+        return {k: interpolate(a[k], b[k], t) if k in a and k in b else b.get(k, a.get(k))
+                for k in a.keys() | b.keys()}
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)) and not isinstance(a, bool):
+        return a + (b - a) * t
+    return b
+
+
+def load_scenario(spec):
+    """Validate a scenario dict; returns it with its phase offsets."""
+    if not isinstance(spec, dict):
+        raise ValueError(f"scenario must be an object: {spec}")
+    phases = spec.get("phases") or []
+    if not isinstance(phases, list) or not phases:
+        raise ValueError("scenario needs a non-empty list of phases")
+    offset = 0.0
+    for i, phase in enumerate(phases):
+        if not isinstance(phase, dict):
+            raise ValueError(f"phase {i} must be an object: {phase}")
+        if _number(phase, "duration_sec", 0) <= 0:
+            raise ValueError(f"phase {i} needs a positive duration_sec")
+        if "ramp" in phase:
+            if not isinstance(phase["ramp"], dict):
+                raise ValueError(f"phase {i}: ramp must be an object with from and to")
+            validate_endpoints(phase["ramp"]["from"])
+            validate_endpoints(phase["ramp"]["to"])
+        elif "flap" in phase:
+            flap = phase["flap"]
+            if not isinstance(flap, dict):
+                raise ValueError(f"phase {i}: flap must be an object with on and off")
+            if _number(flap, "period_sec", 0) <= 0 or not 0 < _number(flap, "duty", 0.5) < 1:
+                raise ValueError(f"phase {i}: flap needs period_sec > 0 and 0 < duty < 1")
+            validate_endpoints(flap["on"])
+            validate_endpoints(flap["off"])
+        else:
+            validate_endpoints(phase.get("endpoints", {}))
+        phase["_offset"] = offset
+        offset += phase["duration_sec"]
+    spec["_length"] = offset
+    return spec
+
+
+def _percentiles(values):
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+    pick = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 2)
+    return {"count": len(ordered), "mean": round(sum(ordered) / len(ordered), 2),
+            "p50": pick(0.5), "p95": pick(0.95), "p99": pick(0.99), "max": round(ordered[-1], 2)}
+
+
+class InjectedFault(RuntimeError):
+    def __init__(self, injected_ms):
+        super().__init__("Error inyectado para pruebas")
+        self.injected_ms = injected_ms
+
+
+class FaultEngine:
+    """Time-scripted fault injection for the service's endpoints.
+
+    A scenario is a list of phases, each lasting `duration_sec`. A phase
+    maps endpoint paths (or "*") to a fault profile: a latency
+    distribution, an error rate and, for /ready, a `db` section whose
+    latency, error rate or `down` flag act on the database check. A phase
+    can instead `ramp` linearly between two such maps or `flap` between
+    them with a period and duty cycle. Each phase can state the status
+    the monitor should `expect`. With no scenario running, `profile()`
+    returns None and the caller falls back to its own settings.
+
+    Every request records the latency it was injected with next to the
+    latency it took, per phase, so `report()` shows injected against
+    observed latency and the phase timeline to score detection.
+    """
+
+    def __init__(self, scenario_dir="scenarios", samples=4096):
+        self.scenario_dir = scenario_dir
+        self.samples = samples
+        self.rng = random.Random()
+        self.scenario = None
+        self.started_at = None   # time.time() del inicio
+        self._started = None     # time.monotonic() del inicio
+        self.stopped_at = None
+        self._stats = {}         # (phase, endpoint) -> {"injected", "observed", "errors", "db_errors"}
+
+    def available(self):
+        if not os.path.isdir(self.scenario_dir):
+            return []
+        return sorted(f[:-5] for f in os.listdir(self.scenario_dir) if f.endswith(".json"))
+
+    def load(self, name):
+        path = os.path.join(self.scenario_dir, os.path.basename(name) + ".json")
+        with open(path) as f:
+            return json.load(f)
+
+    def start(self, spec, seed=None):
+        spec = load_scenario(spec)
+        self.rng = random.Random(seed)
+        self.scenario = spec
+        self.started_at = time.time()
+        self._started = time.monotonic()
+        self.stopped_at = None
+        self._stats.clear()
+
+    def stop(self):
+        if self.scenario is not None and self.stopped_at is None:
+            self.stopped_at = time.time()
+        self._started = None
+
+    def current_phase(self, now=None):
+        """(index, phase, seconds into the phase), or None when no scenario is running."""
+        if self.scenario is None or self._started is None:
+            return None
+        elapsed = (now or time.monotonic()) - self._started
+        length = self.scenario["_length"]
+        if elapsed >= length:
+            if not self.scenario.get("loop"):
+                self.stopped_at = self.started_at + length
+                self._started = None
+                return None
+            elapsed %= length
+        for i, phase in enumerate(self.scenario["phases"]):
+            if elapsed < phase["_offset"] + phase["duration_sec"]:
+                return i, phase, elapsed - phase["_offset"]
+        return None
+
+    def profile(self, endpoint):
+        """Fault profile for `endpoint` right now: (phase index, profile or {}), or None."""
+        current = self.current_phase()
+        if current is None:
+            return None
+        i, phase, into = current
+        if "ramp" in phase:
+            ramp = phase["ramp"]
+            a, b = ramp["from"], ramp["to"]
+            pa, pb = a.get(endpoint, a.get("*")), b.get(endpoint, b.get("*"))
+            if pa is None or pb is None:
+                profile = pa or pb or {}
+            else:
+                profile = interpolate(pa, pb, into / phase["duration_sec"])
+        elif "flap" in phase:
+            flap = phase["flap"]
+            side = flap["on"] if (into % flap["period_sec"]) < flap["period_sec"] * flap.get("duty", 0.5) else flap["off"]
+            profile = side.get(endpoint, side.get("*", {}))
+        else:
+            endpoints = phase.get("endpoints", {})
+            profile = endpoints.get(endpoint, endpoints.get("*", {}))
+        return i, profile
+
+    async def inject(self, profile):
+        """Sleep the sampled latency of `profile`; returns the injected ms or raises InjectedFault."""
+        injected = sample_ms(profile["latency"], self.rng) if profile.get("latency") else 0.0
+        if injected > 0:
+            await asyncio.sleep(injected / 1000.0)
+        if self.rng.random() < profile.get("error_rate", 0):
+            raise InjectedFault(injected)
+        return injected
+
+    async def inject_db(self, profile):
+        """Apply the `db` section of `profile`; returns (injected ms, fault name or None)."""
+        db = (profile or {}).get("db")
+        if not db:
+            return 0.0, None
+        injected = sample_ms(db["latency"], self.rng) if db.get("latency") else 0.0
+        if injected > 0:
+            await asyncio.sleep(injected / 1000.0)
+        if db.get("down"):
+            return injected, "InjectedDBDown"
+        if self.rng.random() < db.get("error_rate", 0):
+            return injected, "InjectedDBError"
+        return injected, None
+
+    def record(self, phase, endpoint, injected_ms, observed_ms, error=False, db_error=False):
+        stats = self._stats.get((phase, endpoint))
+        if stats is None:
+            stats = self._stats[(phase, endpoint)] = {
+                "injected": deque(maxlen=self.samples), "observed": deque(maxlen=self.samples),
+                "requests": 0, "errors": 0, "db_errors": 0}
+        stats["injected"].append(injected_ms)
+        stats["observed"].append(observed_ms)
+        stats["requests"] += 1
+        stats["errors"] += bool(error)
+        stats["db_errors"] += bool(db_error)
+
+    def timeline(self):
+        if self.scenario is None:
+            return []
+        return [{"phase": i, "name": p.get("name", f"phase-{i}"), "expect": p.get("expect"),
+                 "starts_at": round(self.started_at + p["_offset"], 3),
+                 "ends_at": round(self.started_at + p["_offset"] + p["duration_sec"], 3)}
+                for i, p in enumerate(self.scenario["phases"])]
+
+    def status(self):
+        current = self.current_phase()
+        return {
+            "scenario": self.scenario.get("name") if self.scenario else None,
+            "running": current is not None,
+            "loop": bool(self.scenario and self.scenario.get("loop")),
+            "phase": current[0] if current else None,
+            "phase_name": current[1].get("name") if current else None,
+            "started_at": self.started_at,
+            "stopped_at": self.stopped_at,
+            "timeline": self.timeline(),
+        }
+
+    def report(self):
+        endpoints = []
+        for (phase, endpoint), stats in sorted(self._stats.items(), key=lambda kv: (str(kv[0][0]), kv[0][1])):
+            overhead = [o - i for i, o in zip(stats["injected"], stats["observed"])]
+            endpoints.append({
+                "phase": phase,
+                "endpoint": endpoint,
+                "requests": stats["requests"],
+                "errors_injected": stats["errors"],
+                "db_faults_injected": stats["db_errors"],
+                "injected_ms": _percentiles(stats["injected"]),
+                "observed_ms": _percentiles(stats["observed"]),
+                "overhead_ms": _percentiles(overhead),
+            })
+        return {**self.status(), "endpoints": endpoints}
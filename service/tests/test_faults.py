@@ -0,0 +1,85 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import Response
+
+import app
+from faults import load_scenario, validate_dist
+
+OK_ENDPOINTS = {"*": {"latency": {"type": "fixed", "ms": 5}}}
+BAD_SCENARIOS = [
+    [1],
+    {"phases": "brownout"},
+    {"phases": []},
+    {"phases": ["fast"]},
+    {"phases": [{"duration_sec": float("nan"), "endpoints": OK_ENDPOINTS}]},
+    {"phases": [{"duration_sec": "10", "endpoints": OK_ENDPOINTS}]},
+    {"phases": [{"duration_sec": True, "endpoints": OK_ENDPOINTS}]},
+    {"phases": [{"duration_sec": 10, "endpoints": {"*": {"error_rate": float("nan")}}}]},
+    {"phases": [{"duration_sec": 10, "endpoints": {"/ready": {"db": {"error_rate": "all"}}}}]},
+    {"phases": [{"duration_sec": 10, "endpoints": {"/ready": {"db": ["down"]}}}]},
+    {"phases": [{"duration_sec": 10, "ramp": "up"}]},
+    {"phases": [{"duration_sec": 10, "ramp": {"from": OK_ENDPOINTS}}]},
+    {"phases": [{"duration_sec": 10, "flap": {"period_sec": float("inf"), "on": OK_ENDPOINTS, "off": {}}}]},
+    {"phases": [{"duration_sec": 10, "flap": {"period_sec": 2, "duty": "half", "on": OK_ENDPOINTS, "off": {}}}]},
+]
+BAD_DISTS = [
+    {"type": "fixed"},
+    {"type": "fixed", "ms": "5"},
+    {"type": "uniform", "min_ms": 5},
+    {"type": "uniform", "min_ms": 9, "max_ms": 1},
+    {"type": "lognormal", "median_ms": float("nan")},
+    {"type": "bimodal", "fast": {"type": "fixed", "ms": 1}},
+    {"type": "spikes", "base": {"type": "fixed", "ms": 1}, "spike": {"type": "fixed", "ms": 90}, "p": 2},
+]
+
+
+class Request:
+    def __init__(self, body):
+        self.body = body
+
+    async def json(self):
+        return json.loads(self.body)
+
+
+def start(body):
+    response = Response()
+    result = asyncio.run(app.start_scenario(Request(body), response))
+    app.faults.stop()
+    return response.status_code, result
+
+
+@pytest.mark.parametrize("spec", BAD_SCENARIOS)
+def test_bad_scenario_is_rejected(spec):
+    with pytest.raises((KeyError, ValueError)):
+        load_scenario(spec)
+
+
+@pytest.mark.parametrize("spec", BAD_SCENARIOS)
+def test_bad_scenario_is_a_400(spec):
+    status, result = start(json.dumps({"scenario": spec}))
+    assert status == 400, result
+
+
+@pytest.mark.parametrize("body", ["not json", "[1]", '{"scenario": "brownout"}', '{"seed": 1}'])
+def test_bad_body_is_a_400(body):
+    assert start(body)[0] == 400
+
+
+@pytest.mark.parametrize("spec", BAD_DISTS)
+def test_bad_distribution_is_rejected(spec):
+    with pytest.raises(ValueError):
+        validate_dist(spec)
+
+
+def test_valid_scenario_starts():
+    spec = {"phases": [{"duration_sec": 5, "endpoints": OK_ENDPOINTS},
+                       {"duration_sec": 5, "flap": {"period_sec": 1, "on": OK_ENDPOINTS, "off": {}}}]}
+    status, result = start(json.dumps({"scenario": spec}))
+    assert status == 200 and result["running"]
+
+
+def test_shipped_scenarios_load():
+    for name in ("brownout", "burst", "db-outage", "flapping", "ramp"):
+        load_scenario(app.faults.load(name))